@@ -3,19 +3,23 @@ import random
 from collections import namedtuple
 from dataclasses import field
 from enum import Enum, IntEnum
-from textwrap import dedent
+from pathlib import Path
 from typing import NamedTuple
 
 import ape
-import eth_abi
 import requests
 import web3
-from ape import convert, networks
+from ape import networks
 from eth_account import Account
 from eth_account.messages import encode_typed_data
-from eth_utils import keccak
 from hexbytes import HexBytes
 
+from scripts._helpers import hashing
+from scripts._helpers.basetypes import LazyContract
+from scripts._helpers.fees import FeeOracle
+from scripts._helpers.loans import LoanIndex
+from scripts._helpers.multicall import MULTICALL3_ADDRESS
+from scripts._helpers.offer_state import OfferStateReader
 from scripts.deployment import DeploymentManager, Environment
 
 ENV = Environment[os.environ.get("ENV", "local")]
@@ -26,6 +30,10 @@ ZERO_BYTES32 = b"\0" * 32
 
 URL_ENV_INFIX = f".{ENV.name}" if ENV != Environment.prod else ""  # noqa: SIM300 Yoda this condition is not
 P2P_SERVICE_BASE_URL = f"https://api{URL_ENV_INFIX}.zharta.io/loans-p2p/v1"
+LOAN_INDEX_DIR = Path.cwd() / ".cache" / "loans" / ENV.name / CHAIN
+
+_loan_indexes = {}
+_offer_state_readers = {}
 
 
 class Context(Enum):
@@ -48,7 +56,7 @@ def propose_owner(dm, from_wallet, to_wallet):
     contracts = [c for c in dm.context.contracts.values() if hasattr(c.contract, "proposeOwner")]
     dm.owner.set_autosign(True)
     for i, c in enumerate(contracts):
-        c.contract.proposeOwner(to_wallet, sender=from_wallet, gas_price=convert("28 gwei", int))
+        c.contract.proposeOwner(to_wallet, sender=from_wallet, **dm.context.gas_options())
         print(f"Signed contract {i + 1} out of {len(contracts)}")
 
 
@@ -56,7 +64,7 @@ def claim_ownership(dm, wallet):
     contracts = [c for c in dm.context.contracts.values() if hasattr(c.contract, "claimOwnership")]
     dm.owner.set_autosign(True)
     for i, c in enumerate(contracts):
-        c.contract.claimOwnership(sender=wallet, gas_price=convert("28 gwei", int))
+        c.contract.claimOwnership(sender=wallet, **dm.context.gas_options())
         print(f"Signed contract {i + 1} out of {len(contracts)}")
 
 
@@ -182,29 +190,11 @@ CollectionContract = namedtuple("CollectionContract", ["collection", "contract"]
 
 
 def compute_loan_hash(loan: Loan):
-    print(f"compute_loan_hash {loan=}")
-    encoded = eth_abi.encode(
-        [
-            "(bytes32,bytes32,bytes32,uint256,uint256,address,uint256,uint256,address,address,address,uint256,(uint256,uint256,uint256,address)[],bool,address)"
-        ],
-        [loan],
-    )
-    return keccak(encoded)
+    return hashing.compute_loan_state_hash(loan)
 
 
 def compute_signed_offer_id(offer: SignedOffer):
-    import boa  # noqa: PLC0415 temp workaround
-
-    return boa.eval(
-        dedent(
-            f"""keccak256(
-            concat(
-                convert({offer.signature.v}, bytes32),
-                convert({offer.signature.r}, bytes32),
-                convert({offer.signature.s}, bytes32),
-            ))"""
-        )
-    )
+    return hashing.compute_signed_offer_id(offer)
 
 
 def sign_offer(offer: Offer, lender, verifying_contract: str) -> SignedOffer:
@@ -427,7 +417,7 @@ def create_loan(
     )
 
 
-def get_loan(loan_id):
+def get_loan_backend(loan_id):
     response = requests.get(f"{P2P_SERVICE_BASE_URL}/loans/{loan_id}")
     if response.status_code != 200:
         print(response.text)
@@ -473,65 +463,60 @@ def get_loan(loan_id):
     return loan
 
 
-def pay_loan(loan_id, contract, *, sender):
-    response = requests.get(f"{P2P_SERVICE_BASE_URL}/loans/{loan_id}")
-    if response.status_code != 200:
-        print(response.text)
-    response.raise_for_status()
-
-    loan_data = response.json()
-    print(loan_data)
-
-    fees = [
-        Fee(
-            type=FeeType[f.get("type").replace("_FEE", "")],
-            upfront_amount=int(f.get("upfront_amount")),
-            settlement_bps=int(f.get("interest_bps")),
-            wallet=f.get("wallet"),
+def get_loan_index(contract) -> LoanIndex:
+    if contract.address not in _loan_indexes:
+        LOAN_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        index_file = LOAN_INDEX_DIR / f"{contract.address}.sqlite"
+        _loan_indexes[contract.address] = LoanIndex(index_file, loan_type=Loan, fee_type=Fee)
+    loan_index = _loan_indexes[contract.address]
+    loan_index.sync(contract)
+    return loan_index
+
+
+def get_offer_state_reader(contract) -> OfferStateReader:
+    if contract.address not in _offer_state_readers:
+        multicall = ape.Contract(MULTICALL3_ADDRESS)
+        _offer_state_readers[contract.address] = OfferStateReader(
+            contract.address,
+            multicall.aggregate3.call,
+            last_block=ape.chain.blocks.height,
+            loan_index=get_loan_index(contract),
         )
-        for f in loan_data["fees"].values()
-    ]
+    reader = _offer_state_readers[contract.address]
+    reader.sync(contract)
+    return reader
 
-    fees_dict = {f.type: f for f in fees}
 
-    loan = Loan(
-        id=HexBytes(loan_data["loan_id"]),
-        offer_id=HexBytes(loan_data["offer_id"]),
-        offer_tracing_id=HexBytes(loan_data["offer_tracing_id"]),
-        amount=int(loan_data["amount"]),
-        interest=int(loan_data["interest"]),
-        payment_token=loan_data["payment_token"],
-        maturity=int(loan_data["maturity"]),
-        start_time=int(loan_data["start_time"]),
-        borrower=loan_data["borrower"],
-        lender=loan_data["lender"],
-        collateral_contract=loan_data["collateral_contract"],
-        collateral_token_id=int(loan_data["collateral_token_id"]),
-        pro_rata=loan_data["pro_rata"],
-        fees=[fees_dict[k] for k in FeeType],
-        delegate=loan_data["delegate"],
-    )
+def get_loan(loan_id, contract):
+    loan = get_loan_index(contract).get(HexBytes(loan_id))
     print(loan)
 
     loan_hash = compute_loan_hash(loan)
-    print(f"loan_hash: {loan_hash.hex()}")
-
     loan_hash_in_contract = contract.loans(loan.id)
+    print(f"loan_hash: {loan_hash.hex()}")
     print(f"loan_hash_in_contract: {loan_hash_in_contract.hex()}")
+    if loan_hash != loan_hash_in_contract:
+        raise ValueError(f"Indexed loan {loan_id} does not match the contract state")
+
+    return loan
+
+
+def pay_loan(loan_id, contract, *, sender):
+    loan = get_loan(loan_id, contract)
+    borrower_broker_fee = loan.get_borrower_broker_fee()
 
     payment_contract = ape.Contract(loan.payment_token)
     payment_contract.approve(
-        contract.address, loan.amount + loan.interest + fees_dict[FeeType.BORROWER_BROKER].settlement_bps, sender=sender
+        contract.address,
+        loan.amount + loan.interest + (borrower_broker_fee.settlement_bps if borrower_broker_fee else 0),
+        sender=sender,
     )
 
     contract.settle_loan(loan, sender=sender)
 
 
 def claim_loan_collateral(loan_id, contract, *, sender):
-    loan = get_loan(loan_id)
-    loan_hash_in_contract = contract.loans(loan.id)
-    print(f"loan_hash_in_contract: {loan_hash_in_contract.hex()}")
-
+    loan = get_loan(loan_id, contract)
     contract.claim_defaulted_loan_collateral(loan, sender=sender)
 
 
@@ -553,12 +538,13 @@ def claim_loan_collateral(loan_id, contract, *, sender):
 
 
 def ape_init_extras():
-    dm = DeploymentManager(ENV, CHAIN, Context.CONSOLE)
+    dm = DeploymentManager(ENV, CHAIN, Context.CONSOLE, lazy=True)
+    dm.context.gas_func = FeeOracle(networks.provider.web3)
 
     globals()["dm"] = dm
     globals()["owner"] = dm.owner
     for k, v in dm.context.contracts.items():
-        globals()[k.replace(".", "_").replace("-", "_")] = v.contract
-        print(k.replace(".", "_"), v.contract)
+        globals()[k.replace(".", "_").replace("-", "_")] = LazyContract(v) if v.is_lazy() else v.contract
+        print(k.replace(".", "_"), v.address())
     for k, v in dm.context.config.items():
         globals()[k.replace(".", "_").replace("-", "_")] = v
@@ -0,0 +1,36 @@
+# @version 0.4.1
+
+# Subset of Multicall3 (0xcA11bde05977b3631167028862bE2a173976CA11) used by the scripts, with bounded call and
+# return data sizes. The ABI encoding of aggregate3 is the same as the deployed Multicall3.
+
+MAX_CALLS: constant(uint256) = 1024
+MAX_CALL_DATA: constant(uint256) = 260
+MAX_RETURN_DATA: constant(uint256) = 256
+
+struct Call3:
+    target: address
+    allowFailure: bool
+    callData: Bytes[MAX_CALL_DATA]
+
+struct Result:
+    success: bool
+    returnData: Bytes[MAX_RETURN_DATA]
+
+
+@view
+@external
+def aggregate3(calls: DynArray[Call3, MAX_CALLS]) -> DynArray[Result, MAX_CALLS]:
+    results: DynArray[Result, MAX_CALLS] = []
+    for call: Call3 in calls:
+        success: bool = False
+        response: Bytes[MAX_RETURN_DATA] = b""
+        success, response = raw_call(
+            call.target,
+            call.callData,
+            max_outsize=MAX_RETURN_DATA,
+            is_static_call=True,
+            revert_on_failure=False
+        )
+        assert success or call.allowFailure, "Multicall3: call failed"
+        results.append(Result(success=success, returnData=response))
+    return results
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# Content addressed cache of contract ABIs and their abi_key, ie the sha1 of the ABI serialized with sorted keys.
+# ABIs are stored once per key as their canonical serialization under .cache/abis, and an index maps ABI files (by
+# path, mtime and size) and compiled contract types (by name and bytecode) to their key, so the ABI of an unchanged
+# file or contract is neither parsed nor serialized again, in this process or the next ones.
+
+DEFAULT_CACHE_DIR = Path(".cache") / "abis"
+INDEX_FILE = "index.json"
+
+
+class AbiEntry(NamedTuple):
+    key: str
+    abi: list
+
+
+def canonical_abi(abi: list) -> str:
+    return json.dumps(abi, sort_keys=True)
+
+
+def abi_key_of(canonical: str) -> str:
+    return hashlib.sha1(canonical.encode("utf8")).hexdigest()
+
+
+def _contract_type_identity(contract_type: Any) -> str | None:
+    # interface only contract types (eg from abi files) have no bytecode and can't be told apart without their abi
+    bytecode = getattr(getattr(contract_type, "runtime_bytecode", None), "bytecode", None)
+    if not bytecode:
+        return None
+    return f"{contract_type.name}:{hashlib.sha1(str(bytecode).encode()).hexdigest()}"
+
+
+class AbiCache:
+    def __init__(self, path: Path | str = DEFAULT_CACHE_DIR):
+        self.path = Path(path)
+        self._abis: dict[str, list] = {}
+        self._by_type_id: dict[int, tuple[Any, AbiEntry]] = {}
+        index_file = self.path / INDEX_FILE
+        index = json.loads(index_file.read_text()) if index_file.exists() else {}
+        self._files: dict[str, list] = index.get("files", {})
+        self._contract_types: dict[str, str] = index.get("contract_types", {})
+
+    def _save_index(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"files": self._files, "contract_types": self._contract_types}, sort_keys=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path, prefix=".index.", delete=False) as f:
+            f.write(data)
+        Path(f.name).replace(self.path / INDEX_FILE)
+
+    def _abi(self, key: str) -> list | None:
+        if key not in self._abis:
+            abi_file = self.path / f"{key}.json"
+            if not abi_file.exists():
+                return None
+            self._abis[key] = json.loads(abi_file.read_text())
+        return self._abis[key]
+
+    def _store(self, abi: list) -> AbiEntry:
+        canonical = canonical_abi(abi)
+        key = abi_key_of(canonical)
+        abi_file = self.path / f"{key}.json"
+        if not abi_file.exists():
+            self.path.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.path, prefix=f".{key}.", delete=False) as f:
+                f.write(canonical)
+            Path(f.name).replace(abi_file)
+        self._abis[key] = abi
+        return AbiEntry(key, abi)
+
+    def for_file(self, filename: Path | str) -> AbiEntry:
+        """
+        Gets the ABI of a json ABI file, only parsed when the file changed since it was last cached.
+
+        Returns:
+            The ABI and its abi_key.
+        """
+        file = Path(filename)
+        stat = file.stat()
+        name = str(file.resolve())
+        cached = self._files.get(name)
+        if cached and cached[:2] == [stat.st_mtime_ns, stat.st_size] and (abi := self._abi(cached[2])) is not None:
+            return AbiEntry(cached[2], abi)
+
+        entry = self._store(json.loads(file.read_text()))
+        self._files[name] = [stat.st_mtime_ns, stat.st_size, entry.key]
+        self._save_index()
+        return entry
+
+    def for_contract_type(self, contract_type: Any) -> AbiEntry:
+        """
+        Gets the ABI of an ape ContractType, only built with `contract_type.dict()` for new contract types.
+
+        Returns:
+            The ABI and its abi_key.
+        """
+        if id(contract_type) in self._by_type_id:
+            return self._by_type_id[id(contract_type)][1]
+
+        identity = _contract_type_identity(contract_type)
+        key = self._contract_types.get(identity) if identity else None
+        abi = self._abi(key) if key else None
+        if abi is not None:
+            entry = AbiEntry(key, abi)
+        else:
+            entry = self._store(contract_type.dict()["abi"])
+            if identity:
+                self._contract_types[identity] = entry.key
+                self._save_index()
+
+        # the contract type is kept so its id can't be reused by another object
+        self._by_type_id[id(contract_type)] = (contract_type, entry)
+        return entry
+
+
+_caches: dict[Path, AbiCache] = {}
+
+
+def get_abi_cache() -> AbiCache:
+    """
+    Gets the cache under .cache/abis of the working directory.
+
+    Returns:
+        The cache shared by deployment and publishing.
+    """
+    path = Path.cwd() / DEFAULT_CACHE_DIR
+    if path not in _caches:
+        _caches[path] = AbiCache(path)
+    return _caches[path]
@@ -1,24 +1,39 @@
 # ruff: noqa: PLR6301, ARG002
 
-import hashlib
-import json
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any
+from typing import Any, ClassVar
 
+from ape.api import TransactionAPI
+from ape.api.address import BaseAddress
 from ape.contracts.base import ContractContainer, ContractInstance
 from ape_accounts.accounts import KeyfileAccount
 from rich import print as rprint
 from rich.markup import escape
 
+from .abi_cache import abi_key_of, canonical_abi, get_abi_cache
+from .submitter import TransactionSubmitter
+
 Environment = Enum("Environment", ["local", "dev", "int", "prod"])
 
+_lazy_loading = ContextVar("lazy_loading", default=False)
+
+
+@contextmanager
+def lazy_loading() -> Iterator[None]:
+    """Contracts loaded inside the block are only resolved (`container.at`) on first access to `contract`."""
+    token = _lazy_loading.set(True)
+    try:
+        yield
+    finally:
+        _lazy_loading.reset(token)
+
 
 def abi_key(abi: list) -> str:
-    json_dump = json.dumps(abi, sort_keys=True)
-    _hash = hashlib.sha1(json_dump.encode("utf8"))
-    return _hash.hexdigest()
+    return abi_key_of(canonical_abi(abi))
 
 
 @dataclass
@@ -30,6 +45,8 @@ class DeploymentContext:
     config: dict[str, Any] = field(default_factory=dict)
     gas_func: Callable | None = None
     dryrun: bool = False
+    prefetched_reads: dict[tuple, Any] = field(default_factory=dict)
+    submitter: TransactionSubmitter | None = None
 
     def __getitem__(self, key):
         if key in self.contracts:
@@ -63,6 +80,8 @@ class ContractConfig:
     nft: bool = False
     token: bool = False
 
+    concurrent_deploy: ClassVar[bool] = True
+
     def deployable(self, context: DeploymentContext) -> bool:
         return True
 
@@ -83,6 +102,8 @@ class ContractConfig:
         return self.config_deps
 
     def address(self):
+        if self.is_lazy():
+            return self.__dict__["_lazy_address"]
         return self.contract.address if self.contract else None
 
     def container_name(self):
@@ -92,12 +113,27 @@ class ContractConfig:
         return self.key
 
     def __repr__(self):
-        return f"Contract[key={self.key}, contract={self.contract}, container_name={self.container_name()}]"
+        contract = f"<lazy {self.address()}>" if self.is_lazy() else self.contract
+        return f"Contract[key={self.key}, contract={contract}, container_name={self.container_name()}]"
+
+    def __getattr__(self, name):
+        # only called for attributes not set, ie the contract of a lazily loaded config
+        if name == "contract" and "_lazy_address" in self.__dict__:
+            self.contract = self.container.at(self.__dict__.pop("_lazy_address"))
+            return self.contract
+        raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+
+    def is_lazy(self) -> bool:
+        return "contract" not in self.__dict__ and "_lazy_address" in self.__dict__
 
     def load_contract(self, address: str):
-        self.contract = self.container.at(address)
+        if _lazy_loading.get():
+            self.__dict__.pop("contract", None)
+            self._lazy_address = address
+        else:
+            self.contract = self.container.at(address)
 
-    def deploy(self, context: DeploymentContext):
+    def _announce_deploy(self, context: DeploymentContext) -> dict[str, Any]:
         if self.contract is not None:
             rprint(
                 f"[dark_orange bold]WARNING[/]: Deployment will override contract [blue bold]{self.key}[/] at {self.contract}"
@@ -110,13 +146,54 @@ class ContractConfig:
         rprint(
             f"Deploying [blue]{self.key}[/blue] <- {self.container_name()}.deploy({', '.join(str(a) for a in print_args)}, {kwargs_str})"  # noqa: E501
         )
-
         if not context.dryrun:
             deploy_args = self.container.constructor.encode_input(*self.deployment_args_values(context))
             rprint(f"Deployment args for [blue]{self.key}[/]: [bright_black]{deploy_args.hex()}[/]")
+        return kwargs
+
+    def deploy(self, context: DeploymentContext):
+        kwargs = self._announce_deploy(context)
+        if not context.dryrun:
+            self.set_deployed(self.container.deploy(*self.deployment_args_values(context), **kwargs))
+
+    def deployment_transaction(self, context: DeploymentContext) -> TransactionAPI:
+        """
+        Builds the deployment transaction, sent along the other deployments of its level by `deploy_levels`.
 
-            self.contract = self.container.deploy(*self.deployment_args_values(context), **kwargs)
-            self.abi_key = abi_key(self.contract.contract_type.dict()["abi"])
+        Returns:
+            The unsigned transaction.
+        """
+        kwargs = self._announce_deploy(context)
+        return self.container(*self.deployment_args_values(context), **kwargs)
+
+    def set_deployed(self, contract: ContractInstance):
+        self.contract = contract
+        self.abi_key = get_abi_cache().for_contract_type(self.contract.contract_type).key
+
+
+class LazyContract(BaseAddress):
+    """
+    Stands for the contract of a ContractConfig, resolved on first attribute access, eg in the console globals. As a
+    BaseAddress it converts to its address (eg as a call argument or sender) without resolving the contract.
+    """
+
+    __slots__ = ("config",)
+
+    def __init__(self, config: ContractConfig):
+        self.config = config
+
+    @property
+    def address(self):
+        return self.config.address()
+
+    def __getattr__(self, name):
+        return getattr(self.config.contract, name)
+
+    def __call__(self, *args, **kwargs):
+        return self.config.contract(*args, **kwargs)
+
+    def __repr__(self):
+        return repr(self.config.contract) if not self.config.is_lazy() else f"<{self.config.key} {self.config.address()}>"
 
 
 @dataclass
@@ -124,6 +201,9 @@ class MinimalProxy(ContractConfig):
     impl: str = ""
     factory_func: str = "create_proxy"
 
+    # the proxy address is the return value of the factory call, only available through `deploy`
+    concurrent_deploy: ClassVar[bool] = False
+
     def deploy(self, context: DeploymentContext):
         if self.contract is not None:
             rprint(
@@ -141,5 +221,4 @@ class MinimalProxy(ContractConfig):
 
         if not context.dryrun:
             tx = impl_contract.invoke_transaction(self.factory_func, *self.deployment_args_values(context), **kwargs)
-            self.contract = self.container.at(tx.return_value)
-            self.abi_key = abi_key(self.contract.contract_type.dict()["abi"])
+            self.set_deployed(self.container.at(tx.return_value))
@@ -0,0 +1,205 @@
+import copy
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, NamedTuple, TypedDict
+
+# Single access point to the json files of configs/<env>/<chain>. Each file is parsed once and the parsed value is
+# reused while the file mtime and size don't change; when they do, the content hash decides whether the file is
+# parsed again, so touching a file without changing it costs a read but no parse. Values returned by `read` and the
+# views are shared and must not be mutated, changes go through `write` or `edit`, which replace the file atomically.
+
+P2P_FILE = "p2p.json"
+TRACKING_FILE = "tracking.json"
+COLLECTIONS_FILE = "collections.json"
+TOKENS_FILE = "tokens.json"
+CONTRACT_SCOPES = ["common", "p2p"]
+
+
+class ContractEntry(TypedDict, total=False):
+    contract: str
+    address: str
+    abi_key: str
+    version: str
+    properties: dict[str, Any]
+    properties_addresses: dict[str, str]
+
+
+class TrackingEntry(TypedDict, total=False):
+    name: str
+    address: str
+    abi_file: str
+
+
+class _CachedFile(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: bytes
+    value: Any
+
+
+def dump_config(value: Any) -> str:
+    return json.dumps(value, indent=4, sort_keys=True)
+
+
+class ConfigStore:
+    """Config files of an environment and chain. `parses` counts the files actually parsed, for diagnostics."""
+
+    def __init__(self, env_name: str, chain: str, *, root: Path | str | None = None):
+        self.env_name = env_name
+        self.chain = chain
+        self.path = Path(root or Path.cwd() / "configs") / env_name / chain
+        self.parses = 0
+        self._cache: dict[str, _CachedFile] = {}
+
+    def file(self, name: str) -> Path:
+        return self.path / name
+
+    def read(self, name: str) -> Any:
+        """
+        Parses `name`, unless it's unchanged since the last read.
+
+        Returns:
+            The parsed content, shared between callers.
+        """
+        file = self.file(name)
+        stat = file.stat()
+        cached = self._cache.get(name)
+        if cached and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+            return cached.value
+
+        data = file.read_bytes()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if cached and cached.digest == digest:
+            value = cached.value
+        else:
+            value = json.loads(data)
+            self.parses += 1
+        self._cache[name] = _CachedFile(stat.st_mtime_ns, stat.st_size, digest, value)
+        return value
+
+    def _replace(self, name: str, chunks: Iterable[bytes]) -> bytes:
+        file = self.file(name)
+        digest = hashlib.blake2b(digest_size=16)
+        with tempfile.NamedTemporaryFile("wb", dir=file.parent, prefix=f".{name}.", delete=False) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                digest.update(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_file = Path(f.name)
+        tmp_file.chmod(file.stat().st_mode if file.exists() else 0o644)
+        tmp_file.replace(file)
+        return digest.digest()
+
+    def write(self, name: str, value: Any):
+        """Replaces `name` atomically, with the formatting used for all config files."""
+        digest = self._replace(name, [dump_config(value).encode()])
+        stat = self.file(name).stat()
+        self._cache[name] = _CachedFile(stat.st_mtime_ns, stat.st_size, digest, value)
+
+    def write_entries(self, name: str, entries: Iterable[tuple[str, Any]]):
+        """
+        Replaces `name` with the object made of `entries`, formatted as `write`. Each value is serialized as it is
+        consumed, but the serialized entries are all held in memory until they're written, as the file is in key
+        order.
+
+        Raises:
+            ValueError: On a repeated key.
+        """
+        fragments = {}
+        for key, value in entries:
+            if key in fragments:
+                raise ValueError(f"Duplicate key {key} in the entries of {name}")
+            fragments[key] = dump_config(value).replace("\n", "\n    ")
+        if not fragments:
+            self.write(name, {})
+            return
+
+        def chunks():
+            yield b"{\n"
+            for i, key in enumerate(sorted(fragments)):
+                separator = ",\n" if i else ""
+                yield f"{separator}    {json.dumps(key)}: {fragments[key]}".encode()
+            yield b"\n}"
+
+        self._replace(name, chunks())
+        self._cache.pop(name, None)
+
+    def edit(self, name: str) -> "_ConfigEdit":
+        """
+        Edits `name` in a with block, the copy is written back on exit unless an exception is raised.
+
+        Returns:
+            A context manager yielding a private copy of `name`.
+        """
+        return _ConfigEdit(self, name)
+
+    # typed views
+
+    def contracts(self) -> dict[str, ContractEntry]:
+        """
+        Lists the contracts of p2p.json.
+
+        Returns:
+            The contracts keyed as `<scope>.<name>`, eg `p2p.usdc_nfts`.
+        """
+        config = self.read(P2P_FILE)
+        return {f"{scope}.{name}": entry for scope in CONTRACT_SCOPES for name, entry in config[scope].items()}
+
+    def p2p_contracts(self) -> dict[str, ContractEntry]:
+        return self.read(P2P_FILE)["p2p"]
+
+    def configs(self) -> dict[str, Any]:
+        """
+        Reads the `configs` section of p2p.json.
+
+        Returns:
+            The configs keyed as `configs.<name>`, as used in the deployment context.
+        """
+        return {f"configs.{k}": v for k, v in self.read(P2P_FILE).get("configs", {}).items()}
+
+    def trait_roots(self) -> dict[str, str]:
+        return self.read(P2P_FILE).get("configs", {}).get("trait_roots", {})
+
+    def tracking(self) -> dict[str, TrackingEntry]:
+        return self.read(TRACKING_FILE)
+
+    def collections(self) -> dict[str, dict[str, Any]]:
+        return self.read(COLLECTIONS_FILE)
+
+    def tokens(self) -> dict[str, dict[str, Any]]:
+        return self.read(TOKENS_FILE)
+
+
+class _ConfigEdit:
+    def __init__(self, store: ConfigStore, name: str):
+        self.store = store
+        self.name = name
+
+    def __enter__(self) -> Any:
+        self.value = copy.deepcopy(self.store.read(self.name))
+        return self.value
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.store.write(self.name, self.value)
+
+
+_stores: dict[tuple[str, str, Path], ConfigStore] = {}
+
+
+def get_config_store(env_name: str, chain: str) -> ConfigStore:
+    """
+    Gets the store of the configs of `env_name` and `chain`.
+
+    Returns:
+        The store shared by every script of the process.
+    """
+    key = (env_name, chain, Path.cwd())
+    if key not in _stores:
+        _stores[key] = ConfigStore(env_name, chain)
+    return _stores[key]
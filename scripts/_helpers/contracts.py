@@ -9,17 +9,16 @@ from hexbytes import HexBytes
 from rich import print
 from rich.markup import escape
 
-from .basetypes import ContractConfig, DeploymentContext, abi_key
-from .transactions import check_owner, execute, execute_read
+from .abi_cache import get_abi_cache
+from .basetypes import ContractConfig, DeploymentContext
+from .transactions import check_owner, execute, execute_read, prefetched
 
 ZERO_ADDRESS = "0x" + "00" * 20
 ZERO_BYTES32 = "0x" + "00" * 32
 
 
 def calculate_abi_key(filename: str) -> str:
-    with open(filename, "r") as f:
-        abi = json.load(f)
-    return abi_key(abi)
+    return get_abi_cache().for_file(filename).key
 
 
 class GenericContract(ContractConfig):
@@ -72,7 +71,17 @@ class P2PLendingControl(ContractConfig):
 
     @check_owner
     def set_trait_roots(self, context: DeploymentContext):
-        trait_roots = context[self.trait_roots_key]
+        self.update_trait_roots(context, context[self.trait_roots_key])
+
+    @check_owner
+    def update_trait_roots(self, context: DeploymentContext, trait_roots: dict[str, str]):
+        collection_hashes = [] if context.dryrun else [(self.get_collection_hash(c),) for c in trait_roots]
+        reads = [(self.key, "trait_roots", args) for args in collection_hashes]
+        reads += [(self.key, "contracts", args) for args in collection_hashes]
+        with prefetched(context, reads):
+            self._update_trait_roots(context, trait_roots)
+
+    def _update_trait_roots(self, context: DeploymentContext, trait_roots: dict[str, str]):
         roots_to_update = [
             (self.get_collection_hash(collection), "0x" + root)
             for collection, root in trait_roots.items()
@@ -24,7 +24,7 @@ class DependencyManager:
 
     def _build_deployment_set(self):
         dependencies = self.deployment_dependencies
-        undeployed = {k for k, c in self.context.contracts.items() if c.deployable(self.context) and c.contract is None}
+        undeployed = {k for k, c in self.context.contracts.items() if c.deployable(self.context) and c.address() is None}
         nodes = set(self.context.contracts.keys()) | set(self.context.config.keys())
         starting_set = self.changed | undeployed
         vis = dict.fromkeys(nodes, False)
@@ -49,6 +49,11 @@ class DependencyManager:
         internal_deployable_sorted = list(sorted_dependencies)
         self.deployment_order = internal_deployable_sorted
 
+    def restrict(self, keys: set[str]):
+        """Limits the plan to the deployments and config transactions of `keys`, eg one of the independent plans."""
+        self.deployment_set &= keys
+        self.transaction_set = {k: txs for k, txs in self.transaction_set.items() if k in keys}
+
     def build_transaction_set(self) -> set[Callable]:
         tx_set = {tx for k, txs in self.transaction_set.items() for tx in txs}
         # workaround to deal with partial functions
@@ -58,6 +63,26 @@ class DependencyManager:
     def build_contract_deploy_set(self) -> list[ContractConfig]:
         return [self.context.contracts[k] for k in self.deployment_order if k in self.deployment_set]
 
+    def build_contract_deploy_levels(self) -> list[list[ContractConfig]]:
+        """
+        Groups the contracts to deploy by depth in the dependency graph, each level only depending on contracts of the
+        previous levels or not being deployed, so the contracts of a level can be deployed concurrently.
+
+        Returns:
+            The contracts of each level.
+        """
+        depth = dict.fromkeys(self.deployment_order, 0)
+        for k in self.deployment_order:
+            step = 1 if k in self.deployment_set else 0
+            for dependent in self.deployment_dependencies.get(k, set()):
+                depth[dependent] = max(depth[dependent], depth[k] + step)
+
+        levels = defaultdict(list)
+        for k in self.deployment_order:
+            if k in self.deployment_set:
+                levels[depth[k]].append(self.context.contracts[k])
+        return [levels[d] for d in sorted(levels)]
+
 
 def topological_sort(dependencies: dict[str, set[str]]) -> list[str]:
     nodes = set(dependencies.keys()) | {w for v in dependencies.values() for w in v}
@@ -1,20 +1,30 @@
-import json
+import copy
 import logging
 import os
 import warnings
+from contextlib import nullcontext
 from enum import Enum
 from pathlib import Path
 from typing import Any
 
 from ape import accounts
+from ape.api.accounts import ImpersonatedAccount
+from rich import print
 
 from . import contracts as contracts_module
 from .basetypes import (
     ContractConfig,
     DeploymentContext,
     Environment,
+    lazy_loading,
 )
+from .config_store import CONTRACT_SCOPES, P2P_FILE, get_config_store
 from .dependency import DependencyManager
+from .parallel_deploy import deploy_levels
+from .simulation import GasReport, simulate
+from .submitter import TransactionSubmitter, print_outcomes
+from .traits import diff_trait_roots
+from .transactions import config_reads, prefetched
 
 ENV = Environment[os.environ.get("ENV", "local")]
 
@@ -29,94 +39,76 @@ class Context(Enum):
 
 
 def load_contracts(env: Environment, chain: str) -> list[ContractConfig]:
-    config_file = Path.cwd() / "configs" / env.name / chain / "p2p.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
-
     return [
         contracts_module.__dict__[c["contract"]](
-            key=f"{scope}.{name}", address=c.get("address"), abi_key=c.get("abi_key"), **c.get("properties", {})
+            key=key, address=c.get("address"), abi_key=c.get("abi_key"), **c.get("properties", {})
         )
-        for scope in ["common", "p2p"]
-        for name, c in config[scope].items()
+        for key, c in get_config_store(env.name, chain).contracts().items()
     ]
 
 
 def store_contracts(env: Environment, chain: str, contracts: list[ContractConfig]):
-    config_file = Path.cwd() / "configs" / env.name / chain / "p2p.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
-
     contracts_dict = {c.key: c for c in contracts}
-    for scope in ["common", "p2p"]:
-        for name, c in config[scope].items():
-            key = f"{scope}.{name}"
-            if key in contracts_dict:
-                c["address"] = contracts_dict[key].address()
-                if contracts_dict[key].abi_key:
-                    c["abi_key"] = contracts_dict[key].abi_key
-                if contracts_dict[key].version:
-                    c["version"] = contracts_dict[key].version
-            properties = c.get("properties", {})
-            addresses = c.get("properties_addresses", {})
-            for prop_key, prop_val in properties.items():
-                if prop_key.endswith("_key") and prop_val in contracts_dict:
-                    addresses[prop_key[:-4]] = contracts_dict[prop_val].address()
-            c["properties_addresses"] = addresses
-
-    with open(config_file, "w") as f:
-        f.write(json.dumps(config, indent=4, sort_keys=True))
+    with get_config_store(env.name, chain).edit(P2P_FILE) as config:
+        for scope in CONTRACT_SCOPES:
+            for name, c in config[scope].items():
+                key = f"{scope}.{name}"
+                if key in contracts_dict:
+                    c["address"] = contracts_dict[key].address()
+                    if contracts_dict[key].abi_key:
+                        c["abi_key"] = contracts_dict[key].abi_key
+                    if contracts_dict[key].version:
+                        c["version"] = contracts_dict[key].version
+                properties = c.get("properties", {})
+                addresses = c.get("properties_addresses", {})
+                for prop_key, prop_val in properties.items():
+                    if prop_key.endswith("_key") and prop_val in contracts_dict:
+                        addresses[prop_key[:-4]] = contracts_dict[prop_val].address()
+                c["properties_addresses"] = addresses
 
 
 def load_nft_contracts(env: Environment, chain: str) -> list[ContractConfig]:
-    config_file = Path.cwd() / "configs" / env.name / chain / "collections.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
-
     return [
         contracts_module.__dict__[c.get("contract_def", "ERC721")](
             key=key,
             address=c.get("contract_address"),
             abi_key=c.get("abi_key"),
         )
-        for key, c in config.items()
+        for key, c in get_config_store(env.name, chain).collections().items()
     ]
 
 
 def load_tokens(env: Environment, chain: str) -> list[ContractConfig]:
-    config_file = Path.cwd() / "configs" / env.name / chain / "tokens.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
-
     return [
         contracts_module.__dict__[c.get("contract_def", "ERC20External")](
             key=f"common.{name}", address=c.get("address"), abi_key=c.get("abi_key")
         )
-        for name, c in config.items()
+        for name, c in get_config_store(env.name, chain).tokens().items()
     ]
 
 
 def load_configs(env: Environment, chain: str) -> dict:
-    config_file = Path.cwd() / "configs" / env.name / chain / "p2p.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
+    return copy.deepcopy(get_config_store(env.name, chain).configs())
 
-    _configs = config.get("configs", {})
-    return {f"configs.{k}": v for k, v in _configs.items()}
 
+def store_configs(env: Environment, chain: str, configs: dict[str, Any]):
+    with get_config_store(env.name, chain).edit(P2P_FILE) as config:
+        config["configs"] = {k.removeprefix("configs."): v for k, v in configs.items()}
 
-def load_tracking(env: Environment, chain: str) -> dict:
-    config_file = Path.cwd() / "configs" / env.name / chain / "tracking.json"
-    with config_file.open(encoding="utf8") as f:
-        config = json.load(f)
 
-    return dict(config.items())
+def load_tracking(env: Environment, chain: str) -> dict:
+    return copy.deepcopy(get_config_store(env.name, chain).tracking())
 
 
 class DeploymentManager:
-    def __init__(self, env: Environment, chain: str, context: Context = Context.DEPLOYMENT):
+    def __init__(self, env: Environment, chain: str, context: Context = Context.DEPLOYMENT, *, lazy: bool = False):
+        """
+        With `lazy`, contracts with a known address are only resolved when their `contract` is first accessed, so
+        scripts only pay for the contracts they use instead of every collection and token in the configs.
+        """
         self.env = env
         self.chain = chain
+        self.lazy = lazy
         match env:
             case Environment.local:
                 self.owner = accounts.test_accounts[0]
@@ -130,9 +122,10 @@ class DeploymentManager:
         self.tracking = self._get_tracking()
 
     def _get_contracts(self, context: Context) -> dict[str, ContractConfig]:
-        contracts = load_contracts(self.env, self.chain)
-        nfts = load_nft_contracts(self.env, self.chain)
-        tokens = load_tokens(self.env, self.chain)
+        with lazy_loading() if self.lazy else nullcontext():
+            contracts = load_contracts(self.env, self.chain)
+            nfts = load_nft_contracts(self.env, self.chain)
+            tokens = load_tokens(self.env, self.chain)
         all_contracts = contracts + nfts + tokens
 
         # always deploy everything in local
@@ -151,25 +144,89 @@ class DeploymentManager:
     def _save_state(self):
         store_contracts(self.env, self.chain, list(self.context.contracts.values()))
 
-    def deploy(self, changes: set[str], *, dryrun=False, save_state=True):
-        self.owner.set_autosign(True) if self.env != Environment.local else None
+    def _save_configs(self):
+        store_configs(self.env, self.chain, self.context.config)
+
+    def _autosign(self):
+        # impersonated owners, eg in simulations, don't sign
+        if self.env != Environment.local and not isinstance(self.owner, ImpersonatedAccount):
+            self.owner.set_autosign(True)
+
+    def deploy(self, changes: set[str], *, dryrun=False, save_state=True, only: set[str] | None = None):
+        self._autosign()
         self.context.dryrun = dryrun
         dependency_manager = DependencyManager(self.context, changes)
-        contracts_to_deploy = dependency_manager.build_contract_deploy_set()
+        if only is not None:
+            dependency_manager.restrict(only)
+        deploy_levels(self.context, dependency_manager.build_contract_deploy_levels())
         dependencies_tx = dependency_manager.build_transaction_set()
 
-        for contract in contracts_to_deploy:
-            if contract.deployable(self.context):
-                contract.deploy(self.context)
-
         if save_state and not dryrun:
             self._save_state()
 
-        for dependency_tx in dependencies_tx:
-            dependency_tx(self.context)
+        reads = [read for tx in dependencies_tx for read in config_reads(tx, self.context)]
+        # config transactions are broadcast back to back and their receipts awaited together
+        self.context.submitter = TransactionSubmitter(self.owner) if not dryrun else None
+        try:
+            with prefetched(self.context, reads):
+                for dependency_tx in dependencies_tx:
+                    dependency_tx(self.context)
+            if self.context.submitter is not None:
+                print_outcomes(self.context.submitter.wait())
+        finally:
+            self.context.submitter = None
 
         if save_state and not dryrun:
             self._save_state()
 
     def deploy_all(self, *, dryrun=False, save_state=True):
         self.deploy(self.context.contract.keys(), dryrun=dryrun, save_state=save_state)
+
+    def simulate(
+        self,
+        changes: set[str],
+        *,
+        state_file: Path | None = None,
+        fork_url: str | None = None,
+        fork_block: int | None = None,
+        workers: int | None = None,
+    ) -> GasReport:
+        """
+        Replays the deployment plan of `changes` on local anvil nodes, started from `state_file` or forking
+        `fork_url`, one worker process per independent sub-plan.
+
+        Returns:
+            The gas of each deployment and transaction.
+        """
+        dependency_manager = DependencyManager(self.context, changes)
+        return simulate(
+            dependency_manager, changes, state_file=state_file, fork_url=fork_url, fork_block=fork_block, workers=workers
+        )
+
+    def update_trait_roots(self, trait_roots: dict[str, str], *, dryrun=False, save_state=True) -> dict[str, str]:
+        """
+        Sets the trait roots of the collections in `trait_roots` whose root differs from configs.trait_roots, so only
+        the changed collections are checked and sent to P2PLendingControl.change_collections_trait_roots.
+
+        Returns:
+            The changed roots.
+        """
+        self._autosign()
+        self.context.dryrun = dryrun
+        changed = {}
+        for control in self.context.contracts.values():
+            if not isinstance(control, contracts_module.P2PLendingControl):
+                continue
+            control_changes = diff_trait_roots(self.context[control.trait_roots_key], trait_roots)
+            if not control_changes:
+                print(f"Contract [blue]{control.key}[/] trait roots are up to date, skipping update")
+                continue
+            control.update_trait_roots(self.context, control_changes)
+            if not dryrun:
+                self.context.config[control.trait_roots_key] = self.context[control.trait_roots_key] | control_changes
+            changed |= control_changes
+
+        if save_state and not dryrun and changed:
+            self._save_configs()
+
+        return changed
@@ -0,0 +1,235 @@
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any
+
+# Diff based publishing of items to DynamoDB. The current items are read with batch_get_item (100 keys per request)
+# and only the attributes that differ are written, with one update_item per changed item, sent from a bounded thread
+# pool. Updates for the same item are merged first, so eg a collection trait root and whitelisting are one write.
+# Throttling and transient errors are retried with exponential backoff and jitter. Works with any boto3 DynamoDB
+# service resource, including moto. Resources are not thread safe, so the worker threads only use the low level client
+# of the resource (`meta.client`), which is, and which still takes and returns python values like the resource.
+# Tables are read with parallel segmented scans, each segment paginated by its own worker and the pages handed over
+# through a bounded queue, so items can be consumed as they arrive without holding the whole table.
+
+BATCH_GET_MAX_KEYS = 100
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_SCAN_SEGMENTS = 4
+RETRYABLE_ERRORS = {
+    "InternalServerError",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "ThrottlingException",
+}
+
+
+@dataclass
+class ItemUpdate:
+    table: str
+    key: dict[str, Any]
+    attributes: dict[str, Any]
+
+
+@dataclass
+class PublishResult:
+    updated: list[ItemUpdate] = field(default_factory=list)
+    unchanged: list[ItemUpdate] = field(default_factory=list)
+    failed: list[tuple[ItemUpdate, Exception]] = field(default_factory=list)
+
+
+def _key_id(table: str, key: dict[str, Any]) -> tuple:
+    return table, tuple(sorted(key.items()))
+
+
+def _chunks(values: list, size: int) -> Iterable[list]:
+    it = iter(values)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _error_code(error: Exception) -> str | None:
+    return getattr(error, "response", {}).get("Error", {}).get("Code")
+
+
+def merge_updates(updates: Iterable[ItemUpdate]) -> list[ItemUpdate]:
+    """
+    Merges the updates of the same item, later attributes taking precedence.
+
+    Returns:
+        One update per item, in the order the items were first updated.
+    """
+    merged: dict[tuple, ItemUpdate] = {}
+    for update in updates:
+        key_id = _key_id(update.table, update.key)
+        if key_id in merged:
+            merged[key_id].attributes |= update.attributes
+        else:
+            merged[key_id] = ItemUpdate(update.table, dict(update.key), dict(update.attributes))
+    return list(merged.values())
+
+
+def changed_attributes(current: dict[str, Any] | None, attributes: dict[str, Any]) -> dict[str, Any]:
+    # numbers are read back as Decimal, which compare equal to the ints they were written from
+    current = current or {}
+    return {k: v for k, v in attributes.items() if k not in current or current[k] != v}
+
+
+class DiffPublisher:
+    def __init__(
+        self,
+        dynamodb: Any,
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = 0.1,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.dynamodb = dynamodb
+        self.client = dynamodb.meta.client
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.sleep = sleep
+
+    def _backoff(self, attempt: int):
+        self.sleep(self.base_delay * 2**attempt * (1 + random.random()))
+
+    def _with_retry(self, f: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_attempts):
+            try:
+                return f()
+            except Exception as e:
+                if _error_code(e) not in RETRYABLE_ERRORS or attempt == self.max_attempts - 1:
+                    raise
+                self._backoff(attempt)
+        return None
+
+    def fetch(self, table: str, keys: list[dict[str, Any]]) -> dict[tuple, dict[str, Any]]:
+        """
+        Fetches the current items of `table` with the given keys, missing items are not returned.
+
+        Returns:
+            The items keyed as _key_id.
+
+        Raises:
+            RuntimeError: If some keys are still unprocessed after `max_attempts` batches.
+        """
+        key_attributes = {k for key in keys for k in key}
+        items = {}
+        for chunk in _chunks(list({_key_id(table, k): k for k in keys}.values()), BATCH_GET_MAX_KEYS):
+            request = {table: {"Keys": chunk}}
+            for attempt in range(self.max_attempts):
+                response = self._with_retry(lambda request=request: self.dynamodb.batch_get_item(RequestItems=request))
+                for item in response.get("Responses", {}).get(table, []):
+                    items[_key_id(table, {k: item[k] for k in key_attributes})] = item
+                request = response.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+                self._backoff(attempt)
+            if request:
+                raise RuntimeError(f"Keys of {table} still unprocessed after {self.max_attempts} attempts")
+        return items
+
+    def diff(self, updates: Iterable[ItemUpdate]) -> tuple[list[ItemUpdate], list[ItemUpdate]]:
+        """
+        Splits the merged updates into the ones changing their item and the rest.
+
+        Returns:
+            The changing updates, with only the changed attributes, and the unchanged ones.
+        """
+        updates = merge_updates(updates)
+        by_table = defaultdict(list)
+        for update in updates:
+            by_table[update.table].append(update)
+
+        changed, unchanged = [], []
+        for table, table_updates in by_table.items():
+            current = self.fetch(table, [u.key for u in table_updates])
+            for update in table_updates:
+                attributes = changed_attributes(current.get(_key_id(table, update.key)), update.attributes)
+                if attributes:
+                    changed.append(ItemUpdate(table, update.key, attributes))
+                else:
+                    unchanged.append(update)
+        return changed, unchanged
+
+    def _update_item(self, update: ItemUpdate):
+        names = {f"#k{i}": k for i, k in enumerate(update.attributes)}
+        values = {f":v{i}": v for i, v in enumerate(update.attributes.values())}
+        self._with_retry(
+            lambda: self.client.update_item(
+                TableName=update.table,
+                Key=update.key,
+                UpdateExpression="SET " + ", ".join(f"#k{i}=:v{i}" for i in range(len(names))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+        )
+
+    def publish(self, updates: Iterable[ItemUpdate]) -> PublishResult:
+        changed, unchanged = self.diff(updates)
+        result = PublishResult(unchanged=unchanged)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(update, executor.submit(self._update_item, update)) for update in changed]
+        for update, future in futures:
+            if (error := future.exception()) is not None:
+                result.failed.append((update, error))
+            else:
+                result.updated.append(update)
+        return result
+
+
+def parallel_scan(table: Any, *, segments: int = DEFAULT_SCAN_SEGMENTS, **scan_kwargs: Any) -> Iterator[dict[str, Any]]:
+    """
+    Scans a boto3 `table` with `segments` concurrent workers. `scan_kwargs` are passed to every scan, eg
+    `FilterExpression` to filter items server side.
+
+    Yields:
+        The items of the table as their pages arrive, in no particular order.
+    """
+    client = table.meta.client
+    pages: queue.Queue = queue.Queue(maxsize=2 * segments)
+    stopped = threading.Event()
+    done = object()
+
+    def put(value: Any):
+        while not stopped.is_set():
+            with suppress(queue.Full):
+                pages.put(value, timeout=0.1)
+                return
+
+    def scan_segment(segment: int):
+        try:
+            kwargs = scan_kwargs | {"TableName": table.name, "Segment": segment, "TotalSegments": segments}
+            while not stopped.is_set():
+                response = client.scan(**kwargs)
+                put(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [executor.submit(scan_segment, segment) for segment in range(segments)]
+        try:
+            pending = segments
+            while pending:
+                page = pages.get()
+                if page is done:
+                    pending -= 1
+                else:
+                    yield from page
+        finally:
+            stopped.set()
+    for future in futures:
+        future.result()
@@ -0,0 +1,17 @@
+from enum import IntEnum
+
+# Flags of P2PLendingNfts, with the values vyper gives the flag members (1 << declaration index), so they compare
+# equal to the offer_type and fee_type fields of decoded offers, loans and events.
+
+
+class OfferType(IntEnum):
+    TOKEN = 1 << 0
+    COLLECTION = 1 << 1
+    TRAIT = 1 << 2
+
+
+class FeeType(IntEnum):
+    PROTOCOL = 1 << 0
+    ORIGINATION = 1 << 1
+    LENDER_BROKER = 1 << 2
+    BORROWER_BROKER = 1 << 3
@@ -0,0 +1,69 @@
+import math
+import statistics
+from enum import Enum
+from typing import Any
+
+# EIP-1559 fees for DeploymentContext.gas_func, from eth_feeHistory over the last blocks. The priority fee is the
+# median, over those blocks, of the reward percentile matching the target speed, and the max fee covers the next
+# base fee growing at its maximum rate (12.5% per block) for as many blocks as the speed tolerates, so transactions
+# pay the current base fee plus a market priority fee instead of a fixed gas price. The history is only sampled
+# again when a new block is seen. Chains without base fee get their legacy gas price.
+
+BASE_FEE_MAX_CHANGE = 1.125
+DEFAULT_HISTORY_BLOCKS = 20
+
+
+class Speed(Enum):
+    # reward percentile, blocks of base fee growth covered by the max fee
+    slow = (10, 6)
+    standard = (50, 3)
+    fast = (90, 1)
+
+
+class FeeOracle:
+    def __init__(
+        self,
+        web3: Any,
+        *,
+        speed: Speed = Speed.standard,
+        history_blocks: int = DEFAULT_HISTORY_BLOCKS,
+        min_priority_fee: int = 10**6,
+        max_fee_cap: int | None = None,
+    ):
+        self.web3 = web3
+        self.speed = speed
+        self.history_blocks = history_blocks
+        self.min_priority_fee = min_priority_fee
+        self.max_fee_cap = max_fee_cap
+        self._cached: tuple[int, dict[str, int]] | None = None
+
+    def _estimate(self) -> dict[str, int]:
+        percentile, growth_blocks = self.speed.value
+        history = self.web3.eth.fee_history(self.history_blocks, "latest", [percentile])
+        base_fees = history.get("baseFeePerGas") or []
+        if not base_fees or not base_fees[-1]:
+            return {"gas_price": self.web3.eth.gas_price}
+
+        # the last base fee is the one of the next block
+        rewards = [r[0] for r in history.get("reward") or [] if r]
+        priority_fee = max(int(statistics.median(rewards)) if rewards else 0, self.min_priority_fee)
+        max_fee = math.ceil(base_fees[-1] * BASE_FEE_MAX_CHANGE**growth_blocks) + priority_fee
+        if self.max_fee_cap is not None:
+            max_fee = min(max_fee, self.max_fee_cap)
+            priority_fee = min(priority_fee, max_fee)
+        return {"max_fee": max_fee, "max_priority_fee": priority_fee}
+
+    def fees(self) -> dict[str, int]:
+        """
+        Estimates the fees of the current block, sampled once per block.
+
+        Returns:
+            The transaction fee kwargs for ape.
+        """
+        block = self.web3.eth.block_number
+        if self._cached is None or self._cached[0] != block:
+            self._cached = (block, self._estimate())
+        return dict(self._cached[1])
+
+    def __call__(self, context: Any = None) -> dict[str, int]:  # noqa: ARG002 gas_func signature
+        return self.fees()
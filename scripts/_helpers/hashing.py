@@ -0,0 +1,83 @@
+from collections.abc import Iterable
+from typing import Any
+
+from eth_utils import keccak
+
+# Native counterparts of the pure hashing functions in P2PLendingNfts.vy (_compute_loan_id,
+# _compute_signed_offer_id and _loan_state_hash). Loans, fees, offers and signatures are taken as
+# tuples in contract field order, so both the test and the console namedtuples can be used.
+
+WORD_SIZE = 32
+LOAN_FIELDS = 15
+LOAN_FEES_INDEX = 12
+LOAN_FEES_OFFSET = LOAN_FIELDS * WORD_SIZE
+LOAN_STATE_PREFIX = WORD_SIZE.to_bytes(WORD_SIZE, "big")
+LOAN_FEES_OFFSET_WORD = LOAN_FEES_OFFSET.to_bytes(WORD_SIZE, "big")
+
+
+def word(value: Any) -> bytes:
+    """
+    Encodes a single static value as `convert(value, bytes32)` and `abi_encode` do for uint256, bool, flags, address
+    and bytes32. Bytes and hex strings shorter than 32 bytes are left padded, which is the encoding for addresses and
+    uint256 values. Hex strings can have an odd number of digits, eg `hex(r)` of a signature.
+
+    Returns:
+        The value as a 32 bytes word.
+    """
+    if isinstance(value, bytes | bytearray):
+        return bytes(value).rjust(WORD_SIZE, b"\0")
+    if isinstance(value, str):
+        return int(value, 16).to_bytes(WORD_SIZE, "big")
+    return int(value).to_bytes(WORD_SIZE, "big")
+
+
+def compute_loan_id(loan: tuple) -> bytes:
+    return keccak(
+        b"".join(
+            [
+                word(loan[8]),  # borrower
+                word(loan[9]),  # lender
+                word(loan[7]),  # start_time
+                word(loan[10]),  # collateral_contract
+                word(loan[11]),  # collateral_token_id
+            ]
+        )
+    )
+
+
+def compute_signed_offer_id(signed_offer: tuple) -> bytes:
+    v, r, s = signed_offer[1]
+    return keccak(word(v) + word(r) + word(s))
+
+
+def encode_loan(loan: tuple) -> bytes:
+    """
+    Same as `abi_encode(loan)` in the contract.
+
+    Returns:
+        The loan encoded as a single dynamic tuple.
+    """
+    fees = loan[LOAN_FEES_INDEX]
+    head = [word(v) if i != LOAN_FEES_INDEX else LOAN_FEES_OFFSET_WORD for i, v in enumerate(loan)]
+    tail = [word(len(fees))] + [word(v) for fee in fees for v in fee]
+    return b"".join([LOAN_STATE_PREFIX, *head, *tail])
+
+
+def compute_loan_state_hash(loan: tuple) -> bytes:
+    return keccak(encode_loan(loan))
+
+
+def compute_loan_ids(loans: Iterable[tuple]) -> list[bytes]:
+    return [compute_loan_id(loan) for loan in loans]
+
+
+def compute_signed_offer_ids(signed_offers: Iterable[tuple]) -> list[bytes]:
+    return [compute_signed_offer_id(offer) for offer in signed_offers]
+
+
+def compute_loan_state_hashes(loans: Iterable[tuple]) -> list[bytes]:
+    return [compute_loan_state_hash(loan) for loan in loans]
+
+
+def verify_loan_state_hashes(loans: Iterable[tuple], state_hashes: Iterable[bytes]) -> list[bool]:
+    return [compute_loan_state_hash(loan) == bytes(h) for loan, h in zip(loans, state_hashes, strict=True)]
@@ -0,0 +1,204 @@
+import json
+import sqlite3
+from collections.abc import Callable, Iterable, Mapping
+from enum import Enum
+from itertools import starmap
+from pathlib import Path
+from typing import Any
+
+from .hashing import LOAN_FEES_INDEX, compute_loan_state_hash
+
+# Local index of P2PLendingNfts loans, rebuilt from the contract events. The contract only keeps the loan state hash,
+# so the full loan (needed to settle, claim or replace it) is recovered from the event that created it. Loans are
+# kept as tuples in contract field order and persisted in sqlite, so the index survives restarts and only new
+# blocks need to be fetched.
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+LOAN_EVENTS = ["LoanCreated", "LoanReplaced", "LoanReplacedByLender", "LoanPaid", "LoanCollateralClaimed"]
+LOAN_BYTES32_FIELDS = {0, 1, 2}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS loans (id BLOB PRIMARY KEY, status TEXT NOT NULL, loan TEXT NOT NULL, block_number INTEGER);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class LoanStatus(Enum):
+    ACTIVE = "active"
+    PAID = "paid"
+    CLAIMED = "claimed"
+    REPLACED = "replaced"
+
+
+def _as_tuple(value: Any) -> tuple:
+    return tuple(value.values()) if isinstance(value, Mapping) else tuple(value)
+
+
+def _event_name(log: Any) -> str:
+    # ape ContractLog and the tests EventWrapper have an event_name, boa events are namedtuples named after the event
+    return getattr(log, "event_name", type(log).__name__)
+
+
+def _event_args(log: Any) -> Mapping[str, Any]:
+    if hasattr(log, "event_arguments"):
+        return log.event_arguments
+    if hasattr(log, "args_dict"):
+        return log.args_dict
+    return log._asdict()
+
+
+def _dump_loan(loan: tuple) -> str:
+    fields = [bytes(v).hex() if i in LOAN_BYTES32_FIELDS else v for i, v in enumerate(loan)]
+    fields[LOAN_FEES_INDEX] = [[int(fee[0]), int(fee[1]), int(fee[2]), str(fee[3])] for fee in loan[LOAN_FEES_INDEX]]
+    return json.dumps(fields)
+
+
+def _load_loan(data: str) -> tuple:
+    fields = json.loads(data)
+    return tuple(bytes.fromhex(v) if i in LOAN_BYTES32_FIELDS else v for i, v in enumerate(fields))
+
+
+def fetch_loan_logs(contract: Any, start_block: int, stop_block: int) -> list:
+    """
+    Fetches the loan events of an ape contract in [start_block, stop_block].
+
+    Returns:
+        The decoded logs in chain order.
+    """
+    logs = [log for name in LOAN_EVENTS for log in getattr(contract, name).range(start_block, stop_block + 1)]
+    return sorted(logs, key=lambda log: (log.block_number, log.log_index))
+
+
+class LoanIndex:
+    """
+    Loans of a single P2PLendingNfts contract, keyed by loan id.
+
+    `loan_type` and `fee_type` build the returned loans and fees from their fields, eg the `Loan` and `Fee`
+    namedtuples of the console or the tests. By default plain tuples are returned, which both ape and boa accept.
+    """
+
+    def __init__(self, path: Path | str = ":memory:", *, loan_type: Callable = tuple, fee_type: Callable = tuple):
+        self.path = path
+        self.loan_type = loan_type
+        self.fee_type = fee_type
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._loans: dict[bytes, tuple] = {}
+        self._status: dict[bytes, LoanStatus] = {}
+        for loan_id, status, data in self._db.execute("SELECT id, status, loan FROM loans"):
+            self._loans[loan_id] = _load_loan(data)
+            self._status[loan_id] = LoanStatus(status)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._loans)
+
+    def __contains__(self, loan_id: bytes):
+        return bytes(loan_id) in self._loans
+
+    def close(self):
+        self._db.close()
+
+    @property
+    def last_block(self) -> int | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'last_block'").fetchone()
+        return row[0] if row else None
+
+    def get(self, loan_id: bytes) -> tuple:
+        fields = self._loans[bytes(loan_id)]
+        fees = list(starmap(self.fee_type, fields[LOAN_FEES_INDEX]))
+        return self.loan_type(*fields[:LOAN_FEES_INDEX], fees, *fields[LOAN_FEES_INDEX + 1 :])
+
+    def status(self, loan_id: bytes) -> LoanStatus:
+        return self._status[bytes(loan_id)]
+
+    def active_loans(self) -> list[tuple]:
+        return [self.get(loan_id) for loan_id, status in self._status.items() if status == LoanStatus.ACTIVE]
+
+    def apply_logs(self, logs: Iterable[Any], *, last_block: int | None = None):
+        """Applies decoded logs from boa, ape or the tests EventWrapper in chain order, skipping other events."""
+        with self._db:
+            for log in logs:
+                name = _event_name(log)
+                if name in LOAN_EVENTS:
+                    self._apply_event(name, _event_args(log), getattr(log, "block_number", None))
+            if last_block is not None:
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('last_block', ?)", (last_block,))
+
+    def sync(self, contract: Any, *, start_block: int = 0, stop_block: int | None = None):
+        """Applies the loan events of an ape contract emitted since the last synced block."""
+        start_block = self.last_block + 1 if self.last_block is not None else start_block
+        stop_block = stop_block if stop_block is not None else contract.chain_manager.blocks.height
+        if start_block <= stop_block:
+            self.apply_logs(fetch_loan_logs(contract, start_block, stop_block), last_block=stop_block)
+
+    def _apply_event(self, name: str, args: Mapping[str, Any], block_number: int | None):
+        loan_id = bytes(args["id"])
+        match name:
+            case "LoanCreated":
+                self._store(loan_id, self._loan_from_event(args, args["delegate"]), LoanStatus.ACTIVE, block_number)
+            case "LoanReplaced" | "LoanReplacedByLender":
+                # the delegate is kept from the replaced loan and is not part of the event
+                original_loan_id = bytes(args["original_loan_id"])
+                original_loan = self._loans.get(original_loan_id)
+                delegate = original_loan[14] if original_loan else ZERO_ADDRESS
+                self._store(loan_id, self._loan_from_event(args, delegate), LoanStatus.ACTIVE, block_number)
+                if original_loan:
+                    self._set_status(original_loan_id, LoanStatus.REPLACED)
+            case "LoanPaid":
+                self._set_status(loan_id, LoanStatus.PAID)
+            case "LoanCollateralClaimed":
+                self._set_status(loan_id, LoanStatus.CLAIMED)
+
+    @staticmethod
+    def _loan_from_event(args: Mapping[str, Any], delegate: str) -> tuple:
+        return (
+            bytes(args["id"]),
+            bytes(args["offer_id"]),
+            bytes(args["offer_tracing_id"]),
+            args["amount"],
+            args["interest"],
+            args["payment_token"],
+            args["maturity"],
+            args["start_time"],
+            args["borrower"],
+            args["lender"],
+            args["collateral_contract"],
+            args["collateral_token_id"],
+            [_as_tuple(fee) for fee in args["fees"]],
+            args["pro_rata"],
+            delegate,
+        )
+
+    def _store(self, loan_id: bytes, loan: tuple, status: LoanStatus, block_number: int | None):
+        data = _dump_loan(loan)
+        self._loans[loan_id] = _load_loan(data)
+        self._status[loan_id] = status
+        self._db.execute("INSERT OR REPLACE INTO loans VALUES (?, ?, ?, ?)", (loan_id, status.value, data, block_number))
+
+    def _set_status(self, loan_id: bytes, status: LoanStatus):
+        if loan_id in self._status:
+            self._status[loan_id] = status
+            self._db.execute("UPDATE loans SET status = ? WHERE id = ?", (status.value, loan_id))
+
+    def verify(self, loan_id: bytes, state_hash: bytes) -> bool:
+        """
+        Checks an indexed loan against the state hash stored in the contract `loans` mapping.
+
+        Returns:
+            Whether the state hash of the indexed loan matches.
+        """
+        return compute_loan_state_hash(self._loans[bytes(loan_id)]) == bytes(state_hash)
+
+    def verify_active_loans(self, contract: Any) -> dict[bytes, bool]:
+        return {
+            loan_id: self.verify(loan_id, contract.loans(loan_id))
+            for loan_id, status in self._status.items()
+            if status == LoanStatus.ACTIVE
+        }
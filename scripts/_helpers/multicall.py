@@ -0,0 +1,77 @@
+from collections.abc import Callable, Iterable, Sequence
+from itertools import islice
+from typing import Any
+
+from eth_utils import keccak
+
+from .hashing import word
+
+# Batching of view calls through Multicall3 aggregate3, deployed at the same address on every supported chain.
+# Calls are (target, call data) pairs, sent in chunks so each aggregate call stays within the node call gas and
+# response size limits. `aggregate` is the aggregate3 function of a boa or ape contract, eg `multicall.aggregate3`.
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+DEFAULT_CHUNK_SIZE = 500
+MULTICALL3_ABI = [
+    {
+        "type": "function",
+        "name": "aggregate3",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [{"name": "success", "type": "bool"}, {"name": "returnData", "type": "bytes"}],
+            }
+        ],
+    }
+]
+
+Aggregate = Callable[..., Sequence[Any]]
+
+
+def selector(signature: str) -> bytes:
+    return keccak(signature.encode())[:4]
+
+
+def encode_call(function_selector: bytes, *args: Any) -> bytes:
+    """
+    Encodes a call to a function taking static arguments only, see `hashing.word`.
+
+    Returns:
+        The call data.
+    """
+    return function_selector + b"".join(word(arg) for arg in args)
+
+
+def _chunks(values: Iterable, size: int) -> Iterable[list]:
+    it = iter(values)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def aggregate_calls(
+    aggregate: Aggregate, calls: Iterable[tuple[str, bytes]], *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> list[bytes | None]:
+    """
+    Sends `calls` through `aggregate` in chunks of `chunk_size`, allowing each call to fail.
+
+    Returns:
+        The return data of each call, in order, or None for the calls that reverted.
+    """
+    results = []
+    for chunk in _chunks(calls, chunk_size):
+        for success, return_data in aggregate([(target, True, call_data) for target, call_data in chunk]):
+            results.append(bytes(return_data) if success else None)
+    return results
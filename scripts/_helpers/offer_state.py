@@ -0,0 +1,160 @@
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from .loans import LOAN_EVENTS, _event_args, _event_name
+from .multicall import DEFAULT_CHUNK_SIZE, Aggregate, aggregate_calls, encode_call, selector
+
+# Cache of the P2PLendingNfts offer_count and revoked_offers mappings. Missing keys are read in bulk through
+# Multicall3 and the cache is then kept current from the contract events, mirroring _check_and_update_offer_state
+# (loan created or replaced from an offer), _reduce_offer_count (loan settled or replaced) and _revoke_offer. Claiming
+# the collateral of a defaulted loan keeps the count of its offer.
+# Reads after the first one for a key cost no RPC calls. Once the block the state is synced to is known, the reads are
+# made at that block, so the events replayed by `sync` are never already part of a cached value.
+
+OFFER_STATE_EVENTS = [*LOAN_EVENTS, "OfferRevoked"]
+
+OFFER_COUNT = selector("offer_count(bytes32)")
+REVOKED_OFFERS = selector("revoked_offers(bytes32)")
+
+
+def fetch_offer_state_logs(contract: Any, start_block: int, stop_block: int) -> list:
+    """
+    Fetches the events changing the offer state of an ape contract in [start_block, stop_block].
+
+    Returns:
+        The decoded logs in chain order.
+    """
+    logs = [log for name in OFFER_STATE_EVENTS for log in getattr(contract, name).range(start_block, stop_block + 1)]
+    return sorted(logs, key=lambda log: (log.block_number, log.log_index))
+
+
+class OfferStateReader:
+    """
+    Offer state of a single P2PLendingNfts contract. `aggregate` is the aggregate3 function of a Multicall3 contract,
+    called with `block_id=last_block` when `last_block` is set (as ape contract calls take it).
+
+    Counts are reduced when the loan created from an offer is settled or replaced, not when its collateral is
+    claimed. Those events only carry the loan id, so the reader keeps the tracing id of the loans it sees created and
+    falls back to `loan_index` (a loans.LoanIndex) for older loans. When neither knows the loan, the cached counts are
+    dropped and read again.
+    """
+
+    def __init__(
+        self,
+        contract: str,
+        aggregate: Aggregate,
+        *,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        last_block: int | None = None,
+        loan_index: Any = None,
+    ):
+        self.contract = contract
+        self.aggregate = aggregate
+        self.chunk_size = chunk_size
+        self.last_block = last_block
+        self.loan_index = loan_index
+        self.rpc_calls = 0
+        self._offer_count: dict[bytes, int] = {}
+        self._revoked: dict[bytes, bool] = {}
+        self._loan_tracing_ids: dict[bytes, bytes] = {}
+
+    def load(self, tracing_ids: Iterable[bytes] = (), offer_ids: Iterable[bytes] = ()):
+        """
+        Reads the keys not cached yet, counts and revocations together in as few aggregate calls as possible.
+
+        Raises:
+            ValueError: If a read reverts.
+        """
+        missing_counts = list(dict.fromkeys(k for k in map(bytes, tracing_ids) if k not in self._offer_count))
+        missing_revoked = list(dict.fromkeys(k for k in map(bytes, offer_ids) if k not in self._revoked))
+        calls = [(self.contract, encode_call(OFFER_COUNT, k)) for k in missing_counts]
+        calls += [(self.contract, encode_call(REVOKED_OFFERS, k)) for k in missing_revoked]
+        if not calls:
+            return
+
+        results = aggregate_calls(self._aggregate, calls, chunk_size=self.chunk_size)
+        for i, (key, result) in enumerate(zip(missing_counts + missing_revoked, results, strict=True)):
+            if result is None:
+                raise ValueError(f"Failed to read the offer state of {key.hex()} from {self.contract}")
+            if i < len(missing_counts):
+                self._offer_count[key] = int.from_bytes(result, "big")
+            else:
+                self._revoked[key] = int.from_bytes(result, "big") != 0
+
+    def _aggregate(self, calls: list[tuple[str, bool, bytes]]) -> list:
+        self.rpc_calls += 1
+        if self.last_block is None:
+            return self.aggregate(calls)
+        return self.aggregate(calls, block_id=self.last_block)
+
+    def offer_counts(self, tracing_ids: Iterable[bytes]) -> dict[bytes, int]:
+        tracing_ids = [bytes(k) for k in tracing_ids]
+        self.load(tracing_ids=tracing_ids)
+        return {k: self._offer_count[k] for k in tracing_ids}
+
+    def revoked_offers(self, offer_ids: Iterable[bytes]) -> dict[bytes, bool]:
+        offer_ids = [bytes(k) for k in offer_ids]
+        self.load(offer_ids=offer_ids)
+        return {k: self._revoked[k] for k in offer_ids}
+
+    def update_offer_book(self, book: Any):
+        """Sets the offer_count and revoked state of an offers.OfferBook for all its offers."""
+        offer_ids = list(book.offers)
+        tracing_ids = [bytes(signed_offer[0][18]) for signed_offer in book.offers.values()]
+        self.load(tracing_ids, offer_ids)
+        book.offer_count.update({k: self._offer_count[k] for k in tracing_ids})
+        book.revoked.update(k for k in offer_ids if self._revoked[k])
+
+    def apply_logs(self, logs: Iterable[Any], *, last_block: int | None = None):
+        """
+        Applies decoded logs from boa, ape or the tests EventWrapper emitted after the cached state was read, in
+        chain order, skipping other events.
+        """
+        for log in logs:
+            name = _event_name(log)
+            if name in OFFER_STATE_EVENTS:
+                self._apply_event(name, _event_args(log))
+        if last_block is not None:
+            self.last_block = last_block
+
+    def sync(self, contract: Any, *, stop_block: int | None = None):
+        """
+        Applies the events of an ape contract emitted since the last synced block.
+
+        Raises:
+            ValueError: If `last_block` is not set.
+        """
+        if self.last_block is None:
+            raise ValueError("The block the offer state was read at is unknown, set last_block first")
+        stop_block = stop_block if stop_block is not None else contract.chain_manager.blocks.height
+        if self.last_block < stop_block:
+            self.apply_logs(fetch_offer_state_logs(contract, self.last_block + 1, stop_block), last_block=stop_block)
+
+    def _apply_event(self, name: str, args: Mapping[str, Any]):
+        match name:
+            case "OfferRevoked":
+                self._revoked[bytes(args["offer_id"])] = True
+            case "LoanCreated":
+                self._loan_created(args)
+            case "LoanReplaced" | "LoanReplacedByLender":
+                self._loan_closed(bytes(args["original_loan_id"]))
+                self._loan_created(args)
+            case "LoanPaid":
+                self._loan_closed(bytes(args["id"]))
+            case "LoanCollateralClaimed":
+                self._loan_tracing_ids.pop(bytes(args["id"]), None)
+
+    def _loan_created(self, args: Mapping[str, Any]):
+        tracing_id = bytes(args["offer_tracing_id"])
+        self._loan_tracing_ids[bytes(args["id"])] = tracing_id
+        if tracing_id in self._offer_count:
+            self._offer_count[tracing_id] += 1
+
+    def _loan_closed(self, loan_id: bytes):
+        tracing_id = self._loan_tracing_ids.pop(loan_id, None)
+        if tracing_id is None and self.loan_index is not None and loan_id in self.loan_index:
+            tracing_id = bytes(self.loan_index.get(loan_id)[2])
+        if tracing_id is None:
+            self._offer_count.clear()
+        elif tracing_id in self._offer_count:
+            self._offer_count[tracing_id] -= 1
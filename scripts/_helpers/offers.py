@@ -0,0 +1,239 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+from .enums import OfferType
+from .hashing import compute_signed_offer_id
+
+# In memory book of signed offers, matched against collateral tokens as P2PLendingNfts._validate_token_ids does.
+# For each collection, TOKEN offers are keyed by token id, COLLECTION offers are kept in an interval tree over
+# [token_range_min, token_range_max] and TRAIT offers are keyed by trait hash, matched through an index of the
+# trait hashes of each token (the same tokens and traits the collection trait tree is built from).
+# Offer usage mirrors _check_and_update_offer_state: an offer is available while not expired, not revoked and with
+# offer_count[tracing_id] < size, and filling a TOKEN offer revokes it.
+
+
+def best_for_borrower(signed_offer: tuple) -> tuple:
+    """
+    Default ranking, highest principal net of the origination fee first, then lowest interest and latest expiration.
+
+    Returns:
+        The rank key of `signed_offer`, lower is better.
+    """
+    offer = signed_offer[0]
+    return -(offer[0] - offer[4]), offer[1], -offer[14]
+
+
+def _interval_node(start: int, end: int) -> tuple[int, int]:
+    # the highest node of the dyadic tree whose center is in [start, end], as (level, center)
+    level = (start ^ end).bit_length()
+    if start and (start & -start).bit_length() > level:
+        level = (start & -start).bit_length()
+    return level, _node_center(level, start)
+
+
+def _node_center(level: int, point: int) -> int:
+    # center of the level `level` node over `point`, the nodes of a level split the integers in blocks of 2**level
+    return (point >> level << level) | (1 << (level - 1)) if level else point
+
+
+class IntervalTree:
+    """
+    Centered interval tree of closed [start, end] intervals of non negative integers. The centers are fixed, a level
+    `l` node covers a block of 2**l integers and is centered in it, so intervals are inserted in place and the tree
+    has no bound. Each interval is kept in the highest node whose center it contains and the intervals of a node
+    are sorted by (rank, key), so stabbing a point merges the nodes on its path lazily, from best to worst rank.
+    """
+
+    def __init__(self):
+        self._intervals: dict[bytes, tuple[int, int, tuple]] = {}
+        self._nodes: dict[int, dict[int, list[tuple]]] = defaultdict(dict)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def add(self, key: bytes, start: int, end: int, rank: tuple = ()):
+        self.remove(key)
+        level, center = _interval_node(start, end)
+        entry = (rank, key, start, end)
+        insort(self._nodes[level].setdefault(center, []), entry)
+        self._intervals[key] = (level, center, entry)
+
+    def remove(self, key: bytes):
+        if key not in self._intervals:
+            return
+        level, center, entry = self._intervals.pop(key)
+        node = self._nodes[level][center]
+        del node[bisect_left(node, entry)]
+        if not node:
+            del self._nodes[level][center]
+            if not self._nodes[level]:
+                del self._nodes[level]
+
+    def ranked(self, point: int) -> Iterator[tuple[tuple, bytes]]:
+        """
+        Finds the intervals containing `point`.
+
+        Yields:
+            The (rank, key) of each interval, from best to worst rank.
+        """
+        nodes = [level_nodes.get(_node_center(level, point)) for level, level_nodes in self._nodes.items()]
+        yield from heapq.merge(
+            *(((rank, key) for rank, key, start, end in node if start <= point <= end) for node in nodes if node)
+        )
+
+    def stab(self, point: int) -> list[bytes]:
+        """
+        Finds the intervals containing `point`.
+
+        Returns:
+            The keys of the intervals, from best to worst rank.
+        """
+        return [key for _, key in self.ranked(point)]
+
+
+@dataclass
+class _CollectionOffers:
+    # every bucket is kept sorted by (rank key, offer id), so matching offers can be merged lazily
+    token_offers: dict[int, list[tuple[tuple, bytes]]] = field(default_factory=lambda: defaultdict(list))
+    range_offers: IntervalTree = field(default_factory=IntervalTree)
+    trait_offers: dict[bytes, list[tuple[tuple, bytes]]] = field(default_factory=lambda: defaultdict(list))
+    token_traits: dict[int, set[bytes]] = field(default_factory=dict)
+
+    def matching(self, token_id: int) -> Iterator[tuple[tuple, bytes]]:
+        """
+        Merges the buckets of the offers matching `token_id`.
+
+        Returns:
+            The matching offers as (rank key, offer id), from best to worst.
+        """
+        buckets = [
+            self.token_offers.get(token_id, []),
+            self.range_offers.ranked(token_id),
+            *(self.trait_offers.get(trait_hash, []) for trait_hash in self.token_traits.get(token_id, ())),
+        ]
+        return heapq.merge(*buckets)
+
+
+class OfferBook:
+    """
+    Signed offers keyed by collection_key_hash. `key` orders offers from best to worst, see `best_for_borrower`.
+    """
+
+    def __init__(self, signed_offers: Iterable[tuple] = (), *, key: Callable[[tuple], tuple] = best_for_borrower):
+        self.key = key
+        self.offers: dict[bytes, tuple] = {}
+        self.offer_count: dict[bytes, int] = defaultdict(int)
+        self.revoked: set[bytes] = set()
+        self._collections: dict[bytes, _CollectionOffers] = defaultdict(_CollectionOffers)
+        self._keys: dict[bytes, tuple] = {}
+        for signed_offer in signed_offers:
+            self.add(signed_offer)
+
+    def __len__(self):
+        return len(self.offers)
+
+    def __contains__(self, offer_id: bytes):
+        return bytes(offer_id) in self.offers
+
+    def add(self, signed_offer: tuple) -> bytes:
+        offer = signed_offer[0]
+        offer_id = compute_signed_offer_id(signed_offer)
+        if offer_id in self.offers:
+            return offer_id
+        key = self.key(signed_offer)
+        collection = self._collections[bytes(offer[12])]
+        match offer[8]:
+            case OfferType.TOKEN:
+                insort(collection.token_offers[offer[9]], (key, offer_id))
+            case OfferType.COLLECTION:
+                collection.range_offers.add(offer_id, offer[10], offer[11], key)
+            case OfferType.TRAIT:
+                insort(collection.trait_offers[bytes(offer[13])], (key, offer_id))
+            case _:
+                raise ValueError(f"Unknown offer type {offer[8]}")
+        self.offers[offer_id] = signed_offer
+        self._keys[offer_id] = key
+        return offer_id
+
+    def remove(self, offer_id: bytes):
+        offer_id = bytes(offer_id)
+        offer = self.offers.pop(offer_id)[0]
+        key = self._keys.pop(offer_id)
+        collection = self._collections[bytes(offer[12])]
+        match offer[8]:
+            case OfferType.TOKEN:
+                collection.token_offers[offer[9]].remove((key, offer_id))
+            case OfferType.COLLECTION:
+                collection.range_offers.remove(offer_id)
+            case OfferType.TRAIT:
+                collection.trait_offers[bytes(offer[13])].remove((key, offer_id))
+
+    def set_token_traits(self, collection_key_hash: bytes, token_traits: Mapping[int, Iterable[bytes]]):
+        """Sets the trait hashes of each token of a collection, see traits.token_trait_hashes."""
+        self._collections[bytes(collection_key_hash)].token_traits = {t: set(h) for t, h in token_traits.items()}
+
+    def is_available(self, offer_id: bytes, timestamp: int) -> bool:
+        offer = self.offers[offer_id][0]
+        return offer[14] > timestamp and offer_id not in self.revoked and self.offer_count.get(bytes(offer[18]), 0) < offer[17]
+
+    def best_offers(
+        self, collection_key_hash: bytes, token_ids: Iterable[int], timestamp: int, n: int = 1
+    ) -> dict[int, list[tuple]]:
+        """
+        Finds the best available offers for each token.
+
+        Returns:
+            The best `n` available offers of each token, from best to worst.
+        """
+        collection = self._collections.get(bytes(collection_key_hash))
+        result = {}
+        for token_id in token_ids:
+            best = []
+            if collection is not None:
+                seen = set()
+                for _, offer_id in collection.matching(token_id):
+                    if offer_id not in seen and self.is_available(offer_id, timestamp):
+                        best.append(self.offers[offer_id])
+                        if len(best) == n:
+                            break
+                    seen.add(offer_id)
+            result[token_id] = best
+        return result
+
+    def fill(self, offer_id: bytes):
+        """
+        Records a loan created from an offer, as _check_and_update_offer_state.
+
+        Raises:
+            ValueError: If the offer is fully utilized.
+        """
+        offer_id = bytes(offer_id)
+        offer = self.offers[offer_id][0]
+        tracing_id = bytes(offer[18])
+        if self.offer_count[tracing_id] >= offer[17]:
+            raise ValueError(f"Offer {offer_id.hex()} fully utilized")
+        self.offer_count[tracing_id] += 1
+        if offer[8] == OfferType.TOKEN:
+            self.revoked.add(offer_id)
+
+    def release(self, tracing_id: bytes):
+        """Records a loan from an offer being settled or replaced, as _reduce_offer_count."""
+        self.offer_count[bytes(tracing_id)] -= 1
+
+    def revoke(self, offer_id: bytes):
+        self.revoked.add(bytes(offer_id))
+
+    def prune(self, timestamp: int) -> list[bytes]:
+        """
+        Removes the offers that can no longer be used, either expired or revoked.
+
+        Returns:
+            The ids of the removed offers.
+        """
+        stale = [offer_id for offer_id, so in self.offers.items() if so[0][14] <= timestamp or offer_id in self.revoked]
+        for offer_id in stale:
+            self.remove(offer_id)
+        return stale
@@ -0,0 +1,39 @@
+from .basetypes import ContractConfig, DeploymentContext
+from .submitter import TransactionSubmitter, TxStatus, print_outcomes
+
+# Deployment of contracts level by level, as grouped by DependencyManager.build_contract_deploy_levels. Contracts of a
+# level don't depend on each other, so their transactions are broadcast back to back through a TransactionSubmitter,
+# then their receipts are awaited together before the next level starts. A fresh deploy then takes about one block
+# per level instead of one per contract.
+
+
+def deploy_level(context: DeploymentContext, contracts: list[ContractConfig]):
+    contracts = [c for c in contracts if c.deployable(context)]
+    concurrent = [c for c in contracts if c.concurrent_deploy]
+    if context.dryrun or len(concurrent) < 2:
+        for contract in contracts:
+            contract.deploy(context)
+        return
+
+    for contract in contracts:
+        if not contract.concurrent_deploy:
+            contract.deploy(context)
+
+    # created after the sequential deployments, so its nonces start after theirs
+    submitter = TransactionSubmitter(context.owner)
+    sent = [(c, submitter.submit(c.key, lambda c=c: c.deployment_transaction(context))) for c in concurrent]
+    submitter.wait()
+
+    # the transactions already mined can't be recalled, so their contracts are recorded even if others failed
+    for contract, submitted in sent:
+        if submitted.status is TxStatus.CONFIRMED:
+            contract.set_deployed(contract.container.at(submitted.receipt["contractAddress"]))
+
+    if failed := [submitted for _, submitted in sent if submitted.status is not TxStatus.CONFIRMED]:
+        print_outcomes(failed)
+        raise Exception(f"Deployment of {', '.join(s.label for s in failed)} failed")  # noqa: TRY002
+
+
+def deploy_levels(context: DeploymentContext, levels: list[list[ContractConfig]]):
+    for level in levels:
+        deploy_level(context, level)
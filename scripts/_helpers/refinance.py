@@ -0,0 +1,217 @@
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from typing import NamedTuple, Protocol
+
+from .enums import FeeType, OfferType
+from .hashing import LOAN_FEES_INDEX
+from .settlement import BPS
+from .traits import token_node_from_hash
+
+# Off chain evaluation of P2PLendingNfts.replace_loan_lender for every (loan, offer) pair of a loan index and an
+# offer book. Offers are grouped by collateral contract and payment token and sorted by duration, so for each loan
+# only the offers over the same collateral and lasting at least until the loan maturity are evaluated. The amounts
+# follow _compute_max_interest_delta and the borrower and lender deltas of replace_loan_lender, in python ints.
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+class TraitLookup(Protocol):
+    def index(self, node: bytes) -> int | None: ...
+
+
+class RefinanceCandidate(NamedTuple):
+    loan_id: bytes
+    signed_offer: tuple
+    interest: int
+    borrower_compensation: int
+    borrower_delta: int
+    current_lender_delta: int
+    new_lender_payment: int
+
+
+def _same_address(a: str, b: str) -> bool:
+    return a.lower() == b.lower()
+
+
+def max_interest_delta(loan: tuple, offer: tuple, interest: int, borrower_broker_fee_bps: int, timestamp: int) -> int:
+    """
+    Same as P2PLendingNfts._compute_max_interest_delta, with the borrower broker fee bps taken from the loan fees.
+
+    Returns:
+        The maximum interest difference between `offer` and the current loan.
+    """
+    loan_interest_delta_at_maturity = loan[4] - interest
+    if offer[16]:  # pro_rata
+        borrower_broker_fee_delta_at_maturity = loan_interest_delta_at_maturity * borrower_broker_fee_bps // BPS
+        offer_interest_at_loan_maturity = offer[1] * (loan[6] - timestamp) // offer[3]
+        delta_at_loan_maturity = offer_interest_at_loan_maturity - loan_interest_delta_at_maturity
+        return max(0, delta_at_loan_maturity - borrower_broker_fee_delta_at_maturity)
+    return max(offer[1], offer[1] - loan_interest_delta_at_maturity)
+
+
+class RefinanceScanner:
+    """
+    Evaluates lender refinances of loans against a set of signed offers. Offers failing the checks that don't depend
+    on the loan (fees, origination fee, whitelisted collection) are dropped when the scanner is built. Signatures,
+    revocations and offer counts are not checked, the offers are expected to come from a live offer book.
+    `collection_contracts` maps collection key hashes to their contracts and `trait_trees` maps collection contracts
+    to their trait tree (TraitTree or TraitTreeFile), needed to match TRAIT offers.
+    """
+
+    def __init__(
+        self,
+        signed_offers: Iterable[tuple],
+        *,
+        collection_contracts: Mapping[bytes, str],
+        protocol_upfront_fee: int,
+        protocol_settlement_fee: int,
+        max_lender_broker_settlement_fee: int,
+        trait_trees: Mapping[str, TraitLookup] | None = None,
+    ):
+        self.protocol_upfront_fee = protocol_upfront_fee
+        self.protocol_settlement_fee = protocol_settlement_fee
+        self.max_lender_broker_settlement_fee = max_lender_broker_settlement_fee
+        self.trait_trees = {contract.lower(): tree for contract, tree in (trait_trees or {}).items()}
+
+        token_offers = defaultdict(lambda: defaultdict(list))
+        other_offers = defaultdict(list)
+        for signed_offer in signed_offers:
+            offer = signed_offer[0]
+            contract = collection_contracts.get(bytes(offer[12]), ZERO_ADDRESS)
+            if _same_address(contract, ZERO_ADDRESS) or not self._is_offer_valid(offer):
+                continue
+            key = (contract.lower(), offer[2].lower())
+            if offer[8] == OfferType.TOKEN:
+                token_offers[key][offer[9]].append(signed_offer)
+            else:
+                other_offers[key].append(signed_offer)
+
+        self._token_offers = token_offers
+        self._other_offers = {}
+        for key, offers in other_offers.items():
+            offers.sort(key=lambda signed_offer: signed_offer[0][3])
+            self._other_offers[key] = ([signed_offer[0][3] for signed_offer in offers], offers)
+
+    def _is_offer_valid(self, offer: tuple) -> bool:
+        # asserts of replace_loan_lender and _get_loan_fees that only depend on the offer
+        if offer[4] > offer[0]:
+            return False
+        if (offer[6] > 0 or offer[5] > 0) and _same_address(offer[7], ZERO_ADDRESS):
+            return False
+        if offer[6] > self.max_lender_broker_settlement_fee or self.protocol_settlement_fee + offer[6] > BPS:
+            return False
+        return not (offer[16] and offer[3] == 0)
+
+    def _matches_token(self, offer: tuple, contract: str, token_id: int) -> bool:
+        if offer[8] == OfferType.TOKEN:
+            return offer[9] == token_id
+        if offer[8] == OfferType.COLLECTION:
+            return offer[10] <= token_id <= offer[11]
+        tree = self.trait_trees.get(contract.lower())
+        return tree is not None and tree.index(token_node_from_hash(contract, offer[13], token_id)) is not None
+
+    def _candidate_offers(self, loan: tuple, timestamp: int) -> Iterable[tuple]:
+        key = (loan[10].lower(), loan[5].lower())
+        min_duration = loan[6] - timestamp
+        for signed_offer in self._token_offers.get(key, {}).get(loan[11], []):
+            if signed_offer[0][3] >= min_duration:
+                yield signed_offer
+        if key in self._other_offers:
+            durations, offers = self._other_offers[key]
+            yield from offers[bisect_left(durations, min_duration) :]
+
+    def evaluate(self, loan: tuple, signed_offer: tuple, timestamp: int) -> RefinanceCandidate | None:
+        """
+        Evaluates replacing `loan` with `signed_offer` at `timestamp`.
+
+        Returns:
+            The amounts of the refinance, or None if replace_loan_lender would revert.
+        """
+        offer = signed_offer[0]
+        if offer[14] <= timestamp or timestamp > loan[6] or timestamp + offer[3] < loan[6]:
+            return None
+        if not self._matches_token(offer, loan[10], loan[11]):
+            return None
+
+        interest = loan[4] * (timestamp - loan[7]) // (loan[6] - loan[7]) if loan[13] else loan[4]
+        settlement_fees_total = 0
+        borrower_broker_fee_bps = 0
+        borrower_broker_fee_amount = 0
+        for fee in loan[LOAN_FEES_INDEX]:
+            fee_amount = interest * fee[2] // BPS
+            settlement_fees_total += fee_amount
+            if fee[0] == FeeType.BORROWER_BROKER:
+                borrower_broker_fee_bps = fee[2]
+                borrower_broker_fee_amount = fee_amount
+
+        total_upfront_fees = self.protocol_upfront_fee * offer[0] // BPS + offer[4] + offer[5]
+        principal_delta = offer[0] - loan[3]
+        borrower_compensation = max(
+            max_interest_delta(loan, offer, interest, borrower_broker_fee_bps, timestamp),
+            interest + borrower_broker_fee_amount - principal_delta,
+        )
+        borrower_delta = principal_delta - interest - borrower_broker_fee_amount + borrower_compensation
+        current_lender_delta = (
+            loan[3]
+            + interest
+            + borrower_broker_fee_amount
+            + offer[5]
+            - (total_upfront_fees + settlement_fees_total + borrower_compensation)
+        )
+        new_lender_delta_abs = offer[0] - offer[4] + offer[5]
+
+        if borrower_delta < 0:
+            return None
+        if not _same_address(loan[9], offer[15]):
+            if current_lender_delta < 0:
+                return None
+            new_lender_payment = new_lender_delta_abs
+        else:
+            lender_delta = current_lender_delta - new_lender_delta_abs
+            if lender_delta > 0:
+                return None
+            new_lender_payment = -lender_delta
+
+        return RefinanceCandidate(
+            loan_id=bytes(loan[0]),
+            signed_offer=signed_offer,
+            interest=interest,
+            borrower_compensation=borrower_compensation,
+            borrower_delta=borrower_delta,
+            current_lender_delta=current_lender_delta,
+            new_lender_payment=new_lender_payment,
+        )
+
+    def scan(self, loans: Iterable[tuple], timestamp: int) -> list[RefinanceCandidate]:
+        """
+        Evaluates every loan against the offers that can replace it at `timestamp`.
+
+        Returns:
+            The candidates of the valid pairs.
+        """
+        candidates = []
+        for loan in loans:
+            if timestamp > loan[6]:
+                continue
+            for signed_offer in self._candidate_offers(loan, timestamp):
+                candidate = self.evaluate(loan, signed_offer, timestamp)
+                if candidate is not None:
+                    candidates.append(candidate)
+        return candidates
+
+    def rank(self, loans: Iterable[tuple], timestamp: int, limit: int = 1) -> dict[bytes, list[RefinanceCandidate]]:
+        """
+        Ranks the refinance candidates of each loan.
+
+        Returns:
+            The best `limit` candidates of each loan, as the ones returning the most to the current lender and, among
+            those, paying the least borrower compensation.
+        """
+        per_loan = defaultdict(list)
+        for candidate in self.scan(loans, timestamp):
+            per_loan[candidate.loan_id].append(candidate)
+        return {
+            loan_id: sorted(candidates, key=lambda c: (-c.current_lender_delta, c.borrower_compensation))[:limit]
+            for loan_id, candidates in per_loan.items()
+        }
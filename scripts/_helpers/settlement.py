@@ -0,0 +1,144 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from .enums import FeeType
+from .hashing import LOAN_FEES_INDEX
+
+# Columnar counterpart of P2PLendingNfts._compute_settlement_interest and _get_settlement_fees, quoting what
+# settle_loan would transfer for a whole book of loans. Values are python ints, so every floor division rounds as
+# the contract uint256 arithmetic does. Loans without pro rata interest settle for the same amounts at any time, so
+# the book keeps them after the pro rata ones and quotes them once; only the pro rata block is computed per timestamp.
+# As in the contract, a loan can have several fees of the same type: each one is rounded on its own and the quotes
+# add them up per type, while the borrower broker payment is the last borrower broker fee.
+
+BPS = 10000
+
+
+@dataclass
+class SettlementQuotes:
+    """Settlement amounts for each loan of a LoanBook at a given timestamp, aligned with `LoanBook.ids`."""
+
+    timestamp: int
+    interest: list[int]
+    fees: dict[FeeType, list[int]]
+    settlement_fees_total: list[int]
+    borrower_payment: list[int]
+    lender_payment: list[int]
+    defaulted: list[bool]
+
+    def __len__(self):
+        return len(self.interest)
+
+    def quote(self, index: int) -> dict:
+        return {
+            "interest": self.interest[index],
+            "fees": {fee_type: amounts[index] for fee_type, amounts in self.fees.items()},
+            "settlement_fees_total": self.settlement_fees_total[index],
+            "borrower_payment": self.borrower_payment[index],
+            "lender_payment": self.lender_payment[index],
+            "defaulted": self.defaulted[index],
+        }
+
+
+@dataclass
+class _LoanColumns:
+    ids: list[bytes] = field(default_factory=list)
+    amount: list[int] = field(default_factory=list)
+    interest: list[int] = field(default_factory=list)
+    start_time: list[int] = field(default_factory=list)
+    maturity: list[int] = field(default_factory=list)
+    fee_bps: dict[FeeType, list[tuple[int, ...]]] = field(default_factory=lambda: {fee_type: [] for fee_type in FeeType})
+    fee_wallets: dict[FeeType, list[tuple[str, ...]]] = field(default_factory=lambda: {fee_type: [] for fee_type in FeeType})
+    borrower_broker_bps: list[int] = field(default_factory=list)
+
+    def append(self, loan: tuple):
+        fees = {fee_type: [] for fee_type in FeeType}
+        borrower_broker_bps = 0
+        for fee in loan[LOAN_FEES_INDEX]:
+            fee_type = FeeType(fee[0])
+            fees[fee_type].append((fee[2], fee[3]))
+            if fee_type == FeeType.BORROWER_BROKER and fee[2] > 0:
+                borrower_broker_bps = fee[2]
+
+        self.ids.append(bytes(loan[0]))
+        self.amount.append(loan[3])
+        self.interest.append(loan[4])
+        self.maturity.append(loan[6])
+        self.start_time.append(loan[7])
+        self.borrower_broker_bps.append(borrower_broker_bps)
+        for fee_type, type_fees in fees.items():
+            self.fee_bps[fee_type].append(tuple(interest_bps for interest_bps, _ in type_fees))
+            self.fee_wallets[fee_type].append(tuple(wallet for _, wallet in type_fees))
+
+    def quote(self, timestamp: int, interest: list[int]) -> SettlementQuotes:
+        fees = {
+            fee_type: [sum(i * b // BPS for b in bps) for i, bps in zip(interest, fee_bps)]
+            for fee_type, fee_bps in self.fee_bps.items()
+            if any(map(any, fee_bps))
+        }
+        totals = [sum(amounts) for amounts in zip(*fees.values())] if fees else [0] * len(interest)
+        borrower_broker = [i * bps // BPS for i, bps in zip(interest, self.borrower_broker_bps)]
+        return SettlementQuotes(
+            timestamp=timestamp,
+            interest=interest,
+            fees=fees,
+            settlement_fees_total=totals,
+            borrower_payment=[a + i + b for a, i, b in zip(self.amount, interest, borrower_broker)],
+            lender_payment=[a + i - t + b for a, i, t, b in zip(self.amount, interest, totals, borrower_broker)],
+            defaulted=[timestamp > maturity for maturity in self.maturity],
+        )
+
+
+def _concat_quotes(first: SettlementQuotes, second: SettlementQuotes, defaulted: list[bool]) -> SettlementQuotes:
+    fee_types = first.fees.keys() | second.fees.keys()
+    return SettlementQuotes(
+        timestamp=first.timestamp,
+        interest=first.interest + second.interest,
+        fees={
+            fee_type: first.fees.get(fee_type, [0] * len(first)) + second.fees.get(fee_type, [0] * len(second))
+            for fee_type in sorted(fee_types)
+        },
+        settlement_fees_total=first.settlement_fees_total + second.settlement_fees_total,
+        borrower_payment=first.borrower_payment + second.borrower_payment,
+        lender_payment=first.lender_payment + second.lender_payment,
+        defaulted=defaulted,
+    )
+
+
+class LoanBook:
+    """
+    Loans held as columns, with the pro rata loans first. Quotes are only meaningful for timestamps between the loan
+    start and maturity, as settle_loan reverts for defaulted loans.
+    """
+
+    def __init__(self, loans: Iterable[tuple]):
+        self._pro_rata = _LoanColumns()
+        self._fixed = _LoanColumns()
+        for loan in loans:
+            (self._pro_rata if loan[13] else self._fixed).append(loan)
+        self._fixed_quotes = self._fixed.quote(0, self._fixed.interest)
+        self.ids = self._pro_rata.ids + self._fixed.ids
+        self.maturity = self._pro_rata.maturity + self._fixed.maturity
+        self.fee_wallets = {
+            fee_type: self._pro_rata.fee_wallets[fee_type] + self._fixed.fee_wallets[fee_type] for fee_type in FeeType
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _pro_rata_interest(self, timestamp: int) -> list[int]:
+        columns = self._pro_rata
+        return [
+            interest * (timestamp - start_time) // (maturity - start_time)
+            for interest, start_time, maturity in zip(columns.interest, columns.start_time, columns.maturity)
+        ]
+
+    def settlement_interest(self, timestamp: int) -> list[int]:
+        return self._pro_rata_interest(timestamp) + self._fixed.interest
+
+    def quote(self, timestamp: int) -> SettlementQuotes:
+        pro_rata_quotes = self._pro_rata.quote(timestamp, self._pro_rata_interest(timestamp))
+        return _concat_quotes(pro_rata_quotes, self._fixed_quotes, [timestamp > maturity for maturity in self.maturity])
+
+    def quote_many(self, timestamps: Iterable[int]) -> list[SettlementQuotes]:
+        return [self.quote(timestamp) for timestamp in timestamps]
@@ -0,0 +1,95 @@
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from eth_keys import keys
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from .hashing import word
+
+# Mirrors the EIP-712 constants and domain separator computed in P2PLendingNfts.__init__, so that offer digests
+# are a couple of keccaks instead of a full typed data encoding per offer.
+
+ZHARTA_DOMAIN_NAME = "Zharta"
+ZHARTA_DOMAIN_VERSION = "1"
+
+DOMAIN_TYPE_HASH = keccak(b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+OFFER_TYPE_DEF = (
+    "Offer(uint256 principal,uint256 interest,address payment_token,uint256 duration,uint256 origination_fee_amount,"
+    "uint256 broker_upfront_fee_amount,uint256 broker_settlement_fee_bps,address broker_address,"
+    "uint256 offer_type,uint256 token_id,uint256 token_range_min,uint256 token_range_max,bytes32 collection_key_hash,"
+    "bytes32 trait_hash,uint256 expiration,address lender,bool pro_rata,uint256 size,bytes32 tracing_id)"
+)
+OFFER_TYPE_HASH = keccak(OFFER_TYPE_DEF.encode())
+EIP712_PREFIX = b"\x19\x01"
+DEFAULT_CHUNK_SIZE = 256
+
+
+def compute_domain_separator(chain_id: int, verifying_contract: str) -> bytes:
+    return keccak(
+        DOMAIN_TYPE_HASH
+        + keccak(ZHARTA_DOMAIN_NAME.encode())
+        + keccak(ZHARTA_DOMAIN_VERSION.encode())
+        + word(chain_id)
+        + word(verifying_contract)
+    )
+
+
+def compute_offer_hash(offer: tuple) -> bytes:
+    return keccak(OFFER_TYPE_HASH + b"".join(word(v) for v in offer))
+
+
+def compute_offer_digest(domain_separator: bytes, offer: tuple) -> bytes:
+    return keccak(EIP712_PREFIX + domain_separator + compute_offer_hash(offer))
+
+
+def sign_digest(digest: bytes, private_key: keys.PrivateKey) -> tuple[int, int, int]:
+    signature = private_key.sign_msg_hash(digest)
+    return signature.v + 27, signature.r, signature.s
+
+
+def _sign_chunk(domain_separator: bytes, key: bytes, offers: list[tuple]) -> list[tuple[int, int, int]]:
+    private_key = keys.PrivateKey(key)
+    return [sign_digest(compute_offer_digest(domain_separator, offer), private_key) for offer in offers]
+
+
+class OfferSigner:
+    def __init__(self, chain_id: int, verifying_contract: str):
+        self.chain_id = chain_id
+        self.verifying_contract = verifying_contract
+        self.domain_separator = compute_domain_separator(chain_id, verifying_contract)
+
+    def digest(self, offer: tuple) -> bytes:
+        return compute_offer_digest(self.domain_separator, offer)
+
+    def digests(self, offers: Iterable[tuple]) -> list[bytes]:
+        return [compute_offer_digest(self.domain_separator, offer) for offer in offers]
+
+    def sign(self, offer: tuple, key: bytes | str) -> tuple[int, int, int]:
+        return sign_digest(self.digest(offer), keys.PrivateKey(HexBytes(key)))
+
+    def sign_many(
+        self, offers: Iterable[tuple], key: bytes | str, *, processes: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> list[tuple[int, int, int]]:
+        """
+        Signs a list of offers with the same key.
+        If `processes` is greater than 1 the offers are signed in chunks over a process pool.
+
+        Returns:
+            The (v, r, s) signatures in the same order as `offers`.
+        """
+        _key = bytes(HexBytes(key))
+        _offers = [tuple(int(v) if isinstance(v, bool | int) else v for v in offer) for offer in offers]
+        if not processes or processes <= 1 or len(_offers) <= chunk_size:
+            return _sign_chunk(self.domain_separator, _key, _offers)
+
+        chunks = [_offers[i : i + chunk_size] for i in range(0, len(_offers), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(_sign_chunk, [self.domain_separator] * len(chunks), [_key] * len(chunks), chunks)
+            return [signature for chunk in results for signature in chunk]
+
+
+@lru_cache
+def get_offer_signer(chain_id: int, verifying_contract: str) -> OfferSigner:
+    return OfferSigner(chain_id, verifying_contract)
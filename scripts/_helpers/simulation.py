@@ -0,0 +1,251 @@
+import json
+import os
+import socket
+import subprocess
+import time
+import urllib.request
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+from rich import print
+
+# Simulation of a deployment plan on local anvil forks, to check that constructors and config transactions succeed and
+# to measure their gas before running the plan for real. The plan of DependencyManager is split in independent
+# sub-plans (connected components of deployments, config transactions and the contracts configs refer to), each
+# replayed by a worker process on its own anvil node, with the deployer impersonated. Nodes start from a state file
+# dumped by anvil (`--dump-state` or `anvil_dumpState`) when one is given, so no live network is needed, otherwise
+# they fork `fork_url`, pinned to `fork_block` so foundry serves the already fetched state from its RPC cache.
+
+ANVIL_START_TIMEOUT = 30.0
+
+
+@dataclass
+class GasEntry:
+    label: str
+    gas_used: int
+    cost: int
+
+
+@dataclass
+class GasReport:
+    entries: list[GasEntry] = field(default_factory=list)
+
+    @property
+    def total_gas(self) -> int:
+        return sum(e.gas_used for e in self.entries)
+
+    @property
+    def total_cost(self) -> int:
+        return sum(e.cost for e in self.entries)
+
+    @classmethod
+    def merge(cls, reports: Iterable["GasReport"]) -> "GasReport":
+        return cls([e for report in reports for e in report.entries])
+
+    def print(self):
+        for e in self.entries:
+            print(f"{e.label:<60} {e.gas_used:>12,} gas {e.cost / 10**18:>14.6f} ETH")
+        print(f"[bold]{'total':<60} {self.total_gas:>12,} gas {self.total_cost / 10**18:>14.6f} ETH[/]")
+
+
+def _tx_owner(tx: Any) -> str | None:
+    owner = getattr(tx, "__self__", None) or getattr(getattr(tx, "func", None), "__self__", None)
+    return getattr(owner, "key", None)
+
+
+def _referenced_keys(value: Any, keys: set[str]) -> set[str]:
+    if isinstance(value, str):
+        return {value} & keys
+    if isinstance(value, dict):
+        return set().union(*(_referenced_keys(k, keys) | _referenced_keys(v, keys) for k, v in value.items()))
+    if isinstance(value, list | tuple | set):
+        return set().union(*(_referenced_keys(v, keys) for v in value))
+    return set()
+
+
+class _DisjointSets:
+    def __init__(self):
+        self.parent: dict[str, str] = {}
+
+    def find(self, k: str) -> str:
+        parent = self.parent
+        parent.setdefault(k, k)
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    def union(self, a: str, b: str):
+        self.parent[self.find(a)] = self.find(b)
+
+    def groups(self) -> list[set[str]]:
+        groups: dict[str, set[str]] = {}
+        for k in self.parent:
+            groups.setdefault(self.find(k), set()).add(k)
+        return sorted(groups.values(), key=sorted)
+
+
+def independent_plans(dependency_manager: Any) -> list[set[str]]:
+    """
+    Groups the contracts to deploy and the config transactions of `dependency_manager`.
+
+    Returns:
+        The keys of each group, so no group deploys or configures anything another group depends on.
+    """
+    context = dependency_manager.context
+    contract_keys = set(context.contracts)
+    deployment_set = dependency_manager.deployment_set
+    sets = _DisjointSets()
+
+    for k in deployment_set:
+        sets.find(k)
+        for dependent in dependency_manager.deployment_dependencies.get(k, set()) & deployment_set:
+            sets.union(k, dependent)
+    for k, txs in dependency_manager.transaction_set.items():
+        sets.find(k)
+        for owner in {_tx_owner(tx) for tx in txs} - {None}:
+            sets.union(k, owner)
+        for ref in _referenced_keys(context.config.get(k), contract_keys) & deployment_set:
+            sets.union(k, ref)
+    return sets.groups()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class AnvilFork:
+    """Anvil node on a free local port, started from `state_file` if it exists, or forking `fork_url`."""
+
+    def __init__(self, *, state_file: Path | None = None, fork_url: str | None = None, fork_block: int | None = None):
+        if not (state_file and state_file.exists()) and not fork_url:
+            raise ValueError("Either an existing state file or a fork url is required")
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.args = ["anvil", "--port", str(self.port), "--silent", "--auto-impersonate"]
+        if state_file and state_file.exists():
+            self.args += ["--load-state", str(state_file)]
+        else:
+            self.args += ["--fork-url", fork_url] + (["--fork-block-number", str(fork_block)] if fork_block else [])
+
+    def rpc(self, method: str, params: list | None = None) -> Any:
+        body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params or []}).encode()
+        request = urllib.request.Request(self.url, body, {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())["result"]
+
+    def __enter__(self) -> "AnvilFork":
+        self.process = subprocess.Popen(self.args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + ANVIL_START_TIMEOUT
+        while True:
+            try:
+                self.rpc("eth_chainId")
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.process.kill()
+                    raise
+                time.sleep(0.1)
+            else:
+                return self
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        self.process.wait()
+
+
+def gas_report(web3: Any, sender: str, from_block: int, context: Any) -> GasReport:
+    """
+    Collects the gas of the transactions of `sender` mined after `from_block`.
+
+    Returns:
+        The report, with the transactions labeled with the deployed contract or function.
+    """
+    by_address = {c.address().lower(): c for c in context.contracts.values() if c.address()}
+    report = GasReport()
+    for number in range(from_block + 1, web3.eth.block_number + 1):
+        for tx in web3.eth.get_block(number, full_transactions=True)["transactions"]:
+            if tx["from"].lower() != sender.lower():
+                continue
+            receipt = web3.eth.get_transaction_receipt(tx["hash"])
+            if receipt["contractAddress"]:
+                config = by_address.get(receipt["contractAddress"].lower())
+                label = f"deploy {config.key if config else receipt['contractAddress']}"
+            else:
+                config = by_address.get((tx["to"] or "").lower())
+                selector = "0x" + bytes(tx["input"][:4]).hex()
+                method = config.contract.contract_type.identifier_lookup.get(selector) if config else None
+                label = f"{config.key if config else tx['to']}.{method.name if method else selector}"
+            if receipt["status"] != 1:
+                label += " (reverted)"
+            report.entries.append(GasEntry(label, receipt["gasUsed"], receipt["gasUsed"] * receipt["effectiveGasPrice"]))
+    return report
+
+
+def simulate_plan(
+    *,
+    env_name: str,
+    chain_name: str,
+    changes: set[str],
+    keys: set[str],
+    state_file: Path | None,
+    fork_url: str | None,
+    fork_block: int | None,
+) -> GasReport:
+    """
+    Worker replaying the part of the plan in `keys` on its own anvil node. Imports ape, so it runs in a fresh process.
+
+    Returns:
+        The gas of the deployments and transactions of the sub-plan.
+    """
+    from ape import accounts, networks  # noqa: PLC0415
+
+    from .deployment import DeploymentManager, Environment  # noqa: PLC0415
+
+    with (
+        AnvilFork(state_file=state_file, fork_url=fork_url, fork_block=fork_block) as fork,
+        networks.ethereum.local.use_provider("foundry", provider_settings={"host": fork.url}) as provider,
+    ):
+        dm = DeploymentManager(Environment[env_name], chain_name)
+        dm.owner = dm.context.owner = accounts.test_accounts.impersonate_account(dm.owner.address)
+        from_block = provider.web3.eth.block_number
+        dm.deploy(changes, save_state=False, only=keys)
+        return gas_report(provider.web3, dm.owner.address, from_block, dm.context)
+
+
+def simulate(
+    dependency_manager: Any,
+    changes: set[str],
+    *,
+    state_file: Path | None = None,
+    fork_url: str | None = None,
+    fork_block: int | None = None,
+    workers: int | None = None,
+) -> GasReport:
+    context = dependency_manager.context
+    plans = independent_plans(dependency_manager)
+    if not plans:
+        return GasReport()
+    print(f"Simulating {len(plans)} independent plans")
+    workers = min(workers or os.cpu_count() or 1, len(plans))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        futures = [
+            executor.submit(
+                simulate_plan,
+                env_name=context.env.name,
+                chain_name=context.chain,
+                changes=set(changes),
+                keys=plan,
+                state_file=state_file,
+                fork_url=fork_url,
+                fork_block=fork_block,
+            )
+            for plan in plans
+        ]
+        reports = [future.result() for future in futures]
+    return GasReport.merge(reports)
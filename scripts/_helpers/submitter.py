@@ -0,0 +1,185 @@
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+from rich import print
+from rich.markup import escape
+from web3.exceptions import TransactionNotFound
+
+# Pipelined submission of transactions from one account. Nonces are assigned locally, so transactions are signed and
+# broadcast back to back without waiting for each other being mined, and their receipts are polled together
+# afterwards. A transaction still pending `stuck_after` seconds after being sent is signed again with the same nonce
+# and its fees bumped by `fee_bump` (nodes only replace a pending transaction for at least 10% more). Every hash sent
+# for a nonce is kept, as any of them may end up mined.
+
+DEFAULT_STUCK_AFTER = 30.0
+DEFAULT_FEE_BUMP = 1.125
+DEFAULT_MAX_BUMPS = 5
+FEE_FIELDS = ("max_fee", "max_priority_fee", "gas_price")
+
+
+class TxStatus(Enum):
+    PENDING = "pending"
+    CONFIRMED = "confirmed"
+    REVERTED = "reverted"
+    FAILED = "failed"
+    STUCK = "stuck"
+
+
+class LocalNonces:
+    """Nonces of `account`, starting from its current nonce on chain and incremented locally for each transaction."""
+
+    def __init__(self, account):
+        self.account = account
+        self.next_nonce = account.nonce
+
+    def take(self) -> int:
+        nonce = self.next_nonce
+        self.next_nonce += 1
+        return nonce
+
+
+@dataclass
+class SubmittedTransaction:
+    label: str
+    nonce: int | None = None
+    txn: Any = None
+    hashes: list[str] = field(default_factory=list)
+    sent_at: float = 0.0
+    bumps: int = 0
+    status: TxStatus = TxStatus.PENDING
+    receipt: Any = None
+    error: Exception | None = None
+
+    @property
+    def txn_hash(self) -> str | None:
+        if self.receipt is not None:
+            return self.receipt["transactionHash"].to_0x_hex()
+        return self.hashes[-1] if self.hashes else None
+
+
+def bumped_fees(txn: Any, fee_bump: float) -> dict[str, int]:
+    """
+    Bumps the fees of `txn` by `fee_bump`, each increased by at least 1 wei.
+
+    Returns:
+        The bumped fee fields.
+    """
+    fees = {f: getattr(txn, f, None) for f in FEE_FIELDS}
+    return {f: max(math.ceil(v * fee_bump), v + 1) for f, v in fees.items() if v is not None}
+
+
+class TransactionSubmitter:
+    def __init__(
+        self,
+        account: Any,
+        *,
+        stuck_after: float = DEFAULT_STUCK_AFTER,
+        fee_bump: float = DEFAULT_FEE_BUMP,
+        max_bumps: int = DEFAULT_MAX_BUMPS,
+        poll_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.account = account
+        self.web3 = account.provider.web3
+        self.stuck_after = stuck_after
+        self.fee_bump = fee_bump
+        self.max_bumps = max_bumps
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.nonces = LocalNonces(account)
+        self.transactions: list[SubmittedTransaction] = []
+
+    def _prepare(self, txn: Any) -> Any:
+        txn.nonce = self.nonces.next_nonce
+        return self.account.prepare_transaction(txn)
+
+    def _send(self, txn: Any) -> str:
+        signed = self.account.sign_transaction(txn)
+        if signed is None:
+            raise ValueError(f"Transaction with nonce {txn.nonce} was not signed")
+        return self.web3.eth.send_raw_transaction(signed.serialize_transaction()).to_0x_hex()
+
+    def submit(self, label: str, build: Callable[[], Any]) -> SubmittedTransaction:
+        """
+        Signs and broadcasts the transaction made by `build` without waiting for it to be mined. If building or
+        preparing it fails while other transactions are pending, eg because its gas estimation depends on them, it's
+        retried once they're mined.
+
+        Returns:
+            The submitted transaction, with the errors recorded in it rather than raised.
+        """
+        submitted = SubmittedTransaction(label)
+        try:
+            try:
+                txn = self._prepare(build())
+            except Exception:
+                if not self.pending():
+                    raise
+                self.wait()
+                txn = self._prepare(build())
+            submitted.hashes.append(self._send(txn))
+            submitted.nonce = self.nonces.take()
+            submitted.txn = txn
+            submitted.sent_at = self.clock()
+        except Exception as e:
+            submitted.status = TxStatus.FAILED
+            submitted.error = e
+        self.transactions.append(submitted)
+        return submitted
+
+    def pending(self) -> list[SubmittedTransaction]:
+        return [t for t in self.transactions if t.status is TxStatus.PENDING]
+
+    def _poll(self, submitted: SubmittedTransaction):
+        for txn_hash in reversed(submitted.hashes):
+            try:
+                receipt = self.web3.eth.get_transaction_receipt(txn_hash)
+            except TransactionNotFound:
+                continue
+            submitted.receipt = receipt
+            submitted.status = TxStatus.CONFIRMED if receipt["status"] == 1 else TxStatus.REVERTED
+            return
+
+        if self.clock() - submitted.sent_at < self.stuck_after:
+            return
+        if submitted.bumps >= self.max_bumps:
+            submitted.status = TxStatus.STUCK
+            return
+        txn = submitted.txn.model_copy(update=bumped_fees(submitted.txn, self.fee_bump))
+        submitted.bumps += 1
+        submitted.sent_at = self.clock()
+        try:
+            submitted.hashes.append(self._send(txn))
+            submitted.txn = txn
+        except Exception as e:
+            # eg nonce too low when a previous hash was mined meanwhile, found in the next poll
+            print(f"[dark_orange bold]WARNING[/] Replacing {escape(submitted.label)} failed: {e}")
+
+    def wait(self) -> list[SubmittedTransaction]:
+        """
+        Polls the receipts of the pending transactions until all are mined or stuck.
+
+        Returns:
+            Every submitted transaction.
+        """
+        while pending := self.pending():
+            for submitted in pending:
+                self._poll(submitted)
+            if self.pending():
+                self.sleep(self.poll_interval)
+        return list(self.transactions)
+
+
+def print_outcomes(transactions: list[SubmittedTransaction]):
+    colors = {TxStatus.CONFIRMED: "green", TxStatus.PENDING: "yellow"}
+    for t in transactions:
+        color = colors.get(t.status, "bold red")
+        bumps = f" after {t.bumps} fee bumps" if t.bumps else ""
+        error = f": {escape(str(t.error))}" if t.error else ""
+        print(f"[{color}]{t.status.value}[/] {escape(t.label)} nonce={t.nonce} {t.txn_hash}{bumps}{error}")
@@ -0,0 +1,292 @@
+import heapq
+import mmap
+import struct
+from bisect import bisect_left
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha3_256
+from pathlib import Path
+
+from eth_utils import keccak
+
+from .hashing import word
+
+# Trait merkle tree as validated by P2PLendingNfts._validate_token_ids. Leaves are
+# keccak256(abi_encode(contract, trait_hash, token_id)), sorted and deduplicated, laid out as a heap
+# (root at 1, leaves at size..2*size-1) and each parent is keccak256(keccak256(left) ^ keccak256(right)).
+# Nodes are kept as ints so the XOR is a single operation instead of a per byte loop.
+
+TREE_FILE_MAGIC = b"ZTTT"
+TREE_FILE_VERSION = 1
+TREE_FILE_HEADER = struct.Struct(">4sIQ")
+NODE_SIZE = 32
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def trait_hash(trait_name: str, trait_value: str) -> bytes:
+    return sha3_256(sha3_256(trait_name.encode()).digest() + sha3_256(trait_value.encode()).digest()).digest()
+
+
+def token_node(contract: str, trait_name: str, trait_value: str, token_id: int) -> bytes:
+    return token_node_from_hash(contract, trait_hash(trait_name, trait_value), token_id)
+
+
+def token_node_from_hash(contract: str, trait_hash: bytes, token_id: int) -> bytes:
+    return keccak(word(contract) + word(trait_hash) + word(token_id))
+
+
+def token_trait_hashes(token_with_traits: Iterable[tuple[str, str, str, int]]) -> dict[int, set[bytes]]:
+    """
+    Inverts the tree leaves, to match TRAIT offers.
+
+    Returns:
+        The trait hashes of each token id.
+    """
+    token_traits = {}
+    for _, trait_name, trait_value, token_id in token_with_traits:
+        token_traits.setdefault(token_id, set()).add(trait_hash(trait_name, trait_value))
+    return token_traits
+
+
+def _token_nodes(token_with_traits: list[tuple[str, str, str, int]]) -> list[int]:
+    return [int.from_bytes(token_node(*t), "big") for t in token_with_traits]
+
+
+def _hash_node(node: int) -> int:
+    return int.from_bytes(keccak(node.to_bytes(NODE_SIZE, "big")), "big")
+
+
+def _merge_nodes(children: list[int]) -> list[int]:
+    hashed = [_hash_node(c) for c in children]
+    return [_hash_node(hashed[i] ^ hashed[i + 1]) for i in range(0, len(hashed), 2)]
+
+
+def _chunks(items: list, chunk_size: int) -> list[list]:
+    return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+class TraitTree:
+    """In memory trait tree, with the same layout and root as tests.conftest_base.TokenTraitTree."""
+
+    def __init__(self, leaves: Iterable[int], *, processes: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.leaves = sorted(set(leaves))
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.nodes, _ = self._build(self.leaves)
+
+    @classmethod
+    def from_tokens(
+        cls,
+        token_with_traits: Iterable[tuple[str, str, str, int]],
+        *,
+        processes: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> "TraitTree":
+        tokens = list(token_with_traits)
+        if processes and processes > 1 and len(tokens) > chunk_size:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                leaves = [n for chunk in executor.map(_token_nodes, _chunks(tokens, chunk_size)) for n in chunk]
+        else:
+            leaves = _token_nodes(tokens)
+        return cls(leaves, processes=processes, chunk_size=chunk_size)
+
+    def __len__(self):
+        return len(self.leaves)
+
+    def _build(self, leaves: list[int], parents: Mapping[tuple[int, int], int] | None = None) -> tuple[list[int], set[int]]:
+        size = len(leaves)
+        nodes = [0] * size + leaves
+        if self.processes and self.processes > 1 and size > self.chunk_size:
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                hashed = self._merge_levels(nodes, size, executor, parents)
+        else:
+            hashed = self._merge_levels(nodes, size, None, parents)
+        return nodes, hashed
+
+    def _merge_levels(
+        self,
+        nodes: list[int],
+        hi: int,
+        executor: ProcessPoolExecutor | None,
+        parents: Mapping[tuple[int, int], int] | None,
+    ) -> set[int]:
+        # nodes in [ceil(hi/2), hi) only depend on nodes >= hi, so each range can be hashed independently. A node whose
+        # children are in `parents` is taken from there instead of being hashed
+        hashed = set()
+        while hi > 1:
+            lo = (hi + 1) // 2
+            if parents is None:
+                nodes[lo:hi] = self._merge(nodes[2 * lo : 2 * hi], executor)
+                hashed.update(range(lo, hi))
+            else:
+                missing = []
+                for index in range(lo, hi):
+                    parent = parents.get((nodes[2 * index], nodes[2 * index + 1]))
+                    if parent is None:
+                        missing.append(index)
+                    else:
+                        nodes[index] = parent
+                merged = self._merge([node for index in missing for node in nodes[2 * index : 2 * index + 2]], executor)
+                for index, node in zip(missing, merged, strict=True):
+                    nodes[index] = node
+                hashed.update(missing)
+            hi = lo
+        return hashed
+
+    def _merge(self, children: list[int], executor: ProcessPoolExecutor | None) -> list[int]:
+        if executor is not None and len(children) > 2 * self.chunk_size:
+            return [n for chunk in executor.map(_merge_nodes, _chunks(children, 2 * self.chunk_size)) for n in chunk]
+        return _merge_nodes(children)
+
+    def update(self, inserted: Iterable[int] = (), deleted: Iterable[int] = ()) -> set[int]:
+        """
+        Applies leaf inserts and deletes.
+        Leaves are kept sorted in the heap, so only the leaves between the first and last change move. If the number
+        of leaves is unchanged (eg a token trait value changing) only those leaves and their ancestors are rehashed.
+        Otherwise every leaf moves to a new heap index, but the subtrees whose leaves and shape are unchanged keep
+        their root, so only the nodes whose children differ from every parent of the current tree are hashed.
+
+        Returns:
+            The heap indexes that were rehashed.
+        """
+        leaves = set(self.leaves)
+        leaves.difference_update(deleted)
+        leaves.update(inserted)
+        new_leaves = sorted(leaves)
+        size = len(new_leaves)
+
+        if size != len(self.leaves):
+            nodes = self.nodes
+            parents = {(nodes[2 * i], nodes[2 * i + 1]): nodes[i] for i in range(1, len(self.leaves))}
+            self.leaves = new_leaves
+            self.nodes, hashed = self._build(new_leaves, parents)
+            return hashed | set(range(size, 2 * size))
+
+        changed = [size + i for i, (old, new) in enumerate(zip(self.leaves, new_leaves, strict=True)) if old != new]
+        self.leaves = new_leaves
+        self.nodes[size:] = new_leaves
+        return self._rehash_paths(changed)
+
+    def _rehash_paths(self, changed: list[int]) -> set[int]:
+        # parents always have a lower index than their children, so popping the highest index first means both
+        # children of a node are up to date when it is rehashed, whatever the depth of each leaf
+        pending = [-(i // 2) for i in set(changed) if i > 1]
+        heapq.heapify(pending)
+        rehashed = set(changed)
+        while pending:
+            index = -heapq.heappop(pending)
+            if index in rehashed:
+                continue
+            left, right = self.nodes[2 * index], self.nodes[2 * index + 1]
+            self.nodes[index] = _hash_node(_hash_node(left) ^ _hash_node(right))
+            rehashed.add(index)
+            if index > 1:
+                heapq.heappush(pending, -(index // 2))
+        return rehashed
+
+    def root(self) -> bytes:
+        return self.nodes[1].to_bytes(NODE_SIZE, "big")
+
+    def index(self, node: bytes) -> int | None:
+        value = int.from_bytes(node, "big")
+        pos = bisect_left(self.leaves, value)
+        if pos < len(self.leaves) and self.leaves[pos] == value:
+            return len(self.leaves) + pos
+        return None
+
+    def proof(self, node: bytes) -> list[bytes]:
+        index = self.index(node)
+        if index is None:
+            return []
+        proof_list = []
+        while index > 1:
+            proof_list.append(self.nodes[index ^ 1].to_bytes(NODE_SIZE, "big"))
+            index //= 2
+        return proof_list
+
+    def save(self, path: Path | str):
+        """Writes the tree as a header followed by every heap node as a 32 bytes word, replacing the file atomically."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with tmp_path.open("wb") as f:
+            f.write(TREE_FILE_HEADER.pack(TREE_FILE_MAGIC, TREE_FILE_VERSION, len(self.leaves)))
+            for chunk in _chunks(self.nodes, self.chunk_size):
+                f.write(b"".join(n.to_bytes(NODE_SIZE, "big") for n in chunk))
+        tmp_path.replace(path)
+
+
+class TraitTreeFile:
+    """Memory mapped tree saved by TraitTree.save. Lookups are a binary search over the sorted leaves."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size = TREE_FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != TREE_FILE_MAGIC or version != TREE_FILE_VERSION:
+            raise ValueError(f"{self.path} is not a trait tree file")
+        if len(self._mmap) != TREE_FILE_HEADER.size + 2 * self.size * NODE_SIZE:
+            raise ValueError(f"{self.path} is truncated")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self._mmap.close()
+
+    def node(self, index: int) -> bytes:
+        offset = TREE_FILE_HEADER.size + index * NODE_SIZE
+        return self._mmap[offset : offset + NODE_SIZE]
+
+    def root(self) -> bytes:
+        return self.node(1)
+
+    def index(self, node: bytes) -> int | None:
+        lo, hi = self.size, 2 * self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.node(mid) < node:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < 2 * self.size and self.node(lo) == node:
+            return lo
+        return None
+
+    def proof(self, node: bytes) -> list[bytes]:
+        index = self.index(node)
+        if index is None:
+            return []
+        proof_list = []
+        while index > 1:
+            proof_list.append(self.node(index ^ 1))
+            index //= 2
+        return proof_list
+
+
+def _normalize_root(root: str | bytes) -> str:
+    if isinstance(root, bytes):
+        return root.hex()
+    return root.removeprefix("0x").lower()
+
+
+def diff_trait_roots(current: Mapping[str, str], new: Mapping[str, str | bytes]) -> dict[str, str]:
+    """
+    Compares the trait roots in `new` with the `current` ones (eg configs.trait_roots).
+
+    Returns:
+        The collections in `new` whose root is missing or different in `current`, with the roots as in the config
+        files, hex encoded without the 0x prefix.
+    """
+    current_roots = {collection: _normalize_root(root) for collection, root in current.items()}
+    return {
+        collection: root
+        for collection, root in ((c, _normalize_root(r)) for c, r in new.items())
+        if current_roots.get(collection) != root
+    }
@@ -1,10 +1,22 @@
-from functools import wraps
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from functools import cache, wraps
 from typing import Any
 
+from ape import Contract, chain
 from rich import print
 from rich.markup import escape
 
 from .basetypes import ContractConfig, DeploymentContext
+from .multicall import MULTICALL3_ABI, MULTICALL3_ADDRESS, aggregate_calls
+
+Read = tuple[str, str, tuple]
+
+
+def _declare_reads(wrapper: Callable, f: Callable, reads: Callable[[Any, DeploymentContext], list[Read]]):
+    # config functions declare the reads their checks do, so they can be prefetched in a batch, see config_reads
+    inner_reads = getattr(f, "config_reads", None)
+    wrapper.config_reads = lambda self, context: reads(self, context) + (inner_reads(self, context) if inner_reads else [])
 
 
 def check_owner(f):
@@ -14,6 +26,7 @@ def check_owner(f):
             self.__is_deployer_owner = is_deployer_owner(context, self.key)
         return f(self, context, *args, **kwargs)
 
+    _declare_reads(wrapper, f, lambda self, context: [(self.key, "owner", ())] if context[self.key].address() else [])
     return wrapper
 
 
@@ -29,11 +42,24 @@ def check_different(getter: str, value_property: Any):
                 return lambda *_: None
             return f(self, context, *args, **kwargs)
 
+        _declare_reads(wrapper, f, lambda self, context: [] if context.dryrun else [(self.key, getter, ())])
         return wrapper
 
     return check_if_needed
 
 
+def config_reads(tx: Callable, context: DeploymentContext) -> list[Read]:
+    """
+    Lists the reads done by the checks of a config transaction, a bound method decorated with check_owner or
+    check_different.
+
+    Returns:
+        The (contract, func, args) reads of the checks.
+    """
+    reads = getattr(getattr(tx, "__func__", None), "config_reads", None)
+    return [r for r in reads(tx.__self__, context) if context[r[0]].address()] if reads else []
+
+
 def is_deployer_owner(context: DeploymentContext, contract: str) -> bool:
     if not context[contract].address():
         return True
@@ -54,28 +80,132 @@ def is_config_needed(context: DeploymentContext, contract: str, func: str, new_v
     return True
 
 
+def _args_values(context: DeploymentContext, args: Iterable[Any]) -> list[Any]:
+    args_values = [context[c] if c in context else c for c in args]  # noqa: SIM401
+    return [v.address() if isinstance(v, ContractConfig) else v for v in args_values]
+
+
+def _read_key(contract: str, func: str, args_values: list[Any]) -> Read | None:
+    try:
+        key = (contract, func, tuple(args_values))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+@cache
+def _multicall(chain_id: int) -> Any:  # noqa: ARG001 cached per chain
+    if not chain.provider.get_code(MULTICALL3_ADDRESS):
+        return None
+    return Contract(MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+
+
+def get_multicall() -> Any:
+    """
+    Gets the Multicall3 contract of the connected chain.
+
+    Returns:
+        The contract, or None where it isn't deployed, eg local networks.
+    """
+    return _multicall(chain.chain_id)
+
+
 def execute_read(context: DeploymentContext, contract: str, func: str, *args, options=None):
     contract_instance = context.contracts[contract].contract
     args_repr = [f"[blue]{escape(c)}[/blue]" if c in context else c for c in args]
     print(f"Calling [blue]{escape(contract)}[/blue].{func}({', '.join(args_repr)})", end=" ")
 
-    args_values = [context[c] if c in context else c for c in args]  # noqa: SIM401
-    args_values = [v.address() if isinstance(v, ContractConfig) else v for v in args_values]
-
-    result = contract_instance.call_view_method(func, *args_values, **(options or {}))
+    args_values = _args_values(context, args)
+    key = _read_key(contract, func, args_values) if not options else None
+    if key in context.prefetched_reads:
+        # each prefetched value is used once, by the check it was prefetched for
+        result = context.prefetched_reads.pop(key)
+    else:
+        result = contract_instance.call_view_method(func, *args_values, **(options or {}))
     print(f"= {result}")
     return result
 
 
+def execute_reads(context: DeploymentContext, reads: Iterable[Read]) -> list[Any]:
+    """
+    Same as execute_read for each (contract, func, args) in `reads`, through one Multicall3 aggregate call per chunk
+    of reads, regardless of the contracts. Falls back to execute_read where Multicall3 isn't available.
+
+    Returns:
+        The result of each read, in order.
+
+    Raises:
+        ValueError: If a read reverts.
+    """
+    reads = list(reads)
+    multicall = get_multicall()
+    if multicall is None or len(reads) < 2:
+        return [execute_read(context, contract, func, *args) for contract, func, args in reads]
+
+    methods = [getattr(context.contracts[contract].contract, func) for contract, func, _ in reads]
+    calls = [
+        (context.contracts[contract].address(), method.encode_input(*_args_values(context, args)))
+        for (contract, _, args), method in zip(reads, methods)
+    ]
+    print(f"Calling {len(reads)} view functions through multicall")
+    results = []
+    for (contract, func, args), method, return_data in zip(reads, methods, aggregate_calls(multicall.aggregate3.call, calls)):
+        if return_data is None:
+            raise ValueError(f"Multicall read {contract}.{func}{args} reverted")
+        results.append(method.decode_output(return_data))
+    return results
+
+
+def execute_read_many(context: DeploymentContext, contract: str, func: str, args_list: Iterable[tuple]) -> list[Any]:
+    return execute_reads(context, [(contract, func, tuple(args)) for args in args_list])
+
+
+def prefetch_reads(context: DeploymentContext, reads: Iterable[Read]) -> list[Read]:
+    """
+    Reads in a batch the values later calls to execute_read will ask for, eg the config_reads of transactions.
+
+    Returns:
+        The keys stored in `context.prefetched_reads`, none where Multicall3 isn't available.
+    """
+    reads = list(dict.fromkeys(reads))
+    if len(reads) < 2 or get_multicall() is None:
+        return []
+    keys = []
+    for (contract, func, args), result in zip(reads, execute_reads(context, reads)):
+        key = _read_key(contract, func, _args_values(context, args))
+        if key is not None:
+            context.prefetched_reads[key] = result
+            keys.append(key)
+    return keys
+
+
+@contextmanager
+def prefetched(context: DeploymentContext, reads: Iterable[Read]) -> Iterator[None]:
+    """
+    Prefetches `reads` for the block. The values not used inside it are dropped on exit, even on errors, so a later
+    execute_read can't return a value read before transactions changed it.
+    """
+    keys = prefetch_reads(context, reads)
+    try:
+        yield
+    finally:
+        for key in keys:
+            context.prefetched_reads.pop(key, None)
+
+
 def execute(context: DeploymentContext, contract: str, func: str, *args, options=None):
     args_repr = [f"[blue]{escape(c)}[/blue]" if c in context else str(c) for c in args]
     print(f"Executing [blue]{escape(contract)}[/blue].{func}({', '.join(args_repr)})")
     if not context.dryrun:
         contract_instance = context.contracts[contract].contract
         function = getattr(contract_instance, func)
-        args_values = [context[c] if c in context else c for c in args]  # noqa: SIM401
-        args_values = [v.address() if isinstance(v, ContractConfig) else v for v in args_values]
+        args_values = _args_values(context, args)
+        kwargs = {"sender": context.owner} | context.gas_options() | (options or {})
+        if context.submitter is not None:
+            context.submitter.submit(f"{contract}.{func}", lambda: function.as_transaction(*args_values, **kwargs))
+            return
         try:
-            function(*args_values, **({"sender": context.owner} | context.gas_options() | (options or {})))
+            function(*args_values, **kwargs)
         except Exception as e:
             print(f"[bold red]Error executing {contract}.{func} with arguments {args_values}: {e}")
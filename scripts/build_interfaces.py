@@ -1,11 +1,19 @@
 # ruff: noqa: T201, RUF013
 
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
 from pathlib import Path
 
 import click
-from vyper import compile_code
 
 FUNCTIONS_BLACKLIST = ["__init__", "__default__"]
+CACHE_DIR = Path(".cache") / "interfaces"
+INDEX_FILE = "index.json"
+# interfaces generated by a previous version of this module are generated again
+GENERATOR_HASH = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
 
 
 def nested_get(d: dict, *args, default=None):
@@ -38,26 +46,6 @@ def node_summary(node: dict):
     return ",".join(f"{attr}={node.get(attr, '')}" for attr in attrs)
 
 
-def is_external_function(node):
-    is_func = node["ast_type"] = "FunctionDef"
-    decorators = node.get("decorator_list", [])
-    return is_func and any(d for d in decorators if d["id"] == "external")
-
-
-def is_public_variable(node):
-    is_var = node["ast_type"] = "VariableDec"
-    is_public = node.get("is_public", False)
-    return is_var and is_public
-
-
-def is_event(node):
-    return node["ast_type"] == "EventDef"
-
-
-def is_struct(node):
-    return node["ast_type"] == "StructDef"
-
-
 def get_arg_type(node: dict):  # noqa: PLR0911
     match node["ast_type"]:
         case "Name":
@@ -87,13 +75,6 @@ def get_struct(node: dict):
     return "\n".join(struct_code + attr_code)
 
 
-def get_structs(ast):
-    structs = traverse(ast, _filter=is_struct)
-    header = ["# Structs"]
-    structs_code = [get_struct(e) for e in structs]
-    return "\n\n".join(header + structs_code)
-
-
 def get_event(node: dict):
     name = node.get("name")
     event_code = [f"event {name}:"]
@@ -110,13 +91,6 @@ def get_event(node: dict):
     return "\n".join(event_code + attr_code)
 
 
-def get_events(ast):
-    events = traverse(ast, _filter=is_event)
-    header = ["# Events"]
-    events_code = [get_event(e) for e in events]
-    return "\n\n".join(header + events_code)
-
-
 def get_function(node: dict):
     name = node.get("name")
     decorators = [d["id"] for d in node.get("decorator_list", [])]
@@ -153,38 +127,140 @@ def get_public_var(node: dict):
     return "\n".join(decorators_code + function_code)
 
 
-def get_functions(ast: dict):
-    external_functions = traverse(ast, _filter=is_external_function)
-    public_variables = traverse(ast, _filter=is_public_variable)
-    header = ["# Functions"]
-    public_vars_code = [get_public_var(v) for v in public_variables]
-    functions_code = [get_function(f) for f in external_functions if f["name"] not in FUNCTIONS_BLACKLIST]
-    return "\n\n".join(header + public_vars_code + functions_code)
+def collect_nodes(ast: dict) -> dict[str, list[dict]]:
+    """
+    Collects the nodes of `ast` in a single traversal.
+
+    Returns:
+        The structs, events, public variables and external functions of `ast`, in order.
+    """
+    collected = {"structs": [], "events": [], "public_vars": [], "functions": []}
+    for node in traverse(ast):
+        ast_type = node.get("ast_type")
+        if ast_type == "StructDef":
+            collected["structs"].append(node)
+        elif ast_type == "EventDef":
+            collected["events"].append(node)
+        elif node.get("is_public", False):
+            collected["public_vars"].append(node)
+        elif any(d.get("id") == "external" for d in node.get("decorator_list", [])):
+            collected["functions"].append(node)
+    return collected
+
+
+def interface_code(ast: dict) -> str:
+    nodes = collect_nodes(ast)
+    structs = "\n\n".join(["# Structs"] + [get_struct(n) for n in nodes["structs"]])
+    events = "\n\n".join(["# Events"] + [get_event(n) for n in nodes["events"]])
+    functions = "\n\n".join(
+        ["# Functions"]
+        + [get_public_var(n) for n in nodes["public_vars"]]
+        + [get_function(n) for n in nodes["functions"] if n["name"] not in FUNCTIONS_BLACKLIST]
+    )
+    return "\n\n".join([structs, events, functions])  # noqa: FLY002
+
+
+def compile_ast(code: str) -> dict:
+    from vyper import compile_code  # noqa: PLC0415 only imported by the processes actually compiling
+
+    return compile_code(code, output_formats=["ast_dict"])["ast_dict"]["ast"]
 
 
 def generate_interface(input_file: Path, output_file: Path):
     with input_file.open("r") as f:
         code = f.read()
-    compiler_output = compile_code(code, ["ast_dict"])
-    ast = compiler_output["ast_dict"]["ast"]
-
-    structs = get_structs(ast)
-    events = get_events(ast)
-    functions = get_functions(ast)
-    gen_code = "\n\n".join([structs, events, functions])  # noqa: FLY002
+    gen_code = interface_code(compile_ast(code))
 
     with output_file.open("w") as f:
         f.write(gen_code)
 
 
+class InterfaceBuilder:
+    """
+    Generates interfaces, compiling the changed files in a process pool. ASTs are cached under `cache_dir` by hash of
+    the source and the vyper version, and files whose source, generator and interface are unchanged since the last
+    run are skipped without compiling or even importing vyper.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, jobs: int | None = None):
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.vyper_version = version("vyper")
+        self.generator_hash = GENERATOR_HASH
+        index_file = cache_dir / INDEX_FILE
+        self.index: dict[str, dict[str, str]] = json.loads(index_file.read_text()) if index_file.exists() else {}
+
+    def ast_key(self, code: str) -> str:
+        return hashlib.sha256(f"{self.vyper_version}\n{code}".encode()).hexdigest()
+
+    def source_key(self, ast_key: str) -> str:
+        return hashlib.sha256(f"{self.generator_hash}\n{ast_key}".encode()).hexdigest()
+
+    def _ast_file(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _is_unchanged(self, input_file: Path, output_file: Path, key: str) -> bool:
+        entry = self.index.get(str(input_file))
+        if not entry or entry["source"] != key or not output_file.exists():
+            return False
+        return hashlib.sha256(output_file.read_bytes()).hexdigest() == entry["output"]
+
+    def build(self, files: list[tuple[Path, Path]]) -> list[Path]:
+        """
+        Generates the interface of each (input, output) pair.
+
+        Returns:
+            The inputs actually regenerated.
+        """
+        sources = {input_file: input_file.read_text() for input_file, _ in files}
+        ast_keys = {input_file: self.ast_key(code) for input_file, code in sources.items()}
+        keys = {input_file: self.source_key(ast_key) for input_file, ast_key in ast_keys.items()}
+        changed = [(i, o) for i, o in files if not self._is_unchanged(i, o, keys[i])]
+
+        asts = {}
+        to_compile = []
+        for input_file, _ in changed:
+            ast_file = self._ast_file(ast_keys[input_file])
+            if ast_file.exists():
+                asts[input_file] = json.loads(ast_file.read_text())
+            else:
+                to_compile.append(input_file)
+
+        if to_compile:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with ProcessPoolExecutor(max_workers=self.jobs or os.cpu_count()) as executor:
+                for input_file, ast in zip(to_compile, executor.map(compile_ast, [sources[f] for f in to_compile])):
+                    self._ast_file(ast_keys[input_file]).write_text(json.dumps(ast))
+                    asts[input_file] = ast
+
+        for input_file, output_file in changed:
+            print(f"Generating {input_file} -> {output_file}")
+            gen_code = interface_code(asts[input_file])
+            output_file.write_text(gen_code)
+            output_hash = hashlib.sha256(gen_code.encode()).hexdigest()
+            self.index[str(input_file)] = {"source": keys[input_file], "output": output_hash}
+
+        if changed:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / INDEX_FILE).write_text(json.dumps(self.index, indent=4, sort_keys=True))
+        return [input_file for input_file, _ in changed]
+
+
 @click.command()
 @click.argument("filenames", nargs=-1, type=click.Path(path_type=Path, exists=True))
 @click.option("-o", "--output-dir", type=click.Path(path_type=Path, exists=True), default="interfaces")
-def main(filenames: list, output_dir: str):
-    for f in filenames:
-        opath = output_dir / f"I{f.name}"
-        print(f"Generating {f} -> {opath}")
-        generate_interface(f, opath)
+@click.option("-j", "--jobs", type=int, default=None, help="Compiler processes, defaults to the cpu count")
+@click.option("--no-cache", is_flag=True, help="Compile every file in sequence, without the cache")
+def main(filenames: list, output_dir: str, jobs: int, no_cache: bool):  # noqa: FBT001
+    files = [(f, output_dir / f"I{f.name}") for f in filenames]
+    if no_cache:
+        for f, opath in files:
+            print(f"Generating {f} -> {opath}")
+            generate_interface(f, opath)
+        return
+
+    generated = InterfaceBuilder(jobs=jobs).build(files)
+    print(f"{len(generated)} interfaces generated, {len(files) - len(generated)} unchanged")
 
 
 if __name__ == "__main__":
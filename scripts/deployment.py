@@ -3,11 +3,12 @@ import os
 import warnings
 
 import click
-from ape import convert
+from ape import chain
 from ape.cli import ConnectedProviderCommand
 from rich import print
 
 from ._helpers.deployment import DeploymentManager, Environment
+from ._helpers.fees import FeeOracle, Speed
 
 ENV = Environment[os.environ.get("ENV", "local")]
 CHAIN = os.environ.get("CHAIN", "nochain")
@@ -18,16 +19,13 @@ logger.setLevel(logging.WARNING)
 warnings.filterwarnings("ignore")
 
 
-def gas_cost(context):  # noqa: ARG001
-    return {"gas_price": convert("10 gwei", int)}
-
-
 @click.command(cls=ConnectedProviderCommand)
-def cli(network):
+@click.option("--speed", type=click.Choice([s.name for s in Speed]), default=Speed.standard.name, help="Inclusion speed")
+def cli(network, speed):
     print(f"Connected to {network}")
 
     dm = DeploymentManager(ENV, CHAIN)
-    dm.context.gas_func = gas_cost
+    dm.context.gas_func = FeeOracle(chain.provider.web3, speed=Speed[speed])
 
     changes = set()
     # changes |= {
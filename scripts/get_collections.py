@@ -1,14 +1,16 @@
-import json
 import logging
 import os
 import warnings
+from collections.abc import Iterable, Iterator
 from decimal import Decimal
-from pathlib import Path
 
 import boto3
 import click
+from boto3.dynamodb.conditions import Attr
 
+from ._helpers.config_store import COLLECTIONS_FILE, get_config_store
 from ._helpers.deployment import Environment
+from ._helpers.dynamodb import DEFAULT_SCAN_SEGMENTS, parallel_scan
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
@@ -31,29 +33,22 @@ def deserialize_values(item):
     return item
 
 
-def get_collections():
-    collection_items = []
-    response = COLLECTIONS.scan()
-    while "LastEvaluatedKey" in response:
-        collection_items.extend(deserialize_values(i) for i in response["Items"])
-        response = COLLECTIONS.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
-    collection_items.extend(deserialize_values(i) for i in response["Items"])
-    return collection_items
+def get_collections(chain: str, *, segments: int = DEFAULT_SCAN_SEGMENTS) -> Iterator[dict]:
+    items = parallel_scan(COLLECTIONS, segments=segments, FilterExpression=Attr("chain").eq(chain))
+    return (deserialize_values(i) for i in items)
 
 
-def store_collections_config(collections: list[dict], env: Environment, chain: str):
-    config_file = f"{Path.cwd()}/configs/{env.name}/{chain}/collections.json"
-    config = {c["collection_key"]: c for c in collections if c.get("chain") == chain}
-
-    with open(config_file, "w") as f:
-        f.write(json.dumps(config, indent=4, sort_keys=True))
+def store_collections_config(collections: Iterable[dict], env: Environment, chain: str):
+    entries = ((c["collection_key"], c) for c in collections if c.get("chain") == chain)
+    get_config_store(env.name, chain).write_entries(COLLECTIONS_FILE, entries)
 
 
 @click.command()
-def cli():
+@click.option("--segments", type=int, default=DEFAULT_SCAN_SEGMENTS, help="Parallel scan segments")
+def cli(segments: int):
     print(f"Retrieving collection configs in {ENV.name} for {CHAIN}")
 
-    collections = get_collections()
+    collections = get_collections(CHAIN, segments=segments)
     store_collections_config(collections, ENV, CHAIN)
 
     print(f"Collections configs retrieved in {ENV.name} for {CHAIN}")
@@ -1,14 +1,16 @@
-import json
 import logging
 import os
 import warnings
+from collections.abc import Iterable, Iterator
 from decimal import Decimal
-from pathlib import Path
 
 import boto3
 import click
+from boto3.dynamodb.conditions import Attr
 
+from ._helpers.config_store import TOKENS_FILE, get_config_store
 from ._helpers.deployment import Environment
+from ._helpers.dynamodb import DEFAULT_SCAN_SEGMENTS, parallel_scan
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
@@ -31,29 +33,22 @@ def deserialize_values(item):
     return item
 
 
-def get_tokens():
-    items = []
-    response = TOKENS.scan()
-    while "LastEvaluatedKey" in response:
-        items.extend(deserialize_values(i) for i in response["Items"])
-        response = TOKENS.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
-    items.extend(deserialize_values(i) for i in response["Items"])
-    return items
+def get_tokens(chain: str, *, segments: int = DEFAULT_SCAN_SEGMENTS) -> Iterator[dict]:
+    items = parallel_scan(TOKENS, segments=segments, FilterExpression=Attr("chain").eq(chain))
+    return (deserialize_values(i) for i in items)
 
 
-def store_tokens_config(tokens: list[dict], env: Environment, chain: str):
-    config_file = f"{Path.cwd()}/configs/{env.name}/{chain}/tokens.json"
-    config = {c["symbol"].lower(): c for c in tokens if c.get("chain") == chain}
-
-    with open(config_file, "w") as f:
-        f.write(json.dumps(config, indent=4, sort_keys=True))
+def store_tokens_config(tokens: Iterable[dict], env: Environment, chain: str):
+    entries = ((c["symbol"].lower(), c) for c in tokens if c.get("chain") == chain)
+    get_config_store(env.name, chain).write_entries(TOKENS_FILE, entries)
 
 
 @click.command()
-def cli():
+@click.option("--segments", type=int, default=DEFAULT_SCAN_SEGMENTS, help="Parallel scan segments")
+def cli(segments: int):
     print(f"Retrieving tokens configs in {ENV.name} for {CHAIN}")
 
-    tokens = get_tokens()
+    tokens = get_tokens(CHAIN, segments=segments)
     store_tokens_config(tokens, ENV, CHAIN)
 
     print(f"Tokens configs retrieved in {ENV.name} for {CHAIN}")
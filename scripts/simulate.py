@@ -0,0 +1,33 @@
+import logging
+import os
+import warnings
+from pathlib import Path
+
+import click
+from rich import print
+
+from ._helpers.deployment import DeploymentManager, Environment
+
+ENV = Environment[os.environ.get("ENV", "local")]
+CHAIN = os.environ.get("CHAIN", "nochain")
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+warnings.filterwarnings("ignore")
+
+
+@click.command()
+@click.option("--state-file", type=click.Path(path_type=Path, exists=True), help="Anvil state to start from, eg --dump-state")
+@click.option("--fork-url", help="RPC url to fork when no state file is given")
+@click.option("--fork-block", type=int, help="Block to fork at, pinned so foundry caches the fetched state")
+@click.option("--workers", type=int, help="Parallel simulations, defaults to the cpu count")
+@click.option("--change", "changes", multiple=True, help="Contract or config key to redeploy or reconfigure")
+def cli(state_file, fork_url, fork_block, workers, changes):
+    print(f"Simulating deployment in {ENV.name} for {CHAIN}")
+
+    dm = DeploymentManager(ENV, CHAIN, lazy=True)
+    report = dm.simulate(set(changes), state_file=state_file, fork_url=fork_url, fork_block=fork_block, workers=workers)
+    report.print()
+
+    print("Done")
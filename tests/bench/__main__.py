@@ -0,0 +1,162 @@
+import json
+from collections import namedtuple
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+
+import boa
+import click
+from eth_account import Account
+
+from scripts._helpers.basetypes import ContractConfig, DeploymentContext, Environment, abi_key
+from scripts._helpers.dependency import DependencyManager, topological_sort
+
+from ..conftest_base import (
+    EventRecorder,
+    Fee,
+    Loan,
+    Offer,
+    OfferType,
+    TokenTraitTree,
+    compute_loan_hash,
+    compute_signed_offer_id,
+    get_events,
+    get_last_event,
+    get_loan_mutations,
+    sign_offer,
+)
+from .harness import (
+    DEFAULT_MIN_TIME,
+    DEFAULT_REPEAT,
+    DEFAULT_WARMUP,
+    format_results,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+# Hot paths of the off-chain helpers and of the test helpers, on fixed synthetic inputs so runs are comparable. Only
+# boa's local evm is used, no network. Run before and after a change and compare:
+#   python -m tests.bench -o .cache/bench/before.json
+#   python -m tests.bench -o .cache/bench/after.json --compare .cache/bench/before.json
+
+TREE_TOKENS = 256
+EVENTS = 200
+DEPLOYMENT_LEVELS = 8
+CONTRACTS_PER_LEVEL = 16
+ABI_FILE = Path("contracts/auxiliary/GondiMultiSourceLoan_abi.json")
+
+LoanCreated = namedtuple("LoanCreated", ["id", "amount", "borrower"])
+LoanPaid = namedtuple("LoanPaid", ["id", "amount"])
+
+
+class EventsContract:
+    # stands for a contract whose last transaction emitted `logs`
+    def __init__(self, logs: list):
+        self.logs = logs
+        self.address = boa.env.generate_address("events")
+        self._computation = object()
+
+    def get_logs(self):
+        return self.logs
+
+
+def _noop(*args):
+    pass
+
+
+def _deployment_context() -> DeploymentContext:
+    # each contract depends on two of the previous level and configures one of them
+    contracts = {}
+    for level in range(DEPLOYMENT_LEVELS):
+        for i in range(CONTRACTS_PER_LEVEL):
+            key = f"c{level}_{i}"
+            previous = [f"c{level - 1}_{j % CONTRACTS_PER_LEVEL}" for j in (i, i + 1)] if level else []
+            contracts[key] = ContractConfig(
+                key,
+                None,
+                None,
+                deployment_deps=set(previous),
+                config_deps={p: partial(_noop, key, p) for p in previous[:1]},
+            )
+    return DeploymentContext(contracts, Environment.local, "local", None)
+
+
+def hot_paths() -> dict[str, Callable[[], object]]:
+    lender = Account.create()
+    verifying_contract = boa.env.generate_address("p2p")
+    collection = boa.env.generate_address("collection")
+    borrower = boa.env.generate_address("borrower")
+    offer = Offer(
+        principal=1000,
+        interest=100,
+        payment_token=boa.env.generate_address("token"),
+        duration=100,
+        broker_address=boa.env.generate_address("broker"),
+        offer_type=OfferType.TOKEN,
+        token_id=1,
+        expiration=2**32,
+        lender=lender.address,
+        tracing_id=b"bench".zfill(32),
+    )
+    signed_offer = sign_offer(offer, lender.key, verifying_contract)
+    loan = Loan(
+        id=b"\1" * 32,
+        offer_id=compute_signed_offer_id(signed_offer),
+        amount=offer.principal,
+        interest=offer.interest,
+        payment_token=offer.payment_token,
+        maturity=200,
+        start_time=100,
+        borrower=borrower,
+        lender=lender.address,
+        collateral_contract=collection,
+        collateral_token_id=1,
+        fees=[Fee.origination(offer), Fee.lender_broker(offer)],
+        delegate=borrower,
+    )
+    token_with_traits = [(collection, "trait", f"value{i % 8}", i) for i in range(TREE_TOKENS)]
+    tree = TokenTraitTree(token_with_traits)
+    node = TokenTraitTree.token_node(*token_with_traits[TREE_TOKENS // 2])
+    events = EventsContract([LoanCreated(i, 1000, borrower) if i % 2 else LoanPaid(i, 1100) for i in range(EVENTS)])
+    abi = json.loads(ABI_FILE.read_text())
+    context = _deployment_context()
+    dependencies = DependencyManager(context, set()).deployment_dependencies
+
+    return {
+        "sign_offer": partial(sign_offer, offer, lender.key, verifying_contract),
+        "compute_loan_hash": partial(compute_loan_hash, loan),
+        "compute_signed_offer_id": partial(compute_signed_offer_id, signed_offer),
+        f"TokenTraitTree[{TREE_TOKENS}]": partial(TokenTraitTree, token_with_traits),
+        f"TokenTraitTree.proof[{TREE_TOKENS}]": partial(tree.proof, node),
+        "get_loan_mutations": lambda: list(get_loan_mutations(loan)),
+        f"EventRecorder._index[{EVENTS}]": partial(EventRecorder._index, events),
+        f"get_events[{EVENTS}]": partial(get_events, events, "LoanCreated"),
+        f"get_last_event[{EVENTS}]": partial(get_last_event, events, "LoanPaid"),
+        f"abi_key[{ABI_FILE.stem}]": partial(abi_key, abi),
+        f"DependencyManager[{len(context.contracts)}]": partial(DependencyManager, context, set()),
+        f"topological_sort[{len(context.contracts)}]": partial(topological_sort, dependencies),
+    }
+
+
+@click.command()
+@click.option("-o", "--output", type=click.Path(path_type=Path), help="Json file to write the results to")
+@click.option("--compare", type=click.Path(path_type=Path, exists=True), help="Results of a previous run to compare to")
+@click.option("-k", "--filter", "name_filter", default="", help="Only run benchmarks whose name contains this")
+@click.option("--warmup", type=int, default=DEFAULT_WARMUP, help="Calls before timing")
+@click.option("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs")
+@click.option("--min-time", type=float, default=DEFAULT_MIN_TIME, help="Minimum seconds of each timed run")
+def cli(output, compare, name_filter, warmup, repeat, min_time):
+    results = [
+        run_benchmark(name, func, warmup=warmup, repeat=repeat, min_time=min_time)
+        for name, func in hot_paths().items()
+        if name_filter in name
+    ]
+    for line in format_results(results, load_results(compare) if compare else None):
+        click.echo(line)
+    if output:
+        save_results(output, results)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,121 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Microbenchmark harness for the python helpers. Each benchmark is warmed up, then timed over `repeat` runs of
+# as many calls as fit in `min_time` (calibrated like timeit.autorange), and reported as the median ops/sec of the
+# runs. Allocations are measured apart from the timing, since tracemalloc slows down every allocation: the peak
+# memory allocated during a call and the memory still allocated after it, averaged over a few calls. Results are
+# saved as versioned json, so the runs before and after a change can be compared.
+
+RESULTS_VERSION = 1
+DEFAULT_WARMUP = 3
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.2
+ALLOCATION_CALLS = 5
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    ops_per_sec: float
+    runs: list[float]
+    calls_per_run: int
+    peak_bytes: int
+    retained_bytes: int
+
+    @property
+    def spread(self) -> float:
+        """Relative spread of the runs, to tell noise from an actual change."""
+        return (max(self.runs) - min(self.runs)) / self.ops_per_sec if self.ops_per_sec else 0.0
+
+
+def _time_calls(func: Callable[[], object], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return time.perf_counter() - start
+
+
+def _calibrate(func: Callable[[], object], min_time: float) -> int:
+    calls = 1
+    while (elapsed := _time_calls(func, calls)) < min_time:
+        calls = max(calls * 2, int(calls * min_time / elapsed) + 1) if elapsed else calls * 10
+    return calls
+
+
+def _allocations(func: Callable[[], object], calls: int) -> tuple[int, int]:
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return int(statistics.mean(peaks)), int(statistics.mean(retained))
+
+
+def run_benchmark(
+    name: str,
+    func: Callable[[], object],
+    *,
+    warmup: int = DEFAULT_WARMUP,
+    repeat: int = DEFAULT_REPEAT,
+    min_time: float = DEFAULT_MIN_TIME,
+) -> BenchmarkResult:
+    for _ in range(warmup):
+        func()
+    calls = _calibrate(func, min_time)
+    runs = [calls / _time_calls(func, calls) for _ in range(repeat)]
+    peak, retained = _allocations(func, ALLOCATION_CALLS)
+    return BenchmarkResult(name, statistics.median(runs), runs, calls, peak, retained)
+
+
+def save_results(path: Path, results: list[BenchmarkResult]):
+    data = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {r.name: asdict(r) for r in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def load_results(path: Path) -> dict[str, BenchmarkResult]:
+    data = json.loads(path.read_text())
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path} has results version {data.get('version')}, expected {RESULTS_VERSION}")
+    return {name: BenchmarkResult(**result) for name, result in data["benchmarks"].items()}
+
+
+def format_results(results: list[BenchmarkResult], before: dict[str, BenchmarkResult] | None = None) -> list[str]:
+    """
+    Formats the results as a table.
+
+    Returns:
+        The lines of the table, with the speedup and allocation changes relative to `before` when given.
+    """
+    width = max(len("benchmark"), *(len(r.name) for r in results))
+    header = f"{'benchmark':<{width}} {'ops/sec':>12} {'spread':>7} {'peak B':>10} {'kept B':>8}"
+    lines = [header + ("  vs before: speedup  peak B  kept B" if before is not None else "")]
+    for r in results:
+        line = f"{r.name:<{width}} {r.ops_per_sec:>12,.1f} {r.spread:>7.1%} {r.peak_bytes:>10,} {r.retained_bytes:>8,}"
+        if before is not None:
+            if (b := before.get(r.name)) is None:
+                line += "  new"
+            else:
+                speedup = r.ops_per_sec / b.ops_per_sec if b.ops_per_sec else float("inf")
+                line += f"  {speedup:>17.2f}x {r.peak_bytes - b.peak_bytes:>+7,} {r.retained_bytes - b.retained_bytes:>+7,}"
+        lines.append(line)
+    return lines
@@ -5,55 +5,97 @@ from enum import IntEnum
 from functools import cached_property
 from hashlib import sha3_256
 from itertools import starmap
-from textwrap import dedent
 from typing import NamedTuple
 
 import boa
-import eth_abi
 import vyper
 from boa.contracts.event_decoder import RawLogEntry
 from boa.contracts.vyper.vyper_contract import VyperContract
 from eth.exceptions import Revert
 from eth_abi import encode
-from eth_account import Account
-from eth_account.messages import encode_typed_data
 from eth_utils import keccak
 from web3 import Web3
 
+from scripts._helpers import hashing
+from scripts._helpers.signing import get_offer_signer
+
 ZERO_ADDRESS = boa.eval("empty(address)")
 ZERO_BYTES32 = boa.eval("empty(bytes32)")
 
 
+def deployment_scope(fixture_name, config):  # noqa: ARG001
+    """
+    Selects the scope of the fixtures deploying contracts.
+
+    Returns:
+        "session", the changes being reverted after each test, unless --fresh-deploys is set, then "function".
+    """
+    return "function" if config.getoption("--fresh-deploys") else "session"
+
+
 def get_last_event(contract: VyperContract, name: str | None = None):
-    matching_events = [
-        e for e in contract.get_logs() if not isinstance(e, RawLogEntry) and (name is None or name == type(e).__name__)
-    ]
-    return EventWrapper(matching_events[-1])
+    return event_recorder.events(contract, name)[-1]
 
 
 def get_events(contract: VyperContract, name: str | None = None):
-    return [
-        EventWrapper(e)
-        for e in contract.get_logs()
-        if not isinstance(e, RawLogEntry) and (name is None or name == type(e).__name__)
-    ]
+    return list(event_recorder.events(contract, name))
 
 
 class EventWrapper:
+    __slots__ = ("event", "event_name")
+
     def __init__(self, event: namedtuple):
         self.event = event
         self.event_name = type(event).__name__
-        self.args_dict = event._asdict()
+
+    @property
+    def args_dict(self):
+        return self.event._asdict()
 
     def __getattr__(self, name):
-        if name in self.args_dict:
-            return self.args_dict[name]
+        # only called for the event args, as the wrapper attributes are slots
+        if name in self.__slots__:
+            raise AttributeError(name)
+        if name in self.event._fields:
+            return getattr(self.event, name)
         raise AttributeError(f"No attr {name} in {self.event_name}. Event data is {self.event}")
 
     def __repr__(self):
         return f"<EventWrapper {self.event_name} {self.args_dict}>"
 
 
+class EventRecorder:
+    """
+    Decoded events of the last transaction of each contract, indexed by event name. Logs are decoded and wrapped
+    once per transaction, when its events are first looked up, instead of on every get_events or get_last_event.
+    """
+
+    def __init__(self):
+        self._indexes: dict[str, tuple[object, dict[str | None, list[EventWrapper]]]] = {}
+
+    @staticmethod
+    def _index(contract: VyperContract) -> dict[str | None, list[EventWrapper]]:
+        index = {None: []}
+        for e in contract.get_logs():
+            if not isinstance(e, RawLogEntry):
+                event = EventWrapper(e)
+                index[None].append(event)
+                index.setdefault(event.event_name, []).append(event)
+        return index
+
+    def events(self, contract: VyperContract, name: str | None = None) -> list[EventWrapper]:
+        computation = getattr(contract, "_computation", None)
+        if computation is None:
+            return self._index(contract).get(name, [])
+        cached = self._indexes.get(contract.address)
+        if cached is None or cached[0] is not computation:
+            cached = self._indexes[contract.address] = (computation, self._index(contract))
+        return cached[1].get(name, [])
+
+
+event_recorder = EventRecorder()
+
+
 @contextlib.contextmanager
 def deploy_reverts():
     try:
@@ -205,74 +247,24 @@ CollectionContract = namedtuple("CollectionContract", ["collection", "contract"]
 
 
 def compute_loan_hash(loan: Loan):
-    print(f"compute_loan_hash {loan=}")
-    encoded = eth_abi.encode(
-        [
-            "(bytes32,bytes32,bytes32,uint256,uint256,address,uint256,uint256,address,address,address,uint256,(uint256,uint256,uint256,address)[],bool,address)"
-        ],
-        [loan],
-    )
-    return boa.eval(f"""keccak256({encoded})""")
+    return hashing.compute_loan_state_hash(loan)
 
 
 def compute_signed_offer_id(offer: SignedOffer):
-    return boa.eval(
-        dedent(
-            f"""keccak256(
-            concat(
-                convert({offer.signature.v}, bytes32),
-                convert({offer.signature.r}, bytes32),
-                convert({offer.signature.s}, bytes32),
-            ))"""
-        )
-    )
+    return hashing.compute_signed_offer_id(offer)
 
 
 def sign_offer(offer: Offer, lender_key: str, verifying_contract: str) -> SignedOffer:
-    typed_data = {
-        "types": {
-            "EIP712Domain": [
-                {"name": "name", "type": "string"},
-                {"name": "version", "type": "string"},
-                {"name": "chainId", "type": "uint256"},
-                {"name": "verifyingContract", "type": "address"},
-            ],
-            "Offer": [
-                {"name": "principal", "type": "uint256"},
-                {"name": "interest", "type": "uint256"},
-                {"name": "payment_token", "type": "address"},
-                {"name": "duration", "type": "uint256"},
-                {"name": "origination_fee_amount", "type": "uint256"},
-                {"name": "broker_upfront_fee_amount", "type": "uint256"},
-                {"name": "broker_settlement_fee_bps", "type": "uint256"},
-                {"name": "broker_address", "type": "address"},
-                {"name": "offer_type", "type": "uint256"},
-                {"name": "token_id", "type": "uint256"},
-                {"name": "token_range_min", "type": "uint256"},
-                {"name": "token_range_max", "type": "uint256"},
-                {"name": "collection_key_hash", "type": "bytes32"},
-                {"name": "trait_hash", "type": "bytes32"},
-                {"name": "expiration", "type": "uint256"},
-                {"name": "lender", "type": "address"},
-                {"name": "pro_rata", "type": "bool"},
-                {"name": "size", "type": "uint256"},
-                {"name": "tracing_id", "type": "bytes32"},
-            ],
-        },
-        "primaryType": "Offer",
-        "domain": {
-            "name": "Zharta",
-            "version": "1",
-            "chainId": boa.eval("chain.id"),
-            "verifyingContract": verifying_contract,
-        },
-        "message": offer._asdict(),
-    }
-    signable_msg = encode_typed_data(full_message=typed_data)
-    signed_msg = Account.from_key(lender_key).sign_message(signable_msg)
-    lender_signature = Signature(signed_msg.v, signed_msg.r, signed_msg.s)
-
-    return SignedOffer(offer, lender_signature)
+    signer = get_offer_signer(boa.eval("chain.id"), verifying_contract)
+    return SignedOffer(offer, Signature(*signer.sign(offer, lender_key)))
+
+
+def sign_offers(
+    offers: list[Offer], lender_key: str, verifying_contract: str, processes: int | None = None
+) -> list[SignedOffer]:
+    signer = get_offer_signer(boa.eval("chain.id"), verifying_contract)
+    signatures = signer.sign_many(offers, lender_key, processes=processes)
+    return [SignedOffer(offer, Signature(*signature)) for offer, signature in zip(offers, signatures)]
 
 
 def replace_namedtuple_field(namedtuple, **kwargs):
@@ -343,9 +335,9 @@ class TokenTraitTree:
 
     @staticmethod
     def _merge(b1, b2):
-        h1 = keccak(b1)
-        h2 = keccak(b2)
-        return keccak(bytes(h1[i] ^ h2[i] for i in range(32)))
+        h1 = int.from_bytes(keccak(b1), "big")
+        h2 = int.from_bytes(keccak(b2), "big")
+        return keccak((h1 ^ h2).to_bytes(32, "big"))
 
     @staticmethod
     def trait_hash(trait_name, trait_value):
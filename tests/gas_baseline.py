@@ -0,0 +1,105 @@
+import json
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+# Gas baseline of the benchmarks marked gas_benchmark: a versioned json file mapping each benchmark name to the
+# execution gas of its call, committed with the contracts so a change to them shows its gas impact in review. A run
+# with --gas-benchmark compares its measurements to the baseline and fails if any benchmark uses more gas than the
+# baseline allows (by default any increase), --update-gas-baseline writes the measurements back instead.
+
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = Path("tests/gas_baseline.json")
+
+
+class GasStatus(Enum):
+    UNCHANGED = "unchanged"
+    IMPROVED = "improved"
+    REGRESSED = "regressed"
+    NEW = "new"
+    NOT_MEASURED = "not measured"
+
+
+@dataclass
+class GasComparison:
+    name: str
+    baseline: int | None
+    measured: int | None
+
+    @property
+    def delta(self) -> int:
+        return (self.measured or 0) - (self.baseline or 0)
+
+    def status(self, tolerance: float = 0.0) -> GasStatus:
+        if self.baseline is None:
+            return GasStatus.NEW
+        if self.measured is None:
+            return GasStatus.NOT_MEASURED
+        if self.delta > self.baseline * tolerance:
+            return GasStatus.REGRESSED
+        return GasStatus.IMPROVED if self.delta < 0 else GasStatus.UNCHANGED
+
+
+@dataclass
+class GasBaseline:
+    benchmarks: dict[str, int]
+    compiler: str | None = None
+
+    @classmethod
+    def load(cls, path: Path) -> "GasBaseline":
+        if not path.exists():
+            return cls({})
+        data = json.loads(path.read_text())
+        if data.get("version") != BASELINE_VERSION:
+            raise ValueError(f"{path} has baseline version {data.get('version')}, expected {BASELINE_VERSION}")
+        return cls(data["benchmarks"], data.get("compiler"))
+
+    def save(self, path: Path):
+        data = {"version": BASELINE_VERSION, "compiler": self.compiler, "benchmarks": dict(sorted(self.benchmarks.items()))}
+        path.write_text(json.dumps(data, indent=2) + "\n")
+
+    def updated(self, measurements: dict[str, int], compiler: str | None) -> "GasBaseline":
+        """
+        Merges `measurements` into the baseline, replacing or adding to the current entries, so partial runs keep the others.
+
+        Returns:
+            The updated baseline.
+        """
+        return GasBaseline(self.benchmarks | measurements, compiler)
+
+    def compare(self, measurements: dict[str, int]) -> list[GasComparison]:
+        names = sorted(self.benchmarks.keys() | measurements.keys())
+        return [GasComparison(name, self.benchmarks.get(name), measurements.get(name)) for name in names]
+
+
+def regressions(comparisons: list[GasComparison], tolerance: float = 0.0) -> list[GasComparison]:
+    return [c for c in comparisons if c.status(tolerance) is GasStatus.REGRESSED]
+
+
+def linear_fit(points: list[tuple[int, int]]) -> tuple[float, float]:
+    """
+    Fits a line to the gas of `points` as (x, gas) by least squares.
+
+    Returns:
+        The intercept and slope of the line, eg the slope being the gas per proof element.
+    """
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance if variance else 0.0
+    return mean_y - slope * mean_x, slope
+
+
+def format_report(comparisons: list[GasComparison], tolerance: float = 0.0) -> list[str]:
+    width = max(len("benchmark"), *(len(c.name) for c in comparisons))
+    lines = [f"{'benchmark':<{width}} {'baseline':>10} {'measured':>10} {'delta':>9} {'%':>8}  status"]
+    for c in comparisons:
+        baseline = "-" if c.baseline is None else f"{c.baseline:,}"
+        measured = "-" if c.measured is None else f"{c.measured:,}"
+        delta, pct = "", ""
+        if c.baseline is not None and c.measured is not None:
+            delta = f"{c.delta:+,}"
+            pct = f"{c.delta / c.baseline:+.2%}" if c.baseline else ""
+        lines.append(f"{c.name:<{width}} {baseline:>10} {measured:>10} {delta:>9} {pct:>8}  {c.status(tolerance).value}")
+    return lines
@@ -1,20 +1,43 @@
+from pathlib import Path
 from textwrap import dedent
 
 import boa
 import pytest
+import vyper
 from boa.vm.py_evm import register_raw_precompile
 from eth_account import Account
 
+from ..gas_baseline import DEFAULT_BASELINE, GasBaseline, format_report, regressions
+
+gas_measurements_key = pytest.StashKey[dict[str, int]]()
+gas_report_key = pytest.StashKey[list[str]]()
+
 
 def pytest_addoption(parser):
     parser.addoption("--runslow", action="store_true", default=False, help="run slow tests")
+    parser.addoption(
+        "--fresh-deploys", action="store_true", default=False, help="redeploy contracts for each test instead of reverting"
+    )
+    parser.addoption("--gas-benchmark", action="store_true", default=False, help="run gas benchmarks against the baseline")
+    parser.addoption("--gas-baseline", type=Path, default=DEFAULT_BASELINE, help="gas baseline file")
+    parser.addoption("--gas-tolerance", type=float, default=0.0, help="relative gas increase not flagged as regression")
+    parser.addoption(
+        "--update-gas-baseline", action="store_true", default=False, help="write the gas benchmarks to the baseline"
+    )
 
 
 def pytest_configure(config):
     config.addinivalue_line("markers", "slow: mark test as slow to run")
+    config.addinivalue_line("markers", "gas_benchmark: mark test as gas benchmark")
+    config.stash[gas_measurements_key] = {}
 
 
 def pytest_collection_modifyitems(config, items):
+    if not config.getoption("--gas-benchmark") and not config.getoption("--update-gas-baseline"):
+        skip_gas = pytest.mark.skip(reason="need --gas-benchmark option to run")
+        for item in items:
+            if "gas_benchmark" in item.keywords:
+                item.add_marker(skip_gas)
     if config.getoption("--runslow"):
         # --runslow given in cli: do not skip slow tests
         return
@@ -24,12 +47,75 @@ def pytest_collection_modifyitems(config, items):
             item.add_marker(skip_slow)
 
 
+def pytest_sessionfinish(session, exitstatus):
+    # measurements are kept per process, so benchmarks run without xdist
+    config = session.config
+    measurements = config.stash[gas_measurements_key]
+    if not measurements:
+        return
+    path = config.getoption("--gas-baseline")
+    tolerance = config.getoption("--gas-tolerance")
+    baseline = GasBaseline.load(path)
+    comparisons = baseline.compare(measurements)
+    config.stash[gas_report_key] = format_report(comparisons, tolerance)
+    if baseline.compiler not in {None, vyper.__version__}:
+        config.stash[gas_report_key].append(f"baseline compiled with vyper {baseline.compiler}, now {vyper.__version__}")
+
+    if config.getoption("--update-gas-baseline"):
+        baseline.updated(measurements, vyper.__version__).save(path)
+        config.stash[gas_report_key].append(f"gas baseline written to {path}")
+    elif regressions(comparisons, tolerance) and exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if report := config.stash.get(gas_report_key, None):
+        terminalreporter.section("gas benchmarks")
+        for line in report:
+            terminalreporter.write_line(line)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def boa_env():
     boa.interpret.set_cache_dir(cache_dir=".cache/titanoboa")
     return boa
 
 
+@pytest.fixture(autouse=True)
+def revert_state(boa_env):
+    # contracts are deployed once per session and each test runs in an anchor, so its changes are reverted on exit
+    with boa.env.anchor():
+        yield
+
+
+class GasBenchmark:
+    def __init__(self, measurements: dict[str, int]):
+        self.measurements = measurements
+
+    def measure(self, name: str, function, *args, **kwargs):
+        """
+        Call the contract `function` and record the execution gas of the call, excluding the intrinsic gas. The gas is
+        read from the computation the call leaves on its contract, which must be a new and successful one, and is the gas
+        used before refunds, as the uncapped refund of the computation would underestimate clearing storage.
+
+        Returns:
+            The result of the call.
+        """
+        contract = function.contract
+        previous = getattr(contract, "_computation", None)
+        result = function(*args, **kwargs)
+        computation = getattr(contract, "_computation", None)
+        assert computation is not previous, f"{name} ran no new computation on {contract.address}, its gas is unknown"
+        assert not computation.is_error, f"{name} failed, its gas is not recorded"
+        self.measurements[name] = computation.get_gas_used()
+        return result
+
+
+@pytest.fixture
+def gas_benchmark(request):
+    return GasBenchmark(request.config.stash[gas_measurements_key])
+
+
 @pytest.fixture(scope="session")
 def accounts(boa_env):
     _accounts = [boa.env.generate_address() for _ in range(10)]
@@ -133,6 +219,16 @@ def cryptopunks(cryptopunks_contract_def, owner):
     return cryptopunks_contract_def.deploy()
 
 
+@pytest.fixture(scope="session")
+def multicall_contract_def(boa_env):
+    return boa.load_partial("contracts/auxiliary/Multicall3Mock.vy")
+
+
+@pytest.fixture(scope="session")
+def multicall(multicall_contract_def, owner):
+    return multicall_contract_def.deploy()
+
+
 @pytest.fixture(scope="session")
 def delegation_registry_contract_def(boa_env):
     return boa.load_partial("contracts/auxiliary/DelegationRegistryMock.vy")
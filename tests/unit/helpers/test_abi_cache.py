@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scripts._helpers.abi_cache import AbiCache
+
+
+@pytest.fixture
+def abi_file(tmp_path):
+    return Path(shutil.copy("contracts/auxiliary/WETH9_abi.json", tmp_path / "WETH9_abi.json"))
+
+
+def reference_abi_key(abi: list) -> str:
+    return hashlib.sha1(json.dumps(abi, sort_keys=True).encode("utf8")).hexdigest()
+
+
+def test_file_abi_key_matches_reference(abi_file, tmp_path):
+    abi = json.loads(abi_file.read_text())
+    entry = AbiCache(tmp_path / "cache").for_file(abi_file)
+
+    assert entry.key == reference_abi_key(abi)
+    assert entry.abi == abi
+    assert json.loads((tmp_path / "cache" / f"{entry.key}.json").read_text()) == abi
+
+
+def test_unchanged_files_are_served_from_the_index(abi_file, tmp_path):
+    key = AbiCache(tmp_path / "cache").for_file(abi_file).key
+
+    # same size and mtime, so the file is not read again
+    stat = abi_file.stat()
+    abi_file.write_text(abi_file.read_text().replace("deposit", "dEposit"))
+    os.utime(abi_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert AbiCache(tmp_path / "cache").for_file(abi_file).key == key
+
+
+def test_changed_files_are_read_again(abi_file, tmp_path):
+    cache = AbiCache(tmp_path / "cache")
+    cache.for_file(abi_file)
+
+    abi = json.loads(abi_file.read_text())[:1]
+    abi_file.write_text(json.dumps(abi))
+    stat = abi_file.stat()
+    os.utime(abi_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert cache.for_file(abi_file).key == reference_abi_key(abi)
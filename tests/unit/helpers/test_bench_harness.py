@@ -0,0 +1,46 @@
+import pytest
+
+from ...bench.harness import BenchmarkResult, format_results, load_results, run_benchmark, save_results
+
+
+def test_run_benchmark_times_and_measures_allocations():
+    calls = []
+
+    def func():
+        calls.append(1)
+        return bytearray(10_000)
+
+    result = run_benchmark("alloc", func, warmup=2, repeat=3, min_time=0.01)
+
+    assert result.name == "alloc"
+    assert len(result.runs) == 3
+    assert result.ops_per_sec == sorted(result.runs)[1]
+    assert result.calls_per_run >= 1
+    assert result.peak_bytes >= 10_000
+    assert result.retained_bytes < 10_000
+    assert len(calls) >= 2 + result.calls_per_run * 4
+
+
+def test_results_roundtrip(tmp_path):
+    results = [BenchmarkResult("a", 100.0, [90.0, 100.0, 110.0], 10, 64, 0)]
+    save_results(tmp_path / "bench.json", results)
+
+    assert load_results(tmp_path / "bench.json") == {"a": results[0]}
+
+
+def test_results_of_other_versions_are_rejected(tmp_path):
+    (tmp_path / "bench.json").write_text('{"version": 0, "benchmarks": {}}')
+
+    with pytest.raises(ValueError, match="results version"):
+        load_results(tmp_path / "bench.json")
+
+
+def test_format_results_compares_to_before():
+    before = {"a": BenchmarkResult("a", 100.0, [100.0], 10, 64, 0)}
+    results = [BenchmarkResult("a", 150.0, [150.0], 10, 32, 0), BenchmarkResult("b", 10.0, [10.0], 1, 0, 0)]
+
+    lines = format_results(results, before)
+
+    assert "speedup" in lines[0]
+    assert lines[1].split()[-3:] == ["1.50x", "-32", "+0"]
+    assert lines[2].endswith("new")
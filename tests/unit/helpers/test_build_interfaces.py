@@ -0,0 +1,48 @@
+import pytest
+
+from scripts.build_interfaces import InterfaceBuilder
+
+FIXTURE = """# pragma version ~=0.4.1
+
+event Moved:
+    x: uint256
+
+value: public(uint256)
+
+
+@external
+def move(x: uint256):
+    self.value = x
+    log Moved(x=x)
+"""
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "Fixture.vy"
+    source.write_text(FIXTURE)
+    return [(source, tmp_path / "IFixture.vy")]
+
+
+def test_unchanged_files_are_skipped(files, tmp_path):
+    ((source, output),) = files
+
+    assert InterfaceBuilder(tmp_path / "cache", jobs=1).build(files) == [source]
+    interface = output.read_text()
+    assert "event Moved:" in interface
+    assert "def move(x: uint256):" in interface
+
+    assert InterfaceBuilder(tmp_path / "cache", jobs=1).build(files) == []
+    assert output.read_text() == interface
+
+
+def test_generator_change_regenerates_from_the_cached_ast(files, tmp_path):
+    ((source, _),) = files
+    InterfaceBuilder(tmp_path / "cache", jobs=1).build(files)
+    asts = set((tmp_path / "cache").glob("*.json"))
+
+    builder = InterfaceBuilder(tmp_path / "cache", jobs=1)
+    builder.generator_hash = "0" * 64
+
+    assert builder.build(files) == [source]
+    assert set((tmp_path / "cache").glob("*.json")) == asts
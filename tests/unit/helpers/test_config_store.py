@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from scripts._helpers.config_store import COLLECTIONS_FILE, P2P_FILE, TRACKING_FILE, ConfigStore, dump_config
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "dev" / "zethereum"
+    path.mkdir(parents=True)
+    p2p = {
+        "common": {"usdc": {"contract": "ERC20", "address": "0x01"}},
+        "p2p": {"usdc_nfts": {"contract": "P2PLendingNfts", "properties": {"payment_token_key": "common.usdc"}}},
+        "configs": {"trait_roots": {"bayc": "aa" * 32}},
+    }
+    (path / P2P_FILE).write_text(json.dumps(p2p))
+    (path / TRACKING_FILE).write_text(json.dumps({"weth": {"abi_file": "auxiliary/WETH9_abi.json"}}))
+    return ConfigStore("dev", "zethereum", root=tmp_path)
+
+
+def test_views_parse_each_file_once(store):
+    assert list(store.contracts()) == ["common.usdc", "p2p.usdc_nfts"]
+    assert store.p2p_contracts()["usdc_nfts"]["contract"] == "P2PLendingNfts"
+    assert store.configs() == {"configs.trait_roots": {"bayc": "aa" * 32}}
+    assert store.trait_roots() == {"bayc": "aa" * 32}
+    assert list(store.tracking()) == ["weth"]
+
+    assert store.parses == 2
+
+
+def test_changed_files_are_parsed_again(store):
+    store.trait_roots()
+    file = store.file(P2P_FILE)
+
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    store.trait_roots()
+    assert store.parses == 1
+
+    config = json.loads(file.read_text())
+    config["configs"]["trait_roots"]["bayc"] = "bb" * 32
+    file.write_text(json.dumps(config))
+    assert store.trait_roots() == {"bayc": "bb" * 32}
+    assert store.parses == 2
+
+
+def test_edit_writes_atomically(store):
+    with store.edit(P2P_FILE) as config:
+        config["common"]["usdc"]["address"] = "0x02"
+
+    assert json.loads(store.file(P2P_FILE).read_text())["common"]["usdc"]["address"] == "0x02"
+    assert store.contracts()["common.usdc"]["address"] == "0x02"
+    assert store.parses == 1
+    assert sorted(f.name for f in store.path.iterdir()) == sorted([P2P_FILE, TRACKING_FILE])
+
+
+def test_failed_edit_is_discarded(store):
+    def edit_missing_section():
+        with store.edit(P2P_FILE) as config:
+            config["common"]["usdc"]["address"] = "0x02"
+            config["missing"]
+
+    with pytest.raises(KeyError):
+        edit_missing_section()
+
+    assert store.contracts()["common.usdc"]["address"] == "0x01"
+
+
+def test_write_entries_matches_write(store):
+    collections = {
+        "mayc": {"collection_key": "mayc", "chain": "zethereum", "traits": [{"name": "Fur", "count": 2}]},
+        "bayc": {"collection_key": "bayc", "chain": "zethereum", "traits": []},
+    }
+    store.write_entries(COLLECTIONS_FILE, iter(collections.items()))
+
+    assert store.file(COLLECTIONS_FILE).read_text() == dump_config(collections)
+    assert store.collections() == collections
+
+
+def test_write_entries_rejects_duplicate_keys(store):
+    entries = [("bayc", {"collection_key": "bayc"}), ("mayc", {"collection_key": "mayc"}), ("bayc", {})]
+
+    with pytest.raises(ValueError, match="Duplicate key bayc"):
+        store.write_entries(COLLECTIONS_FILE, iter(entries))
+
+    assert not store.file(COLLECTIONS_FILE).exists()
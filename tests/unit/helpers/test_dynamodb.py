@@ -0,0 +1,95 @@
+import pytest
+
+from scripts._helpers.dynamodb import DiffPublisher, ItemUpdate, merge_updates, parallel_scan
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+Attr = pytest.importorskip("boto3.dynamodb.conditions").Attr
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        resource = boto3.resource("dynamodb")
+        for table, key in [("collections-dev", "collection_key"), ("abis-dev", "abi_key")]:
+            resource.create_table(
+                TableName=table,
+                KeySchema=[{"AttributeName": key, "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": key, "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+        yield resource
+
+
+class ThrottlingError(Exception):
+    response = {"Error": {"Code": "ProvisionedThroughputExceededException"}}  # noqa: RUF012
+
+
+def test_merge_updates():
+    updates = merge_updates(
+        [
+            ItemUpdate("collections-dev", {"collection_key": "bayc"}, {"traits_root": "aa"}),
+            ItemUpdate("collections-dev", {"collection_key": "bayc"}, {"p2p_whitelisted": True}),
+            ItemUpdate("collections-dev", {"collection_key": "mayc"}, {"traits_root": "bb"}),
+        ]
+    )
+
+    assert updates == [
+        ItemUpdate("collections-dev", {"collection_key": "bayc"}, {"traits_root": "aa", "p2p_whitelisted": True}),
+        ItemUpdate("collections-dev", {"collection_key": "mayc"}, {"traits_root": "bb"}),
+    ]
+
+
+def test_publish_writes_only_changes(dynamodb):
+    publisher = DiffPublisher(dynamodb, max_workers=4)
+    updates = [
+        ItemUpdate("collections-dev", {"collection_key": f"c{i}"}, {"traits_root": f"{i:064x}", "p2p_whitelisted": True})
+        for i in range(150)
+    ] + [ItemUpdate("abis-dev", {"abi_key": "k"}, {"abi": [{"type": "function", "name": "f", "inputs": []}]})]
+
+    result = publisher.publish(updates)
+    assert len(result.updated) == 151
+    assert not result.unchanged
+    assert not result.failed
+    assert dynamodb.Table("collections-dev").get_item(Key={"collection_key": "c7"})["Item"]["traits_root"] == f"{7:064x}"
+
+    updates[3] = ItemUpdate("collections-dev", {"collection_key": "c3"}, {"traits_root": "00" * 32, "p2p_whitelisted": True})
+    result = publisher.publish(updates)
+    assert result.updated == [ItemUpdate("collections-dev", {"collection_key": "c3"}, {"traits_root": "00" * 32})]
+    assert len(result.unchanged) == 150
+
+
+def test_publish_retries_throttled_writes(dynamodb):
+    sleeps = []
+    publisher = DiffPublisher(dynamodb, sleep=sleeps.append)
+    update_item = dynamodb.meta.client.update_item
+    failures = iter([ThrottlingError(), ThrottlingError()])
+
+    def flaky_update_item(**kwargs):
+        if error := next(failures, None):
+            raise error
+        return update_item(**kwargs)
+
+    publisher.client = type("Client", (), {"update_item": staticmethod(flaky_update_item)})()
+
+    result = publisher.publish([ItemUpdate("collections-dev", {"collection_key": "bayc"}, {"p2p_whitelisted": True})])
+
+    assert len(result.updated) == 1
+    assert len(sleeps) == 2
+    assert sleeps[0] < sleeps[1]
+    table = dynamodb.Table("collections-dev")
+    assert table.get_item(Key={"collection_key": "bayc"})["Item"]["p2p_whitelisted"] is True
+
+
+def test_parallel_scan_filters_server_side(dynamodb):
+    table = dynamodb.Table("collections-dev")
+    with table.batch_writer() as batch:
+        for i in range(300):
+            batch.put_item(Item={"collection_key": f"c{i}", "chain": "zethereum" if i % 3 else "zbase", "traits": "x" * 1000})
+
+    items = list(parallel_scan(table, segments=4, FilterExpression=Attr("chain").eq("zbase")))
+
+    assert sorted(i["collection_key"] for i in items) == sorted(f"c{i}" for i in range(0, 300, 3))
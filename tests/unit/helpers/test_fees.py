@@ -0,0 +1,49 @@
+import pytest
+
+from scripts._helpers.fees import FeeOracle, Speed
+
+
+class FakeEth:
+    def __init__(self, base_fees, rewards):
+        self.block_number = 100
+        self.gas_price = 7
+        self.base_fees = base_fees
+        self.rewards = rewards
+        self.requests = []
+
+    def fee_history(self, block_count, newest_block, percentiles):
+        self.requests.append((block_count, newest_block, percentiles))
+        return {"baseFeePerGas": self.base_fees, "reward": [[r] for r in self.rewards]}
+
+
+class FakeWeb3:
+    def __init__(self, base_fees, rewards):
+        self.eth = FakeEth(base_fees, rewards)
+
+
+@pytest.mark.parametrize(("speed", "expected_max_fee"), [(Speed.fast, 1125 + 30), (Speed.standard, 1424 + 30)])
+def test_fees_for_speed(speed, expected_max_fee):
+    web3 = FakeWeb3([900, 950, 1000], [10, 30, 50])
+    oracle = FeeOracle(web3, speed=speed, min_priority_fee=1)
+
+    assert oracle.fees() == {"max_fee": expected_max_fee, "max_priority_fee": 30}
+    assert web3.eth.requests == [(20, "latest", [speed.value[0]])]
+
+
+def test_fees_sampled_once_per_block():
+    web3 = FakeWeb3([1000], [10**9])
+    oracle = FeeOracle(web3, speed=Speed.fast, max_fee_cap=10**8)
+
+    assert oracle(None) == {"max_fee": 10**8, "max_priority_fee": 10**8}
+    oracle(None)
+    assert len(web3.eth.requests) == 1
+
+    web3.eth.block_number += 1
+    oracle(None)
+    assert len(web3.eth.requests) == 2
+
+
+def test_legacy_chains_use_gas_price():
+    oracle = FeeOracle(FakeWeb3([], []))
+
+    assert oracle.fees() == {"gas_price": 7}
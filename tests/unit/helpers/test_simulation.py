@@ -0,0 +1,40 @@
+from functools import partial
+from types import SimpleNamespace
+
+from scripts._helpers.simulation import GasEntry, GasReport, independent_plans
+
+
+class Config:
+    def __init__(self, key):
+        self.key = key
+
+    def set_value(self, context):
+        pass
+
+
+def test_independent_plans():
+    configs = {k: Config(k) for k in ["usdc", "weth", "control", "p2p.usdc", "bayc", "punks"]}
+    context = SimpleNamespace(contracts=configs, config={"configs.trait_roots": {"bayc": "aa", "unknown": "bb"}})
+    dependency_manager = SimpleNamespace(
+        context=context,
+        deployment_set={"usdc", "weth", "control", "p2p.usdc", "bayc", "punks"},
+        deployment_dependencies={"usdc": {"p2p.usdc"}, "control": {"p2p.usdc"}},
+        transaction_set={
+            "configs.trait_roots": {configs["control"].set_value},
+            "weth": {partial(configs["weth"].set_value)},
+        },
+    )
+
+    assert independent_plans(dependency_manager) == [
+        {"bayc", "configs.trait_roots", "control", "p2p.usdc", "usdc"},
+        {"punks"},
+        {"weth"},
+    ]
+
+
+def test_gas_report_merge():
+    report = GasReport.merge([GasReport([GasEntry("deploy a", 100, 1000)]), GasReport([GasEntry("a.f", 50, 500)])])
+
+    assert [e.label for e in report.entries] == ["deploy a", "a.f"]
+    assert report.total_gas == 150
+    assert report.total_cost == 1500
@@ -0,0 +1,135 @@
+from dataclasses import dataclass, replace
+
+import pytest
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+
+from scripts._helpers.submitter import TransactionSubmitter, TxStatus, bumped_fees
+
+
+@dataclass
+class FakeTransaction:
+    data: str
+    nonce: int | None = None
+    max_fee: int = 100
+    max_priority_fee: int = 10
+
+    def model_copy(self, update):
+        return replace(self, **update)
+
+    def serialize_transaction(self):
+        return f"{self.data}:{self.nonce}:{self.max_fee}".encode()
+
+
+class FakeNode:
+    """Mines the pending transaction of the lowest nonce on `mine`, only if its max_fee reaches `min_fee`."""
+
+    def __init__(self, min_fee=0):
+        self.min_fee = min_fee
+        self.sent = []
+        self.receipts = {}
+        self.eth = self
+
+    def send_raw_transaction(self, raw):
+        self.sent.append(raw)
+        return HexBytes(raw)
+
+    def get_transaction_receipt(self, txn_hash):
+        if txn_hash not in self.receipts:
+            raise TransactionNotFound(txn_hash)
+        return self.receipts[txn_hash]
+
+    def mine(self):
+        for raw in self.sent:
+            data, _, fee = raw.decode().split(":")
+            if int(fee) >= self.min_fee:
+                txn_hash = HexBytes(raw).to_0x_hex()
+                self.receipts[txn_hash] = {"transactionHash": HexBytes(raw), "status": 0 if data == "revert" else 1}
+
+
+class FakeAccount:
+    def __init__(self, node, nonce=7):
+        self.nonce = nonce
+        self.provider = type("Provider", (), {"web3": node})()
+
+    def prepare_transaction(self, txn):  # noqa: PLR6301
+        if txn.data == "fail":
+            raise ValueError("execution reverted")
+        return txn
+
+    def sign_transaction(self, txn):  # noqa: PLR6301
+        return txn
+
+
+class Clock:
+    def __init__(self, node):
+        self.now = 0.0
+        self.node = node
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.node.mine()
+
+
+def make_submitter(node, **kwargs):
+    clock = Clock(node)
+    return TransactionSubmitter(FakeAccount(node), clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_bumped_fees():
+    assert bumped_fees(FakeTransaction("a", max_fee=100, max_priority_fee=1), 1.125) == {"max_fee": 113, "max_priority_fee": 2}
+
+
+def test_submits_back_to_back_with_local_nonces():
+    node = FakeNode()
+    submitter = make_submitter(node)
+
+    submitted = [submitter.submit(data, lambda data=data: FakeTransaction(data)) for data in ["fail", "a", "revert", "b"]]
+
+    assert len(node.sent) == 3
+    assert not node.receipts
+    assert [s.nonce for s in submitted] == [None, 7, 8, 9]
+
+    submitter.wait()
+    assert [s.status for s in submitted] == [TxStatus.FAILED, TxStatus.CONFIRMED, TxStatus.REVERTED, TxStatus.CONFIRMED]
+    assert str(submitted[0].error) == "execution reverted"
+
+
+def test_stuck_transactions_are_replaced_with_bumped_fees():
+    node = FakeNode(min_fee=120)
+    submitter = make_submitter(node, stuck_after=10, poll_interval=5)
+
+    submitted = submitter.submit("a", lambda: FakeTransaction("a"))
+    submitter.wait()
+
+    assert submitted.status is TxStatus.CONFIRMED
+    assert submitted.bumps == 2
+    assert submitted.nonce == 7
+    assert [raw.decode() for raw in node.sent] == ["a:7:100", "a:7:113", "a:7:128"]
+    assert submitted.txn_hash == HexBytes(b"a:7:128").to_0x_hex()
+
+
+@pytest.mark.parametrize("max_bumps", [0, 1])
+def test_gives_up_after_max_bumps(max_bumps):
+    node = FakeNode(min_fee=10**6)
+    submitter = make_submitter(node, stuck_after=1, max_bumps=max_bumps)
+
+    submitted = submitter.submit("a", lambda: FakeTransaction("a"))
+    submitter.wait()
+
+    assert submitted.status is TxStatus.STUCK
+    assert len(node.sent) == max_bumps + 1
+
+
+def test_failed_build_is_retried_once_pending_transactions_are_mined():
+    node = FakeNode()
+    submitter = make_submitter(node)
+    submitter.submit("a", lambda: FakeTransaction("a"))
+
+    submitted = submitter.submit("b", lambda: FakeTransaction("b" if node.receipts else "fail"))
+
+    assert submitted.status is TxStatus.PENDING
+    assert submitted.nonce == 8
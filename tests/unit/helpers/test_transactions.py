@@ -0,0 +1,153 @@
+import pickle
+from dataclasses import dataclass
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+from scripts._helpers import transactions
+from scripts._helpers.basetypes import ContractConfig, DeploymentContext, Environment
+from scripts._helpers.multicall import aggregate_calls
+from scripts._helpers.transactions import check_different, check_owner, config_reads, execute_read, execute_reads, prefetched
+
+OWNER = "0x" + "0a" * 20
+
+
+class FakeContract:
+    # view functions return `values[func, args]`, call data is the pickled (func, args)
+    def __init__(self, address: str, values: dict):
+        self.address = address
+        self.values = values
+        self.view_calls = []
+
+    def call_view_method(self, func, *args):
+        self.view_calls.append((func, args))
+        return self.values[func, args]
+
+    def __getattr__(self, func):
+        return FakeMethod(func)
+
+
+@dataclass
+class FakeMethod:
+    func: str
+
+    def encode_input(self, *args):
+        return pickle.dumps((self.func, args))
+
+    @staticmethod
+    def decode_output(data):
+        return pickle.loads(data)
+
+
+class FakeMulticall:
+    def __init__(self, contracts):
+        self.contracts = {c.address: c for c in contracts}
+        self.batches = []
+        self.aggregate3 = SimpleNamespace(call=self._aggregate3)
+
+    def _aggregate3(self, calls):
+        self.batches.append(len(calls))
+        return [(True, pickle.dumps(self.contracts[target].values[pickle.loads(data)])) for target, _, data in calls]
+
+
+@dataclass
+class FeeConfig(ContractConfig):
+    fee: int = 0
+
+    @check_owner
+    @check_different("protocol_fee", "fee")
+    def set_fee(self, _context):
+        self.fee_set = True
+
+
+@pytest.fixture
+def contracts():
+    p2p = FakeContract("0x" + "01" * 20, {("owner", ()): OWNER, ("protocol_fee", ()): 100})
+    control = FakeContract(
+        "0x" + "02" * 20,
+        {("owner", ()): OWNER, ("contracts", (p2p.address,)): "0x" + "03" * 20}
+        | {("trait_roots", (f"0x{i:064x}",)): bytes([i]) * 32 for i in range(5)},
+    )
+    return {"p2p": p2p, "control": control}
+
+
+@pytest.fixture
+def context(contracts):
+    configs = {
+        "p2p": FeeConfig("p2p", contracts["p2p"], None, fee=100),
+        "control": ContractConfig("control", contracts["control"], None),
+    }
+    return DeploymentContext(configs, Environment.dev, "zethereum", OWNER)
+
+
+@pytest.fixture
+def multicall(monkeypatch, contracts):
+    multicall = FakeMulticall(contracts.values())
+    monkeypatch.setattr(transactions, "get_multicall", lambda: multicall)
+    monkeypatch.setattr(transactions, "aggregate_calls", partial(aggregate_calls, chunk_size=2))
+    return multicall
+
+
+def test_execute_reads_batches_calls_to_any_contract(context, contracts, multicall):
+    reads = [("control", "trait_roots", (f"0x{i:064x}",)) for i in range(3)]
+    reads += [("p2p", "owner", ()), ("control", "contracts", ("p2p",))]
+
+    results = execute_reads(context, reads)
+
+    assert results == [bytes([0]) * 32, bytes([1]) * 32, bytes([2]) * 32, OWNER, "0x" + "03" * 20]
+    assert multicall.batches == [2, 2, 1]
+    assert all(not c.view_calls for c in contracts.values())
+
+
+def test_execute_reads_without_multicall(monkeypatch, context, contracts):
+    monkeypatch.setattr(transactions, "get_multicall", lambda: None)
+
+    assert execute_reads(context, [("p2p", "owner", ()), ("p2p", "protocol_fee", ())]) == [OWNER, 100]
+    assert contracts["p2p"].view_calls == [("owner", ()), ("protocol_fee", ())]
+
+
+def test_prefetched_reads_are_matched_by_resolved_args(context, contracts, multicall):
+    reads = [("control", "contracts", ("p2p",)), ("control", "trait_roots", (f"0x{1:064x}",))]
+
+    with prefetched(context, reads):
+        assert execute_read(context, "control", "contracts", contracts["p2p"].address) == "0x" + "03" * 20
+        assert execute_read(context, "control", "trait_roots", f"0x{1:064x}") == bytes([1]) * 32
+        assert not contracts["control"].view_calls
+
+        # each value is used once, a second read goes to the contract
+        assert execute_read(context, "control", "contracts", "p2p") == "0x" + "03" * 20
+        assert contracts["control"].view_calls == [("contracts", (contracts["p2p"].address,))]
+
+    assert multicall.batches == [2]
+
+
+def test_unused_prefetched_reads_are_dropped(context, contracts, multicall):
+    reads = [("p2p", "owner", ()), ("p2p", "protocol_fee", ())]
+
+    def fail_while_prefetched():
+        with prefetched(context, reads):
+            assert context.prefetched_reads
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        fail_while_prefetched()
+
+    assert context.prefetched_reads == {}
+    contracts["p2p"].values["protocol_fee", ()] = 200
+    assert execute_read(context, "p2p", "protocol_fee") == 200
+
+
+def test_config_reads_are_served_from_the_prefetch(context, contracts, multicall):
+    fee_config = context["p2p"]
+    reads = config_reads(fee_config.set_fee, context)
+    assert reads == [("p2p", "owner", ()), ("p2p", "protocol_fee", ())]
+
+    with prefetched(context, reads):
+        fee_config.set_fee(context)
+    fee_config.fee = 200
+    fee_config.set_fee(context)
+
+    assert fee_config.fee_set
+    assert contracts["p2p"].view_calls == [("protocol_fee", ())]
+    assert multicall.batches == [2]
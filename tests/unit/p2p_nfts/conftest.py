@@ -1,10 +1,11 @@
 from hashlib import sha3_256
+from itertools import count
 from textwrap import dedent
 
 import boa
 import pytest
 
-from ...conftest_base import CollectionContract
+from ...conftest_base import CollectionContract, Offer, deployment_scope, sign_offer
 
 
 @pytest.fixture(scope="module")
@@ -12,32 +13,32 @@ def max_lock_expiration():
     return 2 * 86400
 
 
-@pytest.fixture
+@pytest.fixture(scope=deployment_scope)
 def bayc(erc721_contract_def, owner):
     return erc721_contract_def.deploy()
 
 
-@pytest.fixture
+@pytest.fixture(scope=deployment_scope)
 def usdc(weth9_contract_def, owner):
     return weth9_contract_def.deploy("USDC", "USDC", 9, 10**20)
 
 
-@pytest.fixture
+@pytest.fixture(scope=deployment_scope)
 def delegation_registry(delegation_registry_contract_def, owner):
     return delegation_registry_contract_def.deploy()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def bayc_key_hash():
     return sha3_256(b"bayc").digest()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def punks_key_hash():
     return sha3_256(b"cryptopunks").digest()
 
 
-@pytest.fixture
+@pytest.fixture(scope=deployment_scope)
 def p2p_control(p2p_lending_control_contract_def, owner, cryptopunks, bayc, bayc_key_hash, punks_key_hash):
     p2p_control = p2p_lending_control_contract_def.deploy()
     p2p_control.change_collections_contracts(
@@ -46,7 +47,7 @@ def p2p_control(p2p_lending_control_contract_def, owner, cryptopunks, bayc, bayc
     return p2p_control
 
 
-@pytest.fixture
+@pytest.fixture(scope=deployment_scope)
 def p2p_nfts_usdc(p2p_lending_nfts_contract_def, usdc, delegation_registry, cryptopunks, owner, p2p_control):
     return p2p_lending_nfts_contract_def.deploy(
         usdc, p2p_control, delegation_registry, cryptopunks, 0, 0, owner, 10000, 10000, 10000, 10000
@@ -58,6 +59,28 @@ def now():
     return boa.eval("block.timestamp")
 
 
+@pytest.fixture
+def offer_factory(now, usdc, bayc_key_hash, lender, lender_key, p2p_nfts_usdc):
+    # bayc token offers with a unique tracing id, signed with `key` (the lender key by default) unless `signed=False`
+    tracing_ids = count(1)
+
+    def _offer(*, key=lender_key, signed=True, **kwargs):
+        offer = Offer(
+            principal=1000,
+            interest=100,
+            payment_token=usdc.address,
+            duration=100,
+            collection_key_hash=bayc_key_hash,
+            token_id=1,
+            expiration=now + 100,
+            lender=lender,
+            tracing_id=next(tracing_ids).to_bytes(32, "big"),
+        )._replace(**kwargs)
+        return sign_offer(offer, key, p2p_nfts_usdc.address) if signed else offer
+
+    return _offer
+
+
 @pytest.fixture
 def traits():
     return {
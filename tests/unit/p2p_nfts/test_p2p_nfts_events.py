@@ -0,0 +1,49 @@
+from collections import namedtuple
+
+import pytest
+
+from ...conftest_base import EventRecorder, EventWrapper
+
+LoanCreated = namedtuple("LoanCreated", ["id", "amount"])
+LoanPaid = namedtuple("LoanPaid", ["id"])
+
+
+class FakeContract:
+    def __init__(self):
+        self.address = "0x" + "11" * 20
+        self.get_logs_calls = 0
+        self.transact([])
+
+    def transact(self, logs):
+        self._computation = object()
+        self.logs = logs
+
+    def get_logs(self):
+        self.get_logs_calls += 1
+        return self.logs
+
+
+def test_events_are_decoded_once_per_transaction():
+    recorder = EventRecorder()
+    contract = FakeContract()
+    contract.transact([LoanCreated(1, 100), LoanPaid(1), LoanCreated(2, 200)])
+
+    assert [e.id for e in recorder.events(contract, "LoanCreated")] == [1, 2]
+    assert [e.event_name for e in recorder.events(contract)] == ["LoanCreated", "LoanPaid", "LoanCreated"]
+    assert recorder.events(contract, "LoanReplaced") == []
+    assert contract.get_logs_calls == 1
+
+    contract.transact([LoanPaid(2)])
+    assert [e.id for e in recorder.events(contract, "LoanPaid")] == [2]
+    assert recorder.events(contract, "LoanCreated") == []
+    assert contract.get_logs_calls == 2
+
+
+def test_event_wrapper():
+    event = EventWrapper(LoanCreated(1, 100))
+
+    assert (event.id, event.amount) == (1, 100)
+    assert event.args_dict == {"id": 1, "amount": 100}
+    assert not hasattr(event, "__dict__")
+    with pytest.raises(AttributeError, match="No attr count in LoanCreated"):
+        event.count  # noqa: B018
@@ -0,0 +1,400 @@
+import json
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple
+
+import boa
+import pytest
+
+from ...conftest_base import (
+    ZERO_ADDRESS,
+    Fee,
+    Loan,
+    Offer,
+    OfferType,
+    TokenTraitTree,
+    compute_loan_hash,
+    compute_signed_offer_id,
+    sign_offer,
+)
+from ...gas_baseline import BASELINE_VERSION, GasBaseline, GasStatus, format_report, linear_fit, regressions
+
+TOKEN_ID = 1
+TRAIT = ("openness", "curious")
+TRAIT_TOKENS = 16
+PROOF_DEPTHS = [pytest.param(depth, marks=pytest.mark.slow) if depth > 16 else depth for depth in range(4, 21)]
+PROOF_GAS_CURVE_FILE = Path(".cache/gas/trait_proof_curve.json")
+
+
+class Collateral(NamedTuple):
+    name: str
+    contract: object
+    key_hash: bytes
+    punk: bool
+
+    def escrow(self, p2p_nfts, token_id, borrower):
+        self.contract.mint(borrower, token_id)
+        if self.punk:
+            self.contract.offerPunkForSaleToAddress(token_id, 0, p2p_nfts.address, sender=borrower)
+        else:
+            self.contract.approve(p2p_nfts.address, token_id, sender=borrower)
+
+
+def call(function, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+def open_loan(
+    p2p_nfts_usdc, signed_offer, collateral, borrower, borrower_broker_fee, *, proof=(), delegate=ZERO_ADDRESS, measure=call
+):
+    offer = signed_offer.offer
+    collateral.escrow(p2p_nfts_usdc, TOKEN_ID, borrower)
+    fees = [
+        Fee.protocol(p2p_nfts_usdc, offer.principal),
+        Fee.origination(offer),
+        Fee.lender_broker(offer),
+        borrower_broker_fee,
+    ]
+    now = boa.eval("block.timestamp")
+
+    loan_id = measure(
+        p2p_nfts_usdc.create_loan,
+        signed_offer,
+        TOKEN_ID,
+        list(proof),
+        delegate,
+        borrower_broker_fee.upfront_amount,
+        borrower_broker_fee.settlement_bps,
+        borrower_broker_fee.wallet,
+        sender=borrower,
+    )
+
+    loan = Loan(
+        id=loan_id,
+        offer_id=compute_signed_offer_id(signed_offer),
+        offer_tracing_id=offer.tracing_id,
+        amount=offer.principal,
+        interest=offer.interest,
+        payment_token=offer.payment_token,
+        maturity=now + offer.duration,
+        start_time=now,
+        borrower=borrower,
+        lender=offer.lender,
+        collateral_contract=collateral.contract.address,
+        collateral_token_id=TOKEN_ID,
+        fees=fees,
+        pro_rata=offer.pro_rata,
+        delegate=delegate,
+    )
+    assert compute_loan_hash(loan) == p2p_nfts_usdc.loans(loan_id)
+    return loan
+
+
+@pytest.fixture(autouse=True)
+def funds(p2p_nfts_usdc, usdc, borrower, lender, lender2):
+    for user in [borrower, lender, lender2]:
+        usdc.mint(user, 10**12)
+        usdc.approve(p2p_nfts_usdc.address, 10**12, sender=user)
+
+
+@pytest.fixture(autouse=True)
+def protocol_fee(p2p_nfts_usdc):
+    p2p_nfts_usdc.set_protocol_fee(11, 1000, sender=p2p_nfts_usdc.owner())
+    p2p_nfts_usdc.change_protocol_wallet(p2p_nfts_usdc.owner(), sender=p2p_nfts_usdc.owner())
+
+
+@pytest.fixture
+def borrower_broker_fee():
+    return Fee.borrower_broker(boa.env.generate_address("borrower_broker"), upfront_amount=15, settlement_bps=300)
+
+
+@pytest.fixture
+def collateral(request, bayc, cryptopunks, bayc_key_hash, punks_key_hash):
+    if getattr(request, "param", "erc721") == "punks":
+        return Collateral("punks", cryptopunks, punks_key_hash, punk=True)
+    return Collateral("erc721", bayc, bayc_key_hash, punk=False)
+
+
+@pytest.fixture
+def trait_proof(p2p_control, collateral):
+    tree = TokenTraitTree([(collateral.contract.address, *TRAIT, token_id) for token_id in range(TRAIT_TOKENS)])
+    p2p_control.change_collections_trait_roots([(collateral.key_hash, tree.root())], sender=p2p_control.owner())
+    return tree.proof(TokenTraitTree.token_node(collateral.contract.address, *TRAIT, TOKEN_ID))
+
+
+@pytest.fixture
+def make_offer(now, usdc, collateral):
+    broker = boa.env.generate_address("broker")
+
+    def make_offer(lender, tracing_id, **kwargs):
+        return Offer(
+            **{
+                "principal": 1000,
+                "interest": 100,
+                "payment_token": usdc.address,
+                "duration": 100,
+                "origination_fee_amount": 10,
+                "broker_upfront_fee_amount": 15,
+                "broker_settlement_fee_bps": 2000,
+                "broker_address": broker,
+                "collection_key_hash": collateral.key_hash,
+                "token_id": TOKEN_ID,
+                "expiration": now + 1000,
+                "lender": lender,
+                "tracing_id": tracing_id.zfill(32),
+            }
+            | kwargs
+        )
+
+    return make_offer
+
+
+@pytest.fixture
+def ongoing_loan(p2p_nfts_usdc, make_offer, collateral, borrower, lender, lender_key, borrower_broker_fee):
+    def ongoing_loan(**kwargs):
+        signed_offer = sign_offer(make_offer(lender, b"loan", **kwargs), lender_key, p2p_nfts_usdc.address)
+        return open_loan(p2p_nfts_usdc, signed_offer, collateral, borrower, borrower_broker_fee, delegate=borrower)
+
+    return ongoing_loan
+
+
+@pytest.fixture(scope="module")
+def proof_gas_curve():
+    # gas by proof depth of each entry point, written with its linear fit to size the trait trees of collections
+    curve = {}
+    yield curve
+    PROOF_GAS_CURVE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fits = {entry: linear_fit(sorted(gas_by_depth.items())) for entry, gas_by_depth in curve.items()}
+    data = {
+        entry: {
+            "base_gas": round(base),
+            "gas_per_proof_element": round(slope),
+            "gas_by_depth": dict(sorted(curve[entry].items())),
+        }
+        for entry, (base, slope) in fits.items()
+    }
+    PROOF_GAS_CURVE_FILE.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def test_linear_fit():
+    assert linear_fit([(4, 100), (5, 110), (6, 120)]) == (60.0, 10.0)
+    assert linear_fit([(4, 100)]) == (100.0, 0.0)
+
+
+def test_baseline_comparison_flags_regressions():
+    baseline = GasBaseline({"a": 1000, "b": 1000, "c": 1000})
+    comparisons = baseline.compare({"a": 1010, "b": 990, "d": 500})
+
+    assert [(c.name, c.status()) for c in comparisons] == [
+        ("a", GasStatus.REGRESSED),
+        ("b", GasStatus.IMPROVED),
+        ("c", GasStatus.NOT_MEASURED),
+        ("d", GasStatus.NEW),
+    ]
+    assert [c.name for c in regressions(comparisons)] == ["a"]
+    assert regressions(comparisons, tolerance=0.01) == []
+    assert format_report(comparisons)[1].split() == ["a", "1,000", "1,010", "+10", "+1.00%", "regressed"]
+
+
+def test_baseline_update_keeps_entries_not_measured(tmp_path):
+    path = tmp_path / "gas.json"
+    GasBaseline({"a": 1, "b": 2}, "0.4.1").updated({"b": 3, "c": 4}, "0.4.2").save(path)
+
+    baseline = GasBaseline.load(path)
+    assert baseline.benchmarks == {"a": 1, "b": 3, "c": 4}
+    assert baseline.compiler == "0.4.2"
+    assert GasBaseline.load(tmp_path / "missing.json").benchmarks == {}
+
+
+def test_baseline_rejects_other_versions(tmp_path):
+    path = tmp_path / "gas.json"
+    path.write_text(json.dumps({"version": BASELINE_VERSION + 1, "benchmarks": {}}))
+
+    with pytest.raises(ValueError, match="baseline version"):
+        GasBaseline.load(path)
+
+
+def test_gas_benchmark_rejects_calls_without_a_new_computation(gas_benchmark, p2p_nfts_usdc):
+    def not_a_call():
+        pass
+
+    not_a_call.contract = p2p_nfts_usdc
+
+    with pytest.raises(AssertionError, match="not_a_call ran no new computation"):
+        gas_benchmark.measure("not_a_call", not_a_call)
+    assert "not_a_call" not in gas_benchmark.measurements
+
+    gas_benchmark.measure("owner", p2p_nfts_usdc.owner)
+    assert gas_benchmark.measurements.pop("owner") > 0
+
+
+@pytest.mark.gas_benchmark
+@pytest.mark.parametrize("delegate", [False, True], ids=["no_delegate", "delegate"])
+@pytest.mark.parametrize("collateral", ["erc721", "punks"], indirect=True)
+@pytest.mark.parametrize("offer_type", list(OfferType), ids=lambda t: t.name.lower())
+def test_create_loan_gas(
+    gas_benchmark,
+    p2p_nfts_usdc,
+    make_offer,
+    trait_proof,
+    collateral,
+    offer_type,
+    delegate,
+    borrower,
+    lender,
+    lender_key,
+    borrower_broker_fee,
+):
+    offer = make_offer(
+        lender,
+        b"create",
+        offer_type=offer_type,
+        token_range_min=0,
+        token_range_max=TRAIT_TOKENS - 1,
+        trait_hash=TokenTraitTree.trait_hash(*TRAIT),
+    )
+    name = f"create_loan[{offer_type.name.lower()},{collateral.name},{'delegate' if delegate else 'no_delegate'}]"
+
+    open_loan(
+        p2p_nfts_usdc,
+        sign_offer(offer, lender_key, p2p_nfts_usdc.address),
+        collateral,
+        borrower,
+        borrower_broker_fee,
+        proof=trait_proof if offer_type == OfferType.TRAIT else [],
+        delegate=borrower if delegate else ZERO_ADDRESS,
+        measure=partial(gas_benchmark.measure, name),
+    )
+
+
+@pytest.mark.gas_benchmark
+@pytest.mark.parametrize("pro_rata", [False, True], ids=["fixed", "pro_rata"])
+def test_settle_loan_gas(gas_benchmark, p2p_nfts_usdc, ongoing_loan, pro_rata):
+    loan = ongoing_loan(pro_rata=pro_rata)
+    boa.env.time_travel(seconds=50)
+
+    name = f"settle_loan[{'pro_rata' if pro_rata else 'fixed'}]"
+    gas_benchmark.measure(name, p2p_nfts_usdc.settle_loan, loan, sender=loan.borrower)
+
+
+@pytest.mark.gas_benchmark
+def test_replace_loan_gas(gas_benchmark, p2p_nfts_usdc, ongoing_loan, make_offer, lender2, lender2_key, borrower_broker_fee):
+    loan = ongoing_loan()
+    offer = sign_offer(make_offer(lender2, b"replace"), lender2_key, p2p_nfts_usdc.address)
+    boa.env.time_travel(seconds=50)
+
+    gas_benchmark.measure(
+        "replace_loan",
+        p2p_nfts_usdc.replace_loan,
+        loan,
+        offer,
+        [],
+        borrower_broker_fee.upfront_amount,
+        borrower_broker_fee.settlement_bps,
+        borrower_broker_fee.wallet,
+        sender=loan.borrower,
+    )
+
+
+@pytest.mark.gas_benchmark
+@pytest.mark.parametrize("same_lender", [True, False], ids=["same_lender", "different_lender"])
+def test_replace_loan_lender_gas(
+    gas_benchmark, p2p_nfts_usdc, ongoing_loan, make_offer, lender, lender_key, lender2, lender2_key, same_lender
+):
+    loan = ongoing_loan()
+    new_lender, new_lender_key = (lender, lender_key) if same_lender else (lender2, lender2_key)
+    offer = sign_offer(make_offer(new_lender, b"replace"), new_lender_key, p2p_nfts_usdc.address)
+    boa.env.time_travel(seconds=50)
+
+    gas_benchmark.measure(
+        f"replace_loan_lender[{'same_lender' if same_lender else 'different_lender'}]",
+        p2p_nfts_usdc.replace_loan_lender,
+        loan,
+        offer,
+        [],
+        sender=loan.lender,
+    )
+
+
+@pytest.mark.gas_benchmark
+@pytest.mark.parametrize("collateral", ["erc721", "punks"], indirect=True)
+def test_claim_defaulted_loan_collateral_gas(gas_benchmark, p2p_nfts_usdc, ongoing_loan, collateral):
+    loan = ongoing_loan()
+    boa.env.time_travel(seconds=loan.maturity - loan.start_time + 1)
+
+    gas_benchmark.measure(
+        f"claim_defaulted_loan_collateral[{collateral.name}]",
+        p2p_nfts_usdc.claim_defaulted_loan_collateral,
+        loan,
+        sender=loan.lender,
+    )
+
+
+@pytest.mark.gas_benchmark
+def test_revoke_offer_gas(gas_benchmark, p2p_nfts_usdc, make_offer, lender, lender_key):
+    offer = sign_offer(make_offer(lender, b"revoke"), lender_key, p2p_nfts_usdc.address)
+
+    gas_benchmark.measure("revoke_offer", p2p_nfts_usdc.revoke_offer, offer, sender=lender)
+
+
+@pytest.mark.gas_benchmark
+def test_claim_pending_transfers_gas(gas_benchmark, p2p_nfts_usdc, usdc):
+    user = boa.env.generate_address()
+    value = 10**6
+    p2p_nfts_usdc.eval(f"self.pending_transfers[{user}] = {value}")
+    boa.env.set_balance(p2p_nfts_usdc.address, value)
+    usdc.deposit(value=value, sender=p2p_nfts_usdc.address)
+
+    gas_benchmark.measure("claim_pending_transfers", p2p_nfts_usdc.claim_pending_transfers, sender=user)
+
+
+@pytest.mark.gas_benchmark
+@pytest.mark.parametrize("depth", PROOF_DEPTHS)
+def test_trait_proof_depth_gas(
+    gas_benchmark,
+    proof_gas_curve,
+    p2p_nfts_usdc,
+    p2p_control,
+    make_offer,
+    collateral,
+    borrower,
+    lender,
+    lender_key,
+    lender2,
+    lender2_key,
+    borrower_broker_fee,
+    depth,
+):
+    contract = collateral.contract.address
+    tree = TokenTraitTree([(contract, *TRAIT, token_id) for token_id in range(2**depth)])
+    p2p_control.change_collections_trait_roots([(collateral.key_hash, tree.root())], sender=p2p_control.owner())
+    proof = tree.proof(TokenTraitTree.token_node(contract, *TRAIT, TOKEN_ID))
+    assert len(proof) == depth
+
+    trait_offer = {"offer_type": OfferType.TRAIT, "trait_hash": TokenTraitTree.trait_hash(*TRAIT)}
+    create_name, replace_name = f"create_loan[trait,depth={depth:02}]", f"replace_loan[trait,depth={depth:02}]"
+    loan = open_loan(
+        p2p_nfts_usdc,
+        sign_offer(make_offer(lender, b"create", **trait_offer), lender_key, p2p_nfts_usdc.address),
+        collateral,
+        borrower,
+        borrower_broker_fee,
+        proof=proof,
+        delegate=borrower,
+        measure=partial(gas_benchmark.measure, create_name),
+    )
+    boa.env.time_travel(seconds=50)
+    gas_benchmark.measure(
+        replace_name,
+        p2p_nfts_usdc.replace_loan,
+        loan,
+        sign_offer(make_offer(lender2, b"replace", **trait_offer), lender2_key, p2p_nfts_usdc.address),
+        proof,
+        borrower_broker_fee.upfront_amount,
+        borrower_broker_fee.settlement_bps,
+        borrower_broker_fee.wallet,
+        sender=borrower,
+    )
+
+    proof_gas_curve.setdefault("create_loan", {})[depth] = gas_benchmark.measurements[create_name]
+    proof_gas_curve.setdefault("replace_loan", {})[depth] = gas_benchmark.measurements[replace_name]
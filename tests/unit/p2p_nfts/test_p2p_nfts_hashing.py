@@ -0,0 +1,142 @@
+import random
+
+import boa
+import pytest
+
+from scripts._helpers import hashing
+
+from ...conftest_base import (
+    ZERO_ADDRESS,
+    Fee,
+    FeeType,
+    Loan,
+    Offer,
+    Signature,
+    SignedOffer,
+    get_last_event,
+    sign_offer,
+)
+
+
+@pytest.fixture(autouse=True)
+def lender_funds(lender, usdc):
+    usdc.mint(lender, 10**12)
+
+
+@pytest.fixture
+def random_loans():
+    rng = random.Random(42)
+    loans = []
+    for i in range(10):
+        fees = [Fee(t, rng.randrange(10**18), rng.randrange(10000), boa.env.generate_address()) for t in FeeType][: i % 5]
+        loans.append(
+            Loan(
+                id=rng.randbytes(32),
+                offer_id=rng.randbytes(32),
+                offer_tracing_id=rng.randbytes(32),
+                amount=rng.randrange(2**128),
+                interest=rng.randrange(2**128),
+                payment_token=boa.env.generate_address(),
+                maturity=rng.randrange(2**64),
+                start_time=rng.randrange(2**64),
+                borrower=boa.env.generate_address(),
+                lender=boa.env.generate_address(),
+                collateral_contract=boa.env.generate_address(),
+                collateral_token_id=rng.randrange(2**256),
+                fees=fees,
+                pro_rata=bool(i % 2),
+                delegate=boa.env.generate_address() if i % 3 else ZERO_ADDRESS,
+            )
+        )
+    return loans
+
+
+@pytest.fixture
+def random_signed_offers():
+    rng = random.Random(42)
+    return [
+        SignedOffer(Offer(), Signature(rng.choice([27, 28]), rng.randrange(2**256), rng.randrange(2**256))) for _ in range(10)
+    ]
+
+
+def test_compute_loan_id_matches_contract(p2p_nfts_usdc, random_loans):
+    for loan in random_loans:
+        assert hashing.compute_loan_id(loan) == p2p_nfts_usdc.internal._compute_loan_id(loan)
+
+
+def test_compute_loan_state_hash_matches_contract(p2p_nfts_usdc, random_loans):
+    for loan in random_loans:
+        assert hashing.compute_loan_state_hash(loan) == p2p_nfts_usdc.internal._loan_state_hash(loan)
+
+
+def test_compute_signed_offer_id_matches_contract(p2p_nfts_usdc, random_signed_offers):
+    for signed_offer in random_signed_offers:
+        assert hashing.compute_signed_offer_id(signed_offer) == p2p_nfts_usdc.internal._compute_signed_offer_id(signed_offer)
+
+
+def test_hex_values_hash_as_bytes(random_loans, random_signed_offers):
+    for loan in random_loans:
+        hex_loan = loan._replace(id="0x" + loan.id.hex(), offer_id=loan.offer_id.hex())
+        assert hashing.compute_loan_state_hash(hex_loan) == hashing.compute_loan_state_hash(loan)
+
+    for signed_offer in random_signed_offers:
+        v, r, s = signed_offer.signature
+        hex_signed_offer = SignedOffer(signed_offer.offer, Signature(v, hex(r), s.to_bytes(32, "big")))
+        assert hashing.compute_signed_offer_id(hex_signed_offer) == hashing.compute_signed_offer_id(signed_offer)
+
+
+def test_batch_functions_match_single(random_loans, random_signed_offers):
+    assert hashing.compute_loan_ids(random_loans) == [hashing.compute_loan_id(loan) for loan in random_loans]
+    assert hashing.compute_loan_state_hashes(random_loans) == [hashing.compute_loan_state_hash(loan) for loan in random_loans]
+    assert hashing.compute_signed_offer_ids(random_signed_offers) == [
+        hashing.compute_signed_offer_id(o) for o in random_signed_offers
+    ]
+
+    state_hashes = hashing.compute_loan_state_hashes(random_loans)
+    assert all(hashing.verify_loan_state_hashes(random_loans, state_hashes))
+    assert not any(hashing.verify_loan_state_hashes(random_loans, state_hashes[1:] + state_hashes[:1]))
+
+
+def test_hashes_match_created_loan(p2p_nfts_usdc, borrower, now, lender, lender_key, bayc, bayc_key_hash, usdc):
+    token_id = 1
+    offer = Offer(
+        principal=1000,
+        interest=100,
+        payment_token=usdc.address,
+        duration=100,
+        collection_key_hash=bayc_key_hash,
+        token_id=token_id,
+        expiration=now + 100,
+        lender=lender,
+    )
+    signed_offer = sign_offer(offer, lender_key, p2p_nfts_usdc.address)
+
+    bayc.mint(borrower, token_id)
+    bayc.approve(p2p_nfts_usdc.address, token_id, sender=borrower)
+    usdc.approve(p2p_nfts_usdc.address, offer.principal, sender=lender)
+    loan_id = p2p_nfts_usdc.create_loan(signed_offer, token_id, [], ZERO_ADDRESS, 0, 0, ZERO_ADDRESS, sender=borrower)
+    event = get_last_event(p2p_nfts_usdc, "LoanCreated")
+
+    loan = Loan(
+        id=loan_id,
+        offer_id=hashing.compute_signed_offer_id(signed_offer),
+        offer_tracing_id=offer.tracing_id,
+        amount=offer.principal,
+        interest=offer.interest,
+        payment_token=offer.payment_token,
+        maturity=now + offer.duration,
+        start_time=now,
+        borrower=borrower,
+        lender=lender,
+        collateral_contract=bayc.address,
+        collateral_token_id=token_id,
+        fees=[
+            Fee.protocol(p2p_nfts_usdc, offer.principal),
+            Fee.origination(offer),
+            Fee.lender_broker(offer),
+            Fee.borrower_broker(ZERO_ADDRESS),
+        ],
+    )
+    assert event.offer_id == loan.offer_id
+    assert hashing.compute_loan_id(loan) == loan_id
+    assert hashing.compute_loan_state_hash(loan) == p2p_nfts_usdc.loans(loan_id)
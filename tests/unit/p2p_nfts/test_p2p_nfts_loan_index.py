@@ -0,0 +1,154 @@
+import boa
+import pytest
+
+from scripts._helpers.loans import LoanIndex, LoanStatus
+
+from ...conftest_base import ZERO_ADDRESS, Fee, Loan, Offer, compute_signed_offer_id, get_events, sign_offer
+
+
+@pytest.fixture(autouse=True)
+def lender_funds(lender, usdc):
+    usdc.mint(lender, 10**12)
+
+
+@pytest.fixture(autouse=True)
+def lender2_funds(lender2, usdc):
+    usdc.mint(lender2, 10**12)
+
+
+@pytest.fixture(autouse=True)
+def borrower_funds(borrower, usdc):
+    usdc.mint(borrower, 10**12)
+
+
+@pytest.fixture
+def loan_index():
+    with LoanIndex(loan_type=Loan, fee_type=Fee) as index:
+        yield index
+
+
+@pytest.fixture
+def loan_logs():
+    return []
+
+
+@pytest.fixture
+def offer_bayc(now, lender, lender_key, usdc, p2p_nfts_usdc, bayc_key_hash):
+    offer = Offer(
+        principal=1000,
+        interest=100,
+        payment_token=usdc.address,
+        duration=100,
+        origination_fee_amount=10,
+        collection_key_hash=bayc_key_hash,
+        token_id=1,
+        expiration=now + 100,
+        lender=lender,
+        tracing_id=b"offer_bayc".zfill(32),
+    )
+    return sign_offer(offer, lender_key, p2p_nfts_usdc.address)
+
+
+@pytest.fixture
+def offer_bayc2(now, lender2, lender2_key, usdc, p2p_nfts_usdc, bayc_key_hash):
+    offer = Offer(
+        principal=1200,
+        interest=150,
+        payment_token=usdc.address,
+        duration=150,
+        collection_key_hash=bayc_key_hash,
+        token_id=1,
+        expiration=now + 100,
+        lender=lender2,
+        pro_rata=True,
+        tracing_id=b"offer_bayc2".zfill(32),
+    )
+    return sign_offer(offer, lender2_key, p2p_nfts_usdc.address)
+
+
+@pytest.fixture
+def ongoing_loan_bayc(p2p_nfts_usdc, offer_bayc, usdc, borrower, lender, bayc, now, loan_index, loan_logs):
+    offer = offer_bayc.offer
+    bayc.mint(borrower, offer.token_id)
+    bayc.approve(p2p_nfts_usdc.address, offer.token_id, sender=borrower)
+    usdc.approve(p2p_nfts_usdc.address, offer.principal, sender=lender)
+
+    loan_id = p2p_nfts_usdc.create_loan(offer_bayc, offer.token_id, [], borrower, 0, 0, ZERO_ADDRESS, sender=borrower)
+    # the events are read from the last computation, so they are kept before any view call
+    loan_logs.extend(get_events(p2p_nfts_usdc))
+    loan_index.apply_logs(loan_logs)
+
+    return Loan(
+        id=loan_id,
+        offer_id=compute_signed_offer_id(offer_bayc),
+        offer_tracing_id=offer.tracing_id,
+        amount=offer.principal,
+        interest=offer.interest,
+        payment_token=offer.payment_token,
+        maturity=now + offer.duration,
+        start_time=now,
+        borrower=borrower,
+        lender=lender,
+        collateral_contract=bayc.address,
+        collateral_token_id=offer.token_id,
+        fees=[
+            Fee.protocol(p2p_nfts_usdc, offer.principal),
+            Fee.origination(offer),
+            Fee.lender_broker(offer),
+            Fee.borrower_broker(ZERO_ADDRESS),
+        ],
+        pro_rata=offer.pro_rata,
+        delegate=borrower,
+    )
+
+
+def test_created_loan_is_indexed(p2p_nfts_usdc, ongoing_loan_bayc, loan_index):
+    assert loan_index.get(ongoing_loan_bayc.id) == ongoing_loan_bayc
+    assert loan_index.status(ongoing_loan_bayc.id) == LoanStatus.ACTIVE
+    assert loan_index.verify(ongoing_loan_bayc.id, p2p_nfts_usdc.loans(ongoing_loan_bayc.id))
+    assert loan_index.verify_active_loans(p2p_nfts_usdc) == {ongoing_loan_bayc.id: True}
+
+
+def test_indexed_loan_can_be_settled(p2p_nfts_usdc, ongoing_loan_bayc, loan_index, usdc, borrower):
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=borrower)
+    p2p_nfts_usdc.settle_loan(loan_index.get(ongoing_loan_bayc.id), sender=borrower)
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+
+    assert loan_index.status(ongoing_loan_bayc.id) == LoanStatus.PAID
+    assert loan_index.active_loans() == []
+
+
+def test_indexed_loan_collateral_can_be_claimed(p2p_nfts_usdc, ongoing_loan_bayc, loan_index, lender):
+    boa.env.time_travel(seconds=ongoing_loan_bayc.maturity - boa.eval("block.timestamp") + 1)
+    p2p_nfts_usdc.claim_defaulted_loan_collateral(loan_index.get(ongoing_loan_bayc.id), sender=lender)
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+
+    assert loan_index.status(ongoing_loan_bayc.id) == LoanStatus.CLAIMED
+
+
+def test_replaced_loan_keeps_delegate(p2p_nfts_usdc, ongoing_loan_bayc, offer_bayc2, loan_index, usdc, borrower, lender2):
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=borrower)
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=lender2)
+    loan = loan_index.get(ongoing_loan_bayc.id)
+    loan_id = p2p_nfts_usdc.replace_loan(loan, offer_bayc2, [], 0, 0, ZERO_ADDRESS, sender=borrower)
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+
+    new_loan = loan_index.get(loan_id)
+    assert loan_index.status(loan.id) == LoanStatus.REPLACED
+    assert new_loan.delegate == loan.delegate
+    assert new_loan.lender == lender2
+    assert loan_index.verify_active_loans(p2p_nfts_usdc) == {loan_id: True}
+
+    p2p_nfts_usdc.settle_loan(new_loan, sender=borrower)
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+    assert loan_index.status(loan_id) == LoanStatus.PAID
+
+
+def test_index_is_persisted(p2p_nfts_usdc, ongoing_loan_bayc, loan_logs, tmp_path):
+    with LoanIndex(tmp_path / "loans.sqlite") as index:
+        index.apply_logs(loan_logs, last_block=10)
+
+    with LoanIndex(tmp_path / "loans.sqlite", loan_type=Loan, fee_type=Fee) as index:
+        assert index.last_block == 10
+        assert index.get(ongoing_loan_bayc.id) == ongoing_loan_bayc
+        assert index.verify(ongoing_loan_bayc.id, p2p_nfts_usdc.loans(ongoing_loan_bayc.id))
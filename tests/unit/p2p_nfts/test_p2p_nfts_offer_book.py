@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+from scripts._helpers import traits
+from scripts._helpers.offers import IntervalTree, OfferBook
+
+from ...conftest_base import OfferType, compute_signed_offer_id
+
+
+@pytest.fixture
+def token_with_traits(bayc, traits):
+    return [
+        (bayc.address, trait_name, trait_value, token_id)
+        for token_id in range(20)
+        for trait_name, trait_values in traits.items()
+        for trait_value in trait_values[token_id % 3 : token_id % 3 + 1]
+    ]
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(0)
+    intervals = {}
+    tree = IntervalTree()
+    for i in range(300):
+        start = rng.randrange(1000)
+        intervals[i.to_bytes(32, "big")] = (start, start + rng.randrange(100))
+        tree.add(i.to_bytes(32, "big"), *intervals[i.to_bytes(32, "big")])
+    for key in list(intervals)[::7]:
+        tree.remove(key)
+        del intervals[key]
+
+    for point in range(0, 1100, 3):
+        expected = {key for key, (start, end) in intervals.items() if start <= point <= end}
+        assert set(tree.stab(point)) == expected
+
+
+def test_interval_tree_yields_by_rank():
+    tree = IntervalTree()
+    tree.add(b"full", 0, 2**256 - 1, (3,))
+    tree.add(b"low", 0, 10, (1,))
+    tree.add(b"high", 2**255, 2**256 - 1, (2,))
+    tree.add(b"point", 5, 5, (4,))
+
+    assert tree.stab(5) == [b"low", b"full", b"point"]
+    assert tree.stab(11) == [b"full"]
+    assert tree.stab(2**255) == [b"high", b"full"]
+
+    tree.add(b"low", 0, 10, (5,))
+    tree.remove(b"full")
+    assert tree.stab(5) == [b"point", b"low"]
+
+
+def test_best_offers_ranks_all_offer_types(offer_factory, bayc_key_hash, token_with_traits, now):
+    _, trait_name, trait_value, token_id = token_with_traits[0]
+    token = offer_factory(token_id=token_id, principal=1000)
+    collection = offer_factory(offer_type=OfferType.COLLECTION, token_range_min=0, token_range_max=10, principal=1200)
+    trait = offer_factory(offer_type=OfferType.TRAIT, trait_hash=traits.trait_hash(trait_name, trait_value), principal=1100)
+    other_token = offer_factory(token_id=token_id + 1, principal=2000)
+    other_trait = offer_factory(offer_type=OfferType.TRAIT, trait_hash=b"\1" * 32, principal=2000)
+    book = OfferBook([token, collection, trait, other_token, other_trait])
+    book.set_token_traits(bayc_key_hash, traits.token_trait_hashes(token_with_traits))
+
+    best = book.best_offers(bayc_key_hash, [token_id, 11], now, n=5)
+
+    assert best[token_id] == [collection, trait, token]
+    assert best[11] == []
+    assert book.best_offers(bayc_key_hash, [token_id], now, n=2)[token_id] == [collection, trait]
+    assert book.best_offers(b"\2" * 32, [token_id], now) == {token_id: []}
+
+
+def test_best_offers_tie_breaks(offer_factory, bayc_key_hash, now):
+    cheaper = offer_factory(interest=90)
+    net_of_fee = offer_factory(principal=1010, origination_fee_amount=20)
+    later = offer_factory(expiration=now + 200)
+    base = offer_factory()
+    book = OfferBook([base, later, net_of_fee, cheaper])
+
+    assert book.best_offers(bayc_key_hash, [1], now, n=4)[1] == [cheaper, later, base, net_of_fee]
+
+
+def test_best_offers_ranks_full_range_collection_offers(offer_factory, bayc_key_hash, now):
+    offers = [offer_factory(offer_type=OfferType.COLLECTION, principal=principal) for principal in [1000, 3000, 2000]]
+    offers.append(offer_factory(offer_type=OfferType.COLLECTION, token_range_min=5, token_range_max=5, principal=2500))
+    book = OfferBook(offers)
+
+    best = book.best_offers(bayc_key_hash, [5, 2**256 - 1], now, n=3)
+
+    assert best[5] == [offers[1], offers[3], offers[2]]
+    assert best[2**256 - 1] == [offers[1], offers[2], offers[0]]
+
+
+def test_best_offers_skips_expired_offers(offer_factory, bayc_key_hash, now):
+    expiring, lasting = offer_factory(principal=2000, expiration=now + 10), offer_factory()
+    book = OfferBook([expiring, lasting])
+
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == [expiring]
+    assert book.best_offers(bayc_key_hash, [1], now + 10)[1] == [lasting]
+    assert book.prune(now + 10) == [compute_signed_offer_id(expiring)]
+    assert len(book) == 1
+
+
+def test_fill_consumes_offer_size(offer_factory, bayc_key_hash, now):
+    collection = offer_factory(offer_type=OfferType.COLLECTION, token_range_max=10, size=2)
+    book = OfferBook([collection])
+    offer_id = compute_signed_offer_id(collection)
+
+    book.fill(offer_id)
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == [collection]
+    book.fill(offer_id)
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == []
+    with pytest.raises(ValueError, match="fully utilized"):
+        book.fill(offer_id)
+
+    book.release(collection.offer.tracing_id)
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == [collection]
+
+
+def test_fill_revokes_token_offers(offer_factory, bayc_key_hash, now):
+    token = offer_factory(size=2)
+    book = OfferBook([token])
+    offer_id = compute_signed_offer_id(token)
+
+    book.fill(offer_id)
+
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == []
+    assert book.prune(now) == [offer_id]
+    assert offer_id not in book
+
+
+def test_trait_offer_proof_accepted_by_contract(p2p_nfts_usdc, offer_factory, bayc, bayc_key_hash, token_with_traits, now):
+    _, trait_name, trait_value, token_id = token_with_traits[-1]
+    trait = offer_factory(offer_type=OfferType.TRAIT, trait_hash=traits.trait_hash(trait_name, trait_value))
+    book = OfferBook([trait])
+    book.set_token_traits(bayc_key_hash, traits.token_trait_hashes(token_with_traits))
+    tree = traits.TraitTree.from_tokens(token_with_traits)
+
+    (best,) = book.best_offers(bayc_key_hash, [token_id], now)[token_id]
+
+    proof = tree.proof(traits.token_node_from_hash(bayc.address, best.offer.trait_hash, token_id))
+    p2p_nfts_usdc.internal._validate_token_ids(best.offer, token_id, (bayc.address, tree.root()), proof)
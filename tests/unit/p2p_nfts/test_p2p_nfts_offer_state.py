@@ -0,0 +1,163 @@
+from functools import partial
+from itertools import count
+
+import boa
+import pytest
+
+from scripts._helpers.loans import LoanIndex
+from scripts._helpers.offer_state import OfferStateReader
+from scripts._helpers.offers import OfferBook
+
+from ...conftest_base import ZERO_ADDRESS, Fee, Loan, OfferType, compute_signed_offer_id, get_events
+
+
+@pytest.fixture(autouse=True)
+def lender_funds(lender, usdc, p2p_nfts_usdc):
+    usdc.mint(lender, 10**12)
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=lender)
+
+
+@pytest.fixture(autouse=True)
+def borrower_funds(borrower, usdc, p2p_nfts_usdc):
+    usdc.mint(borrower, 10**12)
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=borrower)
+
+
+@pytest.fixture
+def reader(p2p_nfts_usdc, multicall):
+    return OfferStateReader(p2p_nfts_usdc.address, multicall.aggregate3)
+
+
+@pytest.fixture
+def loan_index():
+    with LoanIndex(loan_type=Loan, fee_type=Fee) as index:
+        yield index
+
+
+@pytest.fixture
+def collection_offer(offer_factory):
+    return partial(offer_factory, offer_type=OfferType.COLLECTION, size=2)
+
+
+@pytest.fixture
+def create_loan(p2p_nfts_usdc, bayc, borrower):
+    token_ids = count(1)
+
+    def _create_loan(signed_offer):
+        token_id = signed_offer.offer.token_id if signed_offer.offer.offer_type == OfferType.TOKEN else next(token_ids)
+        bayc.mint(borrower, token_id)
+        bayc.approve(p2p_nfts_usdc.address, token_id, sender=borrower)
+        return p2p_nfts_usdc.create_loan(signed_offer, token_id, [], ZERO_ADDRESS, 0, 0, ZERO_ADDRESS, sender=borrower)
+
+    return _create_loan
+
+
+def assert_matches_contract(p2p_nfts_usdc, reader, signed_offers):
+    tracing_ids = [so.offer.tracing_id for so in signed_offers]
+    offer_ids = [compute_signed_offer_id(so) for so in signed_offers]
+    rpc_calls = reader.rpc_calls
+
+    assert reader.offer_counts(tracing_ids) == {k: p2p_nfts_usdc.offer_count(k) for k in tracing_ids}
+    assert reader.revoked_offers(offer_ids) == {k: p2p_nfts_usdc.revoked_offers(k) for k in offer_ids}
+    assert reader.rpc_calls == rpc_calls
+
+
+def test_reads_are_batched(p2p_nfts_usdc, multicall, collection_offer, create_loan):
+    signed_offers = [collection_offer() for _ in range(25)]
+    create_loan(signed_offers[3])
+    p2p_nfts_usdc.revoke_offer(signed_offers[5], sender=signed_offers[5].offer.lender)
+    reader = OfferStateReader(p2p_nfts_usdc.address, multicall.aggregate3, chunk_size=10)
+
+    reader.load([so.offer.tracing_id for so in signed_offers], [compute_signed_offer_id(so) for so in signed_offers])
+
+    assert reader.rpc_calls == 5
+    assert_matches_contract(p2p_nfts_usdc, reader, signed_offers)
+
+
+def test_cache_follows_events(p2p_nfts_usdc, reader, loan_index, collection_offer, create_loan, borrower, lender):
+    collection, token, revoked = (
+        collection_offer(),
+        collection_offer(offer_type=OfferType.TOKEN, token_id=100),
+        collection_offer(),
+    )
+    signed_offers = [collection, token, revoked]
+    reader.load([so.offer.tracing_id for so in signed_offers], [compute_signed_offer_id(so) for so in signed_offers])
+    assert_matches_contract(p2p_nfts_usdc, reader, signed_offers)
+
+    for signed_offer in [collection, collection, token]:
+        create_loan(signed_offer)
+        reader.apply_logs(get_events(p2p_nfts_usdc))
+        loan_index.apply_logs(get_events(p2p_nfts_usdc))
+    p2p_nfts_usdc.revoke_offer(revoked, sender=lender)
+    reader.apply_logs(get_events(p2p_nfts_usdc))
+    assert_matches_contract(p2p_nfts_usdc, reader, signed_offers)
+
+    for loan in loan_index.active_loans():
+        p2p_nfts_usdc.settle_loan(loan, sender=borrower)
+        reader.apply_logs(get_events(p2p_nfts_usdc))
+    assert_matches_contract(p2p_nfts_usdc, reader, signed_offers)
+    assert reader.rpc_calls == 1
+
+
+def test_claim_keeps_the_offer_count(p2p_nfts_usdc, reader, loan_index, collection_offer, create_loan, lender, now):
+    signed_offer = collection_offer()
+    reader.load([signed_offer.offer.tracing_id], [compute_signed_offer_id(signed_offer)])
+    create_loan(signed_offer)
+    reader.apply_logs(get_events(p2p_nfts_usdc))
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+    (loan,) = loan_index.active_loans()
+
+    boa.env.time_travel(seconds=loan.maturity - now + 1)
+    p2p_nfts_usdc.claim_defaulted_loan_collateral(loan, sender=lender)
+    reader.apply_logs(get_events(p2p_nfts_usdc))
+
+    assert_matches_contract(p2p_nfts_usdc, reader, [signed_offer])
+    assert reader.offer_counts([signed_offer.offer.tracing_id]) == {signed_offer.offer.tracing_id: 1}
+    assert reader.rpc_calls == 1
+
+
+def test_unknown_loans_use_the_loan_index(p2p_nfts_usdc, multicall, loan_index, collection_offer, create_loan, borrower):
+    signed_offer = collection_offer()
+    tracing_id = signed_offer.offer.tracing_id
+    create_loan(signed_offer)
+    loan_index.apply_logs(get_events(p2p_nfts_usdc))
+    (loan,) = loan_index.active_loans()
+    with_index = OfferStateReader(p2p_nfts_usdc.address, multicall.aggregate3, loan_index=loan_index)
+    without_index = OfferStateReader(p2p_nfts_usdc.address, multicall.aggregate3)
+    for reader in [with_index, without_index]:
+        assert reader.offer_counts([tracing_id]) == {tracing_id: 1}
+
+    p2p_nfts_usdc.settle_loan(loan, sender=borrower)
+    for reader in [with_index, without_index]:
+        reader.apply_logs(get_events(p2p_nfts_usdc))
+        assert reader.offer_counts([tracing_id]) == {tracing_id: 0}
+
+    assert with_index.rpc_calls == 1
+    assert without_index.rpc_calls == 2
+
+
+def test_update_offer_book(p2p_nfts_usdc, reader, collection_offer, create_loan, bayc_key_hash, now):
+    full, available = collection_offer(size=1, principal=2000), collection_offer()
+    create_loan(full)
+    book = OfferBook([full, available])
+
+    reader.update_offer_book(book)
+
+    assert book.best_offers(bayc_key_hash, [1], now)[1] == [available]
+
+
+def test_reads_are_made_at_the_last_block(p2p_nfts_usdc, multicall, collection_offer, create_loan):
+    signed_offer = collection_offer()
+    create_loan(signed_offer)
+    blocks = []
+
+    def aggregate(calls, **kwargs):
+        blocks.append(kwargs.get("block_id"))
+        return multicall.aggregate3(calls)
+
+    reader = OfferStateReader(p2p_nfts_usdc.address, aggregate)
+    reader.offer_counts([signed_offer.offer.tracing_id])
+    reader.apply_logs([], last_block=10)
+    reader.revoked_offers([compute_signed_offer_id(signed_offer)])
+
+    assert blocks == [None, 10]
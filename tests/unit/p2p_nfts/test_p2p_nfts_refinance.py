@@ -0,0 +1,197 @@
+from functools import partial
+
+import boa
+import pytest
+
+from scripts._helpers.refinance import RefinanceScanner
+
+from ...conftest_base import ZERO_ADDRESS, Fee, Loan, OfferType, compute_signed_offer_id, get_last_event
+
+
+@pytest.fixture(autouse=True)
+def lender_funds(lender, usdc):
+    usdc.mint(lender, 10**12)
+
+
+@pytest.fixture(autouse=True)
+def lender2_funds(lender2, usdc):
+    usdc.mint(lender2, 10**12)
+
+
+@pytest.fixture
+def broker():
+    return boa.env.generate_address()
+
+
+@pytest.fixture
+def borrower_broker_fee():
+    return Fee.borrower_broker(boa.env.generate_address(), upfront_amount=15, settlement_bps=300)
+
+
+@pytest.fixture
+def protocol_fee(p2p_nfts_usdc):
+    p2p_nfts_usdc.set_protocol_fee(11, 1000, sender=p2p_nfts_usdc.owner())
+    p2p_nfts_usdc.change_protocol_wallet(p2p_nfts_usdc.owner(), sender=p2p_nfts_usdc.owner())
+
+
+@pytest.fixture
+def scanner_factory(p2p_nfts_usdc, bayc, bayc_key_hash):
+    def _scanner(signed_offers):
+        return RefinanceScanner(
+            signed_offers,
+            collection_contracts={bayc_key_hash: bayc.address},
+            protocol_upfront_fee=p2p_nfts_usdc.protocol_upfront_fee(),
+            protocol_settlement_fee=p2p_nfts_usdc.protocol_settlement_fee(),
+            max_lender_broker_settlement_fee=p2p_nfts_usdc.max_lender_broker_settlement_fee(),
+        )
+
+    return _scanner
+
+
+@pytest.fixture
+def broker_offer(offer_factory, broker):
+    return partial(
+        offer_factory,
+        duration=150,
+        origination_fee_amount=10,
+        broker_upfront_fee_amount=15,
+        broker_settlement_fee_bps=2000,
+        broker_address=broker,
+    )
+
+
+@pytest.fixture
+def loan_factory(  # noqa: PLR0917
+    p2p_nfts_usdc, broker_offer, usdc, borrower, lender, bayc, now, borrower_broker_fee, protocol_fee
+):
+    def _loan(*, pro_rata):
+        signed_offer = broker_offer(duration=100, pro_rata=pro_rata)
+        offer = signed_offer.offer
+        bayc.mint(borrower, offer.token_id)
+        bayc.approve(p2p_nfts_usdc.address, offer.token_id, sender=borrower)
+        usdc.approve(p2p_nfts_usdc.address, 10**12, sender=lender)
+
+        loan_id = p2p_nfts_usdc.create_loan(
+            signed_offer,
+            offer.token_id,
+            [],
+            ZERO_ADDRESS,
+            borrower_broker_fee.upfront_amount,
+            borrower_broker_fee.settlement_bps,
+            borrower_broker_fee.wallet,
+            sender=borrower,
+        )
+        return Loan(
+            id=loan_id,
+            offer_id=compute_signed_offer_id(signed_offer),
+            offer_tracing_id=offer.tracing_id,
+            amount=offer.principal,
+            interest=offer.interest,
+            payment_token=offer.payment_token,
+            maturity=now + offer.duration,
+            start_time=now,
+            borrower=borrower,
+            lender=lender,
+            collateral_contract=bayc.address,
+            collateral_token_id=offer.token_id,
+            fees=[
+                Fee.protocol(p2p_nfts_usdc, offer.principal),
+                Fee.origination(offer),
+                Fee.lender_broker(offer),
+                borrower_broker_fee,
+            ],
+            pro_rata=offer.pro_rata,
+        )
+
+    return _loan
+
+
+@pytest.mark.parametrize("same_lender", [False, True])
+@pytest.mark.parametrize("loan_pro_rata", [False, True])
+@pytest.mark.parametrize(("offer_pro_rata", "principal"), [(False, 1000), (True, 1000), (True, 2000), (False, 500)])
+def test_evaluate_matches_replace_loan_lender(  # noqa: PLR0917
+    p2p_nfts_usdc,
+    usdc,
+    loan_factory,
+    broker_offer,
+    scanner_factory,
+    lender,
+    lender_key,
+    lender2,
+    lender2_key,
+    borrower,
+    same_lender,
+    loan_pro_rata,
+    offer_pro_rata,
+    principal,
+):
+    new_lender, new_lender_key = (lender, lender_key) if same_lender else (lender2, lender2_key)
+    loan = loan_factory(pro_rata=loan_pro_rata)
+    signed_offer = broker_offer(lender=new_lender, key=new_lender_key, pro_rata=offer_pro_rata, principal=principal)
+    usdc.approve(p2p_nfts_usdc.address, 10**12, sender=new_lender)
+    boa.env.time_travel(seconds=40)
+    timestamp = boa.eval("block.timestamp")
+
+    candidate = scanner_factory([signed_offer]).evaluate(loan, signed_offer, timestamp)
+    borrower_balance = usdc.balanceOf(borrower)
+    lender_balance = usdc.balanceOf(lender)
+    new_lender_balance = usdc.balanceOf(new_lender)
+
+    if candidate is None:
+        with boa.reverts():
+            p2p_nfts_usdc.replace_loan_lender(loan, signed_offer, [], sender=lender)
+        return
+
+    p2p_nfts_usdc.replace_loan_lender(loan, signed_offer, [], sender=lender)
+    event = get_last_event(p2p_nfts_usdc, "LoanReplacedByLender")
+
+    assert event.borrower_compensation == candidate.borrower_compensation
+    assert event.paid_interest == candidate.interest
+    assert usdc.balanceOf(borrower) - borrower_balance == candidate.borrower_delta
+    if same_lender:
+        # the lender only pays the difference between the new principal and what the current loan returns
+        assert lender_balance - usdc.balanceOf(lender) == candidate.new_lender_payment
+    else:
+        assert usdc.balanceOf(lender) - lender_balance == candidate.current_lender_delta
+        assert new_lender_balance - usdc.balanceOf(new_lender) == candidate.new_lender_payment
+
+
+def test_scan_prunes_invalid_pairs(loan_factory, broker_offer, scanner_factory, lender2, lender2_key, now):
+    loan = loan_factory(pro_rata=False)
+    lender2_offer = partial(broker_offer, lender=lender2, key=lender2_key)
+    valid = lender2_offer()
+    collection = lender2_offer(offer_type=OfferType.COLLECTION, token_range_min=0, token_range_max=10)
+    short = lender2_offer(duration=50)
+    expired = lender2_offer(expiration=now)
+    other_token = lender2_offer(token_id=2)
+    out_of_range = lender2_offer(offer_type=OfferType.COLLECTION, token_range_min=2)
+    other_collection = lender2_offer(collection_key_hash=b"\1" * 32)
+    broker_without_address = lender2_offer(broker_address=ZERO_ADDRESS)
+
+    scanner = scanner_factory(
+        [
+            valid,
+            collection,
+            short,
+            expired,
+            other_token,
+            out_of_range,
+            other_collection,
+            broker_without_address,
+        ]
+    )
+    candidates = scanner.scan([loan], now)
+
+    assert {c.signed_offer for c in candidates} == {valid, collection}
+    assert scanner.scan([loan], loan.maturity + 1) == []
+
+
+def test_rank_prefers_lender_return(loan_factory, broker_offer, scanner_factory, lender2, lender2_key, now):
+    loan = loan_factory(pro_rata=False)
+    offers = [broker_offer(lender=lender2, key=lender2_key, interest=interest) for interest in [150, 120, 200]]
+
+    ranked = scanner_factory(offers).rank([loan], now, limit=2)
+
+    assert list(ranked) == [loan.id]
+    assert [c.signed_offer for c in ranked[loan.id]] == [offers[1], offers[0]]
+    assert ranked[loan.id][0].current_lender_delta > ranked[loan.id][1].current_lender_delta
@@ -0,0 +1,85 @@
+import random
+
+import boa
+import pytest
+
+from scripts._helpers.settlement import LoanBook
+
+from ...conftest_base import Fee, FeeType, Loan
+
+
+@pytest.fixture
+def loans(now):
+    rng = random.Random(42)
+    loans = []
+    for i in range(50):
+        start_time = now - rng.randrange(1, 10**6)
+        fees = [
+            Fee(fee_type, rng.randrange(10**18), rng.randrange(5000) if fee_type != FeeType.ORIGINATION else 0)
+            for fee_type in FeeType
+        ][: 1 + i % 4]
+        loans.append(
+            Loan(
+                id=rng.randbytes(32),
+                amount=rng.randrange(10**24),
+                interest=rng.randrange(10**22),
+                maturity=now + rng.randrange(10**6),
+                start_time=start_time,
+                fees=fees,
+                pro_rata=bool(i % 3),
+            )
+        )
+    return loans
+
+
+def test_quotes_match_contract(p2p_nfts_usdc, loans, now):
+    book = LoanBook(loans)
+    loans_by_id = {loan.id: loan for loan in loans}
+
+    for timestamp in [now, now + 1000, now + 10**5]:
+        boa.env.time_travel(seconds=timestamp - boa.eval("block.timestamp"))
+        quotes = book.quote(timestamp)
+        assert book.settlement_interest(timestamp) == quotes.interest
+
+        for i, loan_id in enumerate(book.ids):
+            loan = loans_by_id[loan_id]
+            interest = p2p_nfts_usdc.internal._compute_settlement_interest(loan)
+            fees, total, borrower_broker_fee = p2p_nfts_usdc.internal._get_settlement_fees(loan, interest)
+            quote = quotes.quote(i)
+
+            assert quote["interest"] == interest
+            assert quote["settlement_fees_total"] == total
+            assert {t: a for t, a in quote["fees"].items() if a > 0} == {t: a for t, a, _ in fees if a > 0}
+            assert quote["borrower_payment"] == loan.amount + interest + borrower_broker_fee
+            assert quote["lender_payment"] == loan.amount + interest - total + borrower_broker_fee
+            assert quote["defaulted"] == (timestamp > loan.maturity)
+
+
+def test_quote_many_matches_single_quotes(loans, now):
+    book = LoanBook(loans)
+    timestamps = [now + i * 3600 for i in range(10)]
+
+    assert book.quote_many(timestamps) == [book.quote(timestamp) for timestamp in timestamps]
+
+
+def test_duplicate_fee_types_match_contract(p2p_nfts_usdc, loans, now):
+    fees = [
+        Fee(FeeType.PROTOCOL, 0, 333),
+        Fee(FeeType.BORROWER_BROKER, 0, 777),
+        Fee(FeeType.PROTOCOL, 0, 1001),
+        Fee(FeeType.BORROWER_BROKER, 0, 555),
+    ]
+    loan = loans[1]._replace(fees=fees, interest=10**6 + 7)
+    boa.env.time_travel(seconds=now + 1000 - boa.eval("block.timestamp"))
+
+    quote = LoanBook([loan]).quote(now + 1000)
+    interest = p2p_nfts_usdc.internal._compute_settlement_interest(loan)
+    contract_fees, total, borrower_broker_fee = p2p_nfts_usdc.internal._get_settlement_fees(loan, interest)
+
+    assert quote.quote(0)["fees"] == {
+        FeeType.PROTOCOL: sum(a for t, a, _ in contract_fees if t == FeeType.PROTOCOL),
+        FeeType.BORROWER_BROKER: sum(a for t, a, _ in contract_fees if t == FeeType.BORROWER_BROKER),
+    }
+    assert quote.settlement_fees_total == [total]
+    assert quote.borrower_payment == [loan.amount + interest + borrower_broker_fee]
+    assert quote.lender_payment == [loan.amount + interest - total + borrower_broker_fee]
@@ -0,0 +1,115 @@
+import random
+
+import boa
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+
+from scripts._helpers.signing import DOMAIN_TYPE_HASH, OFFER_TYPE_HASH, OfferSigner
+
+from ...conftest_base import ZERO_ADDRESS, Offer, OfferType, Signature, sign_offers
+
+
+def reference_sign_offer(offer: Offer, lender_key: str, verifying_contract: str) -> Signature:
+    typed_data = {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "Offer": [
+                {"name": "principal", "type": "uint256"},
+                {"name": "interest", "type": "uint256"},
+                {"name": "payment_token", "type": "address"},
+                {"name": "duration", "type": "uint256"},
+                {"name": "origination_fee_amount", "type": "uint256"},
+                {"name": "broker_upfront_fee_amount", "type": "uint256"},
+                {"name": "broker_settlement_fee_bps", "type": "uint256"},
+                {"name": "broker_address", "type": "address"},
+                {"name": "offer_type", "type": "uint256"},
+                {"name": "token_id", "type": "uint256"},
+                {"name": "token_range_min", "type": "uint256"},
+                {"name": "token_range_max", "type": "uint256"},
+                {"name": "collection_key_hash", "type": "bytes32"},
+                {"name": "trait_hash", "type": "bytes32"},
+                {"name": "expiration", "type": "uint256"},
+                {"name": "lender", "type": "address"},
+                {"name": "pro_rata", "type": "bool"},
+                {"name": "size", "type": "uint256"},
+                {"name": "tracing_id", "type": "bytes32"},
+            ],
+        },
+        "primaryType": "Offer",
+        "domain": {
+            "name": "Zharta",
+            "version": "1",
+            "chainId": boa.eval("chain.id"),
+            "verifyingContract": verifying_contract,
+        },
+        "message": offer._asdict(),
+    }
+    signed_msg = Account.from_key(lender_key).sign_message(encode_typed_data(full_message=typed_data))
+    return Signature(signed_msg.v, signed_msg.r, signed_msg.s)
+
+
+@pytest.fixture
+def offers(now, lender, usdc, bayc_key_hash):
+    rng = random.Random(42)
+    return [
+        Offer(
+            principal=rng.randrange(1, 10**24),
+            interest=rng.randrange(10**22),
+            payment_token=usdc.address,
+            duration=rng.randrange(1, 10**7),
+            origination_fee_amount=rng.randrange(10**18),
+            broker_upfront_fee_amount=rng.randrange(10**18),
+            broker_settlement_fee_bps=rng.randrange(10000),
+            broker_address=boa.env.generate_address() if i % 2 else ZERO_ADDRESS,
+            offer_type=list(OfferType)[i % 3],
+            token_id=rng.randrange(10**6),
+            token_range_min=rng.randrange(10**3),
+            token_range_max=rng.randrange(10**3, 10**6),
+            collection_key_hash=bayc_key_hash,
+            trait_hash=rng.randbytes(32),
+            expiration=now + rng.randrange(10**6),
+            lender=lender,
+            pro_rata=bool(i % 2),
+            size=rng.randrange(1, 10),
+            tracing_id=rng.randbytes(32),
+        )
+        for i in range(20)
+    ]
+
+
+def test_type_hashes_match_contract(p2p_nfts_usdc):
+    assert p2p_nfts_usdc.eval("OFFER_TYPE_HASH") == OFFER_TYPE_HASH
+    assert p2p_nfts_usdc.eval("DOMAIN_TYPE_HASH") == DOMAIN_TYPE_HASH
+
+
+def test_domain_separator_matches_contract(p2p_nfts_usdc):
+    signer = OfferSigner(boa.eval("chain.id"), p2p_nfts_usdc.address)
+    assert p2p_nfts_usdc.eval("offer_sig_domain_separator") == signer.domain_separator
+
+
+def test_signatures_match_typed_data_signing(p2p_nfts_usdc, offers, lender_key):
+    signer = OfferSigner(boa.eval("chain.id"), p2p_nfts_usdc.address)
+    for offer in offers:
+        assert Signature(*signer.sign(offer, lender_key)) == reference_sign_offer(offer, lender_key, p2p_nfts_usdc.address)
+
+
+def test_signatures_accepted_by_contract(p2p_nfts_usdc, offers, lender, lender_key):
+    for signed_offer in sign_offers(offers, lender_key, p2p_nfts_usdc.address):
+        assert p2p_nfts_usdc.internal._is_offer_signed_by_lender(signed_offer, lender)
+
+
+def test_sign_many_in_process_pool(p2p_nfts_usdc, offers, lender_key):
+    signer = OfferSigner(boa.eval("chain.id"), p2p_nfts_usdc.address)
+    serial = signer.sign_many(offers, lender_key)
+
+    assert signer.sign_many(offers, lender_key, processes=2, chunk_size=3) == serial
+    assert serial == [signer.sign(offer, lender_key) for offer in offers]
+    assert [s.signature for s in sign_offers(offers, lender_key, p2p_nfts_usdc.address, processes=2)] == [
+        Signature(*s) for s in serial
+    ]
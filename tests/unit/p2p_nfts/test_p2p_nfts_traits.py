@@ -0,0 +1,127 @@
+from hashlib import sha3_256
+
+import pytest
+
+from scripts._helpers import traits
+
+from ...conftest_base import Offer, OfferType, TokenTraitTree
+
+
+@pytest.fixture
+def token_with_traits(bayc, traits):
+    return [
+        (bayc.address, trait_name, trait_value, token_id)
+        for token_id in range(37)
+        for trait_name, trait_values in traits.items()
+        for trait_value in trait_values[: token_id % 4 + 1]
+    ]
+
+
+def test_token_node_matches_reference(token_with_traits):
+    for t in token_with_traits[:20]:
+        assert traits.token_node(*t) == TokenTraitTree.token_node(*t)
+        assert traits.trait_hash(t[1], t[2]) == TokenTraitTree.trait_hash(t[1], t[2])
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 33, 100])
+def test_tree_matches_reference(token_with_traits, size):
+    tokens = token_with_traits[:size]
+    reference = TokenTraitTree(tokens)
+    tree = traits.TraitTree.from_tokens(tokens)
+
+    assert tree.root() == reference.root()
+    for node in reference.token_nodes:
+        assert tree.proof(node) == reference.proof(node)
+
+
+def test_parallel_build_matches_serial(token_with_traits):
+    serial = traits.TraitTree.from_tokens(token_with_traits)
+    parallel = traits.TraitTree.from_tokens(token_with_traits, processes=2, chunk_size=16)
+
+    assert parallel.nodes == serial.nodes
+
+
+def test_tree_file_proofs(token_with_traits, tmp_path):
+    reference = TokenTraitTree(token_with_traits)
+    traits.TraitTree.from_tokens(token_with_traits).save(tmp_path / "bayc.tree")
+
+    with traits.TraitTreeFile(tmp_path / "bayc.tree") as tree_file:
+        assert len(tree_file) == len(reference.token_nodes)
+        assert tree_file.root() == reference.root()
+        for node in reference.token_nodes:
+            assert tree_file.proof(node) == reference.proof(node)
+        assert tree_file.proof(b"\1" * 32) == []
+
+
+def test_tree_file_rejects_invalid_files(tmp_path):
+    (tmp_path / "invalid.tree").write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError, match="not a trait tree file"):
+        traits.TraitTreeFile(tmp_path / "invalid.tree")
+
+
+def test_tree_file_proof_accepted_by_contract(p2p_nfts_usdc, bayc, bayc_key_hash, token_with_traits, tmp_path):
+    traits.TraitTree.from_tokens(token_with_traits).save(tmp_path / "bayc.tree")
+    _, trait_name, trait_value, token_id = token_with_traits[-1]
+    offer = Offer(
+        offer_type=OfferType.TRAIT,
+        collection_key_hash=bayc_key_hash,
+        trait_hash=traits.trait_hash(trait_name, trait_value),
+    )
+
+    with traits.TraitTreeFile(tmp_path / "bayc.tree") as tree_file:
+        proof = tree_file.proof(traits.token_node(bayc.address, trait_name, trait_value, token_id))
+        p2p_nfts_usdc.internal._validate_token_ids(offer, token_id, (bayc.address, tree_file.root()), proof)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 16, 100])
+def test_update_matches_rebuild(token_with_traits, size):
+    leaves = [int.from_bytes(traits.token_node(*t), "big") for t in token_with_traits]
+    tree = traits.TraitTree(leaves[:size])
+
+    tree.update(inserted=leaves[size : size + 3], deleted=leaves[:1])
+    assert tree.nodes == traits.TraitTree(leaves[1 : size + 3]).nodes
+
+    tree.update(deleted=leaves[size : size + 3])
+    assert tree.nodes == traits.TraitTree(leaves[1:size]).nodes
+
+
+def test_update_with_same_size_only_rehashes_changed_paths(token_with_traits):
+    leaves = sorted(int.from_bytes(traits.token_node(*t), "big") for t in token_with_traits)
+    new_leaf = leaves[-1] - 1
+    tree = traits.TraitTree(leaves[:-1])
+
+    rehashed = tree.update(inserted=[new_leaf], deleted=[leaves[-2]])
+
+    assert tree.nodes == traits.TraitTree([*leaves[:-2], new_leaf]).nodes
+    index = tree.index(new_leaf.to_bytes(32, "big"))
+    assert rehashed == {index >> i for i in range(index.bit_length())}
+
+
+def test_update_with_new_size_reuses_unchanged_subtrees(token_with_traits):
+    leaves = sorted(int.from_bytes(traits.token_node(*t), "big") for t in token_with_traits)
+    tree = traits.TraitTree(leaves)
+
+    rehashed = tree.update(deleted=leaves[:2])
+
+    size = len(leaves) - 2
+    assert tree.nodes == traits.TraitTree(leaves[2:]).nodes
+    assert rehashed >= set(range(size, 2 * size))
+    assert len(rehashed) - size < (size - 1) // 2
+
+
+def test_diff_trait_roots():
+    current = {"bayc": "aa" * 32, "mayc": "bb" * 32, "punks": "00" * 32}
+    new = {"bayc": "0x" + "AA" * 32, "mayc": bytes.fromhex("cc" * 32), "azuki": "dd" * 32}
+
+    assert traits.diff_trait_roots(current, new) == {"mayc": "cc" * 32, "azuki": "dd" * 32}
+    assert traits.diff_trait_roots(current, current) == {}
+
+
+def test_changed_roots_set_in_control(p2p_control, owner, bayc, token_with_traits):
+    tree = traits.TraitTree.from_tokens(token_with_traits)
+    changed = traits.diff_trait_roots({}, {"bayc": tree.root()})
+    p2p_control.change_collections_trait_roots(
+        [(sha3_256(c.encode()).digest(), bytes.fromhex(root)) for c, root in changed.items()], sender=owner
+    )
+
+    assert p2p_control.trait_roots(sha3_256(b"bayc").digest()) == tree.root()